@@ -113,6 +113,144 @@ K_RATIO_LENGTH_DEFAULT = 10
 K_RATIO_LENGTH_MIN = 0.0
 K_RATIO_LENGTH_MAX = 100.0 # Allows for extreme preference for short queues
 
+# Queue distribution engine: "batch" (vectorised NumPy, stale snapshot), "sequential" (each passenger
+# sees the queues left by earlier passengers), "refresh" (snapshot refreshed every
+# QUEUE_REFRESH_INTERVAL arrivals) or "reference" (original per-agent loop). Arrivals carry no clock, so a
+# snapshot refreshed every T seconds is QUEUE_REFRESH_INTERVAL = T * arrivals per second
+DISTRIBUTION_MODE = "batch"
+QUEUE_REFRESH_INTERVAL = 10
+
+# Preference draws: "pseudo" (plain pseudo-random) or "halton" (scrambled Halton quasi-Monte Carlo, one
+# independent replicate per round: better means, but rounds spread less than the model does)
+SAMPLER = "pseudo"
+
+# Show the quadrature expected queue lengths on the queue counters while dragging the model sliders
+PREVIEW_EXPECTED_ON_SLIDER = True
+
+# Run RUN and Run & Export on a background worker thread so the window keeps rendering
+# (with a progress bar and Cancel button); False runs them inline, blocking the loop
+RUN_IN_BACKGROUND = True
+
+# Compare results with the stochastic user equilibrium (the distribution where no passenger gains by
+# switching entrances): RUN prints its distance to the equilibrium, and the export summary gets the
+# equilibrium queues plus the gaps of the stale and sequential modes (EQUILIBRIUM_REPORT_ROUNDS simulated rounds
+# of each mode, run one after the other on top of the export, so the report is off unless asked for)
+REPORT_EQUILIBRIUM = False
+EQUILIBRIUM_REPORT_ROUNDS = 200
+
+# RUN engine: "instant" assigns the whole spawn pool to the queues at once (DISTRIBUTION_MODE);
+# "agents" runs the time-stepped agent engine: passengers spawn at the stairs, choose an entrance
+# with the same choice model (seeing the queues at that moment), walk over the platform and board
+RUN_ENGINE = "instant"
+AGENT_TIME_SCALE = 1.0 # Simulated seconds per real second (each frame advances AGENT_TIME_SCALE / FPS)
+AGENT_SPAWN_RATE = 2.0 # Passengers per second leaving every stairs tile
+AGENT_WALK_SPEED = (3.0, 0.5) # Mean and standard deviation of the walking speed (tiles per second)
+AGENT_TRAIN_INTERVAL = 60.0 # Seconds between train arrivals (None = doors always open)
+AGENT_TRAIN_DWELL = 20.0 # Seconds a train stays at the platform
+AGENT_BOARDING_RATE = 1.0 # Passengers per second boarding through every door while a train is in (0 = no boarding)
+AGENT_RADIUS = 0.15 # Body radius (tiles): walking agents closer than two radii are pushed apart
+AGENT_NEIGHBOUR_LIMIT = 4 # Agents per collision cell that take part in the pair search (bounds the cost in dense crowds)
+SHOW_DENSITY_HEATMAP = False # Agents per tile drawn as a red overlay during agent runs (toggle with H)
+DENSITY_HEATMAP_MAX = 4.0 # Agents per tile shown at full strength
+
+# Crowding in agent runs: walking speed follows the fundamental diagram of the local density (occupancy
+# smoothed over the neighbouring tiles), and every CONGESTION_REFRESH_TICKS ticks the walking routes to the
+# next CONGESTION_TARGETS_PER_REFRESH entrances are re-planned around crowded tiles
+# (a tile costs 1 + CONGESTION_COST_WEIGHT * (travel time factor - 1)); a re-plan is repaired over the
+# ticks that follow, CONGESTION_REPAIR_LABELS labels per tick
+AGENT_DENSITY_SPEED = True
+AGENT_TILE_AREA = 1.0 # m2 per tile (densities are compared with the fundamental diagram in persons per m2)
+AGENT_SPAWN_MAX_DENSITY = 4.0 # Persons per m2 at the foot of a stairs tile above which nobody steps off it
+CONGESTION_REFRESH_TICKS = 5 # 0 = never re-plan (routes stay the shortest walking paths)
+CONGESTION_TARGETS_PER_REFRESH = 2
+CONGESTION_COST_WEIGHT = 1.0
+CONGESTION_COST_TOLERANCE = 0.25 # Tiles whose cost moved less than this keep their old cost (no repair)
+CONGESTION_REPAIR_LABELS = 4096 # (entrance, tile) labels of a re-plan repaired per tick (bounds the tick time)
+
+# Operating day (Day button): a discrete-event run of a whole day with no rendering. The stairs counts are
+# daily totals arriving over EVENT_DAY_LENGTH seconds, either at a flat rate ("poisson") or following
+# EVENT_ARRIVAL_PROFILE ("profile"); every platform (connected track) gets a train every EVENT_TRAIN_HEADWAY
+# seconds, and its doors board EVENT_DOOR_RATE passengers per second while it dwells
+EVENT_DAY_LENGTH = 19 * 3600 # 05:00 to 24:00
+EVENT_ARRIVALS = "profile"
+EVENT_ARRIVAL_PROFILE = None # Relative rates of equal slices of the day (None = the built-in commuter profile)
+EVENT_TRAIN_HEADWAY = 300.0
+EVENT_TRAIN_DWELL = 45.0
+EVENT_DOOR_RATE = 1.0
+EVENT_DOOR_CAPACITY = None # Passengers boarding one door per train (None = no limit)
+
+# Distance used in the choice model: "walking" (shortest 4-connected path over walkable tiles, so diagonal
+# walks count up to 41% longer than their straight line) or "euclidean" (straight line)
+DISTANCE_METRIC = "walking"
+
+# --- Export Parameters ---
+# "tensor" draws every Run & Export round in one batched pass; "per_round" replays a full RUN per round;
+# "parallel" splits the rounds across a persistent process pool with reproducible seeded streams
+EXPORT_MODE = "tensor"
+EXPORT_WORKERS = None # None = one worker per CPU core
+SIMULATION_SEED = None # Master seed for parallel exports (None = fresh seed, printed so the run can be repeated)
+                       # When set, RUN is seeded too, so a repeated RUN configuration is served from the result cache
+
+# Common random numbers: sweep points and seeded RUNs that only differ in k_length_ratio or
+# rationality_factor reuse the same betas, arrival order and choice uniforms, so comparisons
+# show the parameter effect instead of Monte Carlo noise
+COMMON_RANDOM_NUMBERS = True
+
+# Parameter sweep (Sweep button): every (spawn scale, k_length_ratio, rationality_factor) point is simulated
+# SWEEP_ROUNDS times on the export process pool. Ranges are (start, stop, number of values).
+SWEEP_K_RANGE = (0.0, 100.0, 21)
+SWEEP_RATIONALITY_RANGE = (0.0, 100.0, 21)
+SWEEP_SPAWN_SCALES = (1.0,) # Multipliers applied to every stair's spawn count, e.g. (0.5, 1.0, 2.0)
+SWEEP_ROUNDS = 1000
+
+# Calibration (Calibrate button): fits the model to observed per-door counts laid out like
+# exports/simulation_results.csv and writes the fit to CALIBRATION_PATH.
+# "likelihood" uses the quadrature choice probabilities of the stale model (no simulation);
+# "moments" matches simulated means/variances in DISTRIBUTION_MODE (CALIBRATION_ROUNDS per point).
+# The stale model pins down MU * k, so k and rationality together are nearly unidentified: CALIBRATION_FIT
+# defaults to rationality alone (k keeps its slider value), and fits of several parameters report their flat
+# direction. Fitting the standard deviations ("std_dev_distance", "std_dev_length") needs "moments" with a
+# queue-feedback mode.
+CALIBRATION_OBSERVED_PATH = "exports/observed_counts.csv"
+CALIBRATION_PATH = "exports/calibration.json"
+CALIBRATION_METHOD = "likelihood"
+CALIBRATION_FIT = ("rationality_factor",)
+CALIBRATION_ROUNDS = 1000
+LOAD_CALIBRATION = True # Start with the calibrated slider values and standard deviations when the file exists
+
+# Overload estimation (Overload button): importance-sampling estimate of P(max queue > OVERLOAD_THRESHOLD)
+# and of every entrance's P(queue > OVERLOAD_THRESHOLD) with 95% CIs, written to exports/overload_estimate.json
+# and .csv. The iterations box sets the number of importance-sampling rounds; the tilts are tuned with
+# OVERLOAD_PILOT_ROUNDS rounds per entrance in OVERLOAD_PILOT_ITERATIONS passes first.
+OVERLOAD_THRESHOLD = 30
+OVERLOAD_PILOT_ROUNDS = 200
+OVERLOAD_PILOT_ITERATIONS = 5
+
+# Result cache for deterministic results (seeded RUNs, expected-distribution previews): LRU in memory,
+# optionally mirrored to exports/cache/ so it survives restarts
+RESULT_CACHE_SIZE = 64
+RESULT_CACHE_DISK = False
+
+# Precision-targeted export (every export mode): stop once every entrance's 95% CI half-width
+# is below this many passengers. The iterations box becomes the maximum round count. None = fixed count.
+EXPORT_CI_TOLERANCE = None
+EXPORT_CI_MIN_ROUNDS = 30 # Never stop before this many rounds (the variance estimate needs a sample)
+EXPORT_CI_CHECK_ROUNDS = 250 # Rounds simulated between precision checks
+
+# Streaming CSV output: rounds are simulated and written in chunks, so memory stays flat for any round count
+EXPORT_CHUNK_ROUNDS = 10000 # Rounds simulated per chunk (tensor/parallel modes)
+EXPORT_CHECKPOINT_ROUNDS = 50000 # Rounds between flush-to-disk checkpoints (a crashed run keeps what was flushed)
+EXPORT_GZIP = False # Write exports/simulation_results.csv.gz instead of the plain CSV
+
+# Columnar export next to the CSV: exports/simulation_results.npy (int32 rounds x entrances, load with
+# np.load(path, mmap_mode='r')) plus simulation_results.json with the positions and run parameters
+EXPORT_BINARY = True
+EXPORT_BINARY_APPEND = False # Add the rounds of each export to the existing file when the layout matches
+
+# Write exports/simulation_summary.json: per-entrance mean, variance, min, max and quantiles plus
+# max/mean ratio and Gini imbalance, all accumulated in one pass while the rows stream out
+EXPORT_SUMMARY = True
+
 
 
 # --- Build Mode Button Constants ---
@@ -0,0 +1,572 @@
+# game_states/calibration.py
+import csv
+import gzip
+import itertools
+import json
+import os
+import re
+
+import numpy as np
+
+from .queue_manager import (
+    QueueManager, MODE_BATCH, MODE_REFERENCE, DISTANCE_EUCLIDEAN, SAMPLER_PSEUDO, SAMPLER_HALTON,
+    DEFAULT_REFRESH_INTERVAL, STD_DEV_DISTANCE, STD_DEV_LENGTH, MAX_WEIGHT_VALUE, compute_scale_parameter
+)
+from .parallel_export import get_export_executor, new_master_seed
+from .parameter_sweep import simulate_point_rounds
+
+# --- Calibration Constants ---
+# "likelihood" maximises the multinomial likelihood of the observed counts under the stale
+# (empty-queue) model, with the choice probabilities integrated by Gauss-Hermite quadrature:
+# deterministic and smooth, so it needs no simulation at all.
+# "moments" matches the per-entrance mean and variance of simulated rounds (method of simulated
+# moments) and works with every seedable mode, including the queue-feedback ones.
+METHOD_LIKELIHOOD = "likelihood"
+METHOD_MOMENTS = "moments"
+CALIBRATION_METHODS = (METHOD_LIKELIHOOD, METHOD_MOMENTS)
+
+# Parameter vector order and the box the search stays in (the slider ranges for k and rationality)
+PARAMETER_NAMES = ("k_length_ratio", "rationality_factor", "std_dev_distance", "std_dev_length")
+PARAMETER_BOUNDS = {
+    "k_length_ratio": (0.0, float(MAX_WEIGHT_VALUE)),
+    "rationality_factor": (0.0, 100.0),
+    "std_dev_distance": (0.0, 5.0),
+    "std_dev_length": (0.0, 5.0)
+}
+# The sliders only hold whole numbers
+SLIDER_PARAMETERS = ("k_length_ratio", "rationality_factor")
+# Fitted by default: the stale likelihood pins down MU * k, so k and rationality together lie on a
+# nearly flat ridge; the queue ratio keeps its start (slider) value
+DEFAULT_FIT = ("rationality_factor",)
+
+# Coarse grid (values per fitted slider parameter) that picks the Nelder-Mead start point
+GRID_POINTS = 21
+
+# Nelder-Mead settings. The search runs on z with parameter = lower + (upper - lower) * (1 + sin z) / 2,
+# so it is unconstrained but never leaves the box (clipping would flatten the simplex on an edge).
+NELDER_MEAD_STEP = 0.25
+NELDER_MEAD_MAX_ITERATIONS = 200
+NELDER_MEAD_X_TOLERANCE = 1e-4
+NELDER_MEAD_F_TOLERANCE = 1e-8
+
+# Identification check of multi-parameter fits: finite-difference step of the objective's Hessian
+# (unit-box coordinates, so every parameter is measured against its range), and the ratio of its
+# largest to smallest eigenvalue above which the fit is reported as poorly identified
+HESSIAN_STEP = 0.01
+IDENTIFICATION_CONDITION_LIMIT = 1e3
+
+# Probabilities below this are clipped inside log() (an entrance the model never picks)
+PROBABILITY_FLOOR = 1e-12
+# Variance floor for the moment weights (entrances whose observed count never changes)
+VARIANCE_FLOOR = 1.0
+
+_POSITION_PATTERN = re.compile(r"\[\s*(-?\d+)\s*,\s*(-?\d+)\s*\]")
+
+
+def _parse_position(column_name):
+    match = _POSITION_PATTERN.search(column_name)
+    if match is None:
+        raise ValueError(f"Column '{column_name}' has no [row,col] position")
+    return int(match.group(1)), int(match.group(2))
+
+
+def load_observed_counts(path):
+    """
+    Reads observed per-door counts in the layout of exports/simulation_results.csv
+    (optionally gzip-compressed): one row per round, "Spawn [r,c]" columns with the
+    stair counts of that round and "Entry [r,c]" columns with the boarding counts.
+
+    :return: Dictionary with "entry_positions" and "stair_positions" (lists of (r, c) in column
+        order), "counts" (R, E) and "spawn_counts" (R, S) integer arrays. Without Spawn columns
+        "stair_positions" is empty and "spawn_counts" has zero columns.
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, 'rt', newline='') as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        raise ValueError(f"Observed counts file is empty: {path}")
+
+    header = rows[0]
+    spawn_columns = [i for i, name in enumerate(header) if name.strip().startswith("Spawn")]
+    entry_columns = [i for i, name in enumerate(header) if name.strip().startswith("Entry")]
+    if not entry_columns:
+        raise ValueError(f"No 'Entry [r,c]' columns in {path}")
+
+    data = np.array([[float(row[i]) for i in spawn_columns + entry_columns] for row in rows[1:] if row],
+                    dtype=float).reshape(-1, len(spawn_columns) + len(entry_columns))
+    return {
+        "entry_positions": [_parse_position(header[i]) for i in entry_columns],
+        "stair_positions": [_parse_position(header[i]) for i in spawn_columns],
+        "counts": np.rint(data[:, len(spawn_columns):]).astype(np.int64),
+        "spawn_counts": np.rint(data[:, :len(spawn_columns)]).astype(np.int64)
+    }
+
+
+def save_calibration(path, calibration):
+    """Writes a calibration result to a JSON file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(calibration, f, indent=4)
+
+
+def load_calibration(path):
+    """Returns the calibration stored at path, or None when there is none (or it is unreadable)."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            calibration = json.load(f)
+        calibration["parameters"], calibration["slider_defaults"] # Required keys
+    except (OSError, ValueError, KeyError, TypeError):
+        print(f"Warning: Ignoring unreadable calibration file {path}")
+        return None
+    return calibration
+
+
+def nelder_mead(evaluate, x0, step=NELDER_MEAD_STEP, max_iterations=NELDER_MEAD_MAX_ITERATIONS,
+                x_tolerance=NELDER_MEAD_X_TOLERANCE, f_tolerance=NELDER_MEAD_F_TOLERANCE,
+                progress_cb=None, cancel_cb=None):
+    """
+    Minimises an unconstrained function with the Nelder-Mead simplex method
+    (reflection, expansion, contraction, shrink).
+
+    :param evaluate: Callable mapping a list of points to a list of objective values. Points are
+        handed over in batches (the initial simplex, every shrink) so they can be evaluated in parallel.
+    :param x0: Start point (n,).
+    :param step: Edge length of the initial simplex.
+    :param progress_cb: Optional callable receiving the fraction of max_iterations used.
+    :param cancel_cb: Optional callable; when it returns True the search stops early.
+    :return: Tuple (best_point, best_value, iterations, converged).
+    """
+    x0 = np.asarray(x0, dtype=float)
+    n = len(x0)
+
+    simplex = np.tile(x0, (n + 1, 1))
+    simplex[1:] += step * np.eye(n)
+    values = np.array(evaluate(list(simplex)), dtype=float)
+
+    converged = False
+    iterations = 0
+    while iterations < max_iterations:
+        order = np.argsort(values, kind='stable')
+        simplex, values = simplex[order], values[order]
+
+        if (np.max(np.abs(simplex[1:] - simplex[0])) <= x_tolerance
+                and np.max(np.abs(values[1:] - values[0])) <= f_tolerance):
+            converged = True
+            break
+        if cancel_cb and cancel_cb():
+            break
+
+        iterations += 1
+        centroid = simplex[:-1].mean(axis=0)
+        worst = simplex[-1]
+
+        reflected = 2.0 * centroid - worst
+        reflected_value = evaluate([reflected])[0]
+
+        if reflected_value < values[0]:
+            expanded = 3.0 * centroid - 2.0 * worst
+            expanded_value = evaluate([expanded])[0]
+            if expanded_value < reflected_value:
+                simplex[-1], values[-1] = expanded, expanded_value
+            else:
+                simplex[-1], values[-1] = reflected, reflected_value
+        elif reflected_value < values[-2]:
+            simplex[-1], values[-1] = reflected, reflected_value
+        else:
+            # Contract towards the better of the worst vertex and its reflection
+            if reflected_value < values[-1]:
+                contracted = centroid + 0.5 * (reflected - centroid)
+                limit = reflected_value
+            else:
+                contracted = centroid + 0.5 * (worst - centroid)
+                limit = values[-1]
+            contracted_value = evaluate([contracted])[0]
+
+            if contracted_value < limit:
+                simplex[-1], values[-1] = contracted, contracted_value
+            else:
+                simplex[1:] = simplex[0] + 0.5 * (simplex[1:] - simplex[0])
+                values[1:] = evaluate(list(simplex[1:]))
+
+        if progress_cb:
+            progress_cb(iterations / max_iterations)
+
+    best = int(np.argmin(values))
+    return simplex[best], float(values[best]), iterations, converged
+
+
+def _build_problem(entry_tile_positions, observed, spawn_data, grid_data, method, mode, num_rounds,
+                   master_seed, distance_metric, sampler, refresh_interval):
+    """
+    Reorders the observed counts to the layout's entrance order and groups the rounds by
+    their stair counts. Every group is one spawn configuration: the likelihood only needs
+    its summed counts, the moments its per-entrance mean and variance.
+    """
+    entry_tile_positions = [tuple(pos) for pos in entry_tile_positions]
+    observed_entries = [tuple(pos) for pos in observed["entry_positions"]]
+    if sorted(observed_entries) != sorted(entry_tile_positions):
+        raise ValueError(
+            f"The observed entrances {sorted(observed_entries)} do not match the layout's "
+            f"entrances {sorted(entry_tile_positions)}"
+        )
+    counts = observed["counts"][:, [observed_entries.index(pos) for pos in entry_tile_positions]]
+    if len(counts) == 0:
+        raise ValueError("The observed counts file has no rounds")
+
+    # Stair counts per round: from the Spawn columns, else the layout's spawn pool for every round
+    stair_positions = [tuple(pos) for pos in observed["stair_positions"]]
+    if stair_positions:
+        unknown = set(stair_positions) - set(spawn_data)
+        if unknown:
+            raise ValueError(f"The observed stairs {sorted(unknown)} are not stairs of the layout")
+        spawn_counts = observed["spawn_counts"]
+    else:
+        stair_positions = list(spawn_data)
+        spawn_counts = np.tile([spawn_data[pos] for pos in stair_positions], (len(counts), 1))
+
+    group_spawns, group_index = np.unique(spawn_counts, axis=0, return_inverse=True)
+    group_index = group_index.ravel()
+
+    groups = []
+    for g, group_spawn in enumerate(group_spawns):
+        group_counts = counts[group_index == g]
+        observed_rounds = len(group_counts)
+        observed_mean = group_counts.mean(axis=0)
+        observed_variance = group_counts.var(axis=0, ddof=1) if observed_rounds > 1 else np.zeros(counts.shape[1])
+
+        # Diagonal moment weights: inverse sampling variances of the mean and variance differences
+        variance = np.maximum(observed_variance, VARIANCE_FLOOR)
+        mean_weights = 1.0 / (variance * (1.0 / observed_rounds + 1.0 / num_rounds))
+        variance_weights = np.zeros_like(variance)
+        if observed_rounds > 1 and num_rounds > 1:
+            variance_weights = 1.0 / (2.0 * variance ** 2 * (1.0 / (observed_rounds - 1) + 1.0 / (num_rounds - 1)))
+
+        groups.append({
+            "spawn_data": dict(zip(stair_positions, (int(count) for count in group_spawn))),
+            "rounds": observed_rounds,
+            "count_sums": group_counts.sum(axis=0),
+            "observed_mean": observed_mean,
+            "observed_variance": observed_variance,
+            "mean_weights": mean_weights,
+            "variance_weights": variance_weights
+        })
+
+    return {
+        "entry_tile_positions": entry_tile_positions,
+        "grid_data": grid_data,
+        "groups": groups,
+        "num_observed_rounds": len(counts),
+        "method": method,
+        "mode": mode,
+        "num_rounds": num_rounds,
+        "master_seed": master_seed,
+        "distance_metric": distance_metric,
+        "sampler": sampler,
+        "refresh_interval": refresh_interval
+    }
+
+
+def _group_queue_managers(problem):
+    return [
+        QueueManager(
+            problem["entry_tile_positions"], group["spawn_data"], mode=problem["mode"],
+            grid_data=problem["grid_data"], refresh_interval=problem["refresh_interval"],
+            distance_metric=problem["distance_metric"], sampler=problem["sampler"]
+        )
+        for group in problem["groups"]
+    ]
+
+
+def _group_predictions(problem, queue_managers, parameters):
+    """
+    Returns the model's (mean, variance) counts per group at one parameter vector:
+    quadrature probabilities for the likelihood, simulated rounds for the moments.
+    """
+    k_length_ratio, rationality_factor, std_dev_distance, std_dev_length = parameters
+    predictions = []
+    for g, (group, queue_manager) in enumerate(zip(problem["groups"], queue_managers)):
+        queue_manager.std_dev_distance = std_dev_distance
+        queue_manager.std_dev_length = std_dev_length
+
+        if problem["method"] == METHOD_LIKELIHOOD:
+            predictions.append(queue_manager.expected_distribution(rationality_factor, k_length_ratio))
+            continue
+
+        # Every point replays the group's stream (common random numbers), so the objective
+        # changes with the parameters instead of with the Monte Carlo noise
+        queue_manager.reseed(np.random.SeedSequence(problem["master_seed"], spawn_key=(g,)))
+        counts = simulate_point_rounds(queue_manager, problem["num_rounds"], rationality_factor, k_length_ratio)
+        variances = counts.var(axis=0, ddof=1) if len(counts) > 1 else np.zeros(counts.shape[1])
+        predictions.append((counts.mean(axis=0), variances))
+    return predictions
+
+
+def _objective_values(problem, points):
+    """
+    Worker entry point: evaluates the calibration objective at a batch of full
+    parameter vectors (PARAMETER_NAMES order). Lower is better.
+
+    Likelihood: negative multinomial log-likelihood per observed round. Within a round every
+    passenger chooses independently given the empty snapshot, so with one stair the counts are
+    exactly multinomial; with several stairs this is the composite likelihood of the pooled
+    per-passenger choice probabilities.
+    Moments: weighted squared differences of the per-entrance means and variances.
+    """
+    queue_managers = _group_queue_managers(problem)
+    values = []
+    for parameters in points:
+        predictions = _group_predictions(problem, queue_managers, parameters)
+
+        total = 0.0
+        for group, (means, variances) in zip(problem["groups"], predictions):
+            if problem["method"] == METHOD_LIKELIHOOD:
+                passengers = sum(group["spawn_data"].values())
+                if passengers == 0:
+                    continue
+                probabilities = np.maximum(means / passengers, PROBABILITY_FLOOR)
+                total -= float(group["count_sums"] @ np.log(probabilities))
+            else:
+                total += float(group["mean_weights"] @ (means - group["observed_mean"]) ** 2)
+                total += float(group["variance_weights"] @ (variances - group["observed_variance"]) ** 2)
+
+        if problem["method"] == METHOD_LIKELIHOOD:
+            total /= problem["num_observed_rounds"]
+        values.append(total)
+    return values
+
+
+def _evaluate_parallel(problem, points, max_workers):
+    """Splits the points across the persistent process pool (inline for a single point or worker)."""
+    if max_workers == 1 or len(points) <= 1:
+        return _objective_values(problem, points)
+
+    executor = get_export_executor(max_workers)
+    num_chunks = min(len(points), max_workers or os.cpu_count() or 1)
+    chunks = [list(chunk) for chunk in np.array_split(np.asarray(points, dtype=float), num_chunks)]
+    values = []
+    for chunk_values in executor.map(_objective_values, [problem] * num_chunks, chunks):
+        values.extend(chunk_values)
+    return values
+
+
+def _identification(evaluate, unit_point, names, step=HESSIAN_STEP):
+    """
+    Finite-difference Hessian of the objective at a fit (3^p points around it, in unit-box
+    coordinates) and its eigen-decomposition. The eigenvector of the smallest eigenvalue is the
+    flat direction: moving the fitted parameters along it changes the objective the least.
+
+    :return: Dictionary with "eigenvalues" (ascending), "condition_number" (None when the smallest
+        eigenvalue is not positive) and "flat_direction" (parameter name -> component).
+    """
+    dims = len(unit_point)
+    center = np.clip(unit_point, step, 1.0 - step) # Keep the stencil inside the box
+    shifts = np.array(list(itertools.product((-1, 0, 1), repeat=dims)))
+    values = np.asarray(evaluate(list(center + step * shifts)), dtype=float).reshape((3,) * dims)
+
+    def value(*moves):
+        index = [1] * dims
+        for dim, delta in moves:
+            index[dim] += delta
+        return values[tuple(index)]
+
+    hessian = np.empty((dims, dims))
+    for i in range(dims):
+        hessian[i, i] = (value((i, 1)) - 2.0 * value() + value((i, -1))) / step ** 2
+        for j in range(i + 1, dims):
+            hessian[i, j] = hessian[j, i] = (value((i, 1), (j, 1)) - value((i, 1), (j, -1)) -
+                                             value((i, -1), (j, 1)) + value((i, -1), (j, -1))) / (4.0 * step ** 2)
+    eigenvalues, eigenvectors = np.linalg.eigh(hessian)
+    flat = eigenvectors[:, 0] * np.sign(eigenvectors[np.argmax(np.abs(eigenvectors[:, 0])), 0])
+    return {
+        "eigenvalues": eigenvalues.tolist(),
+        "condition_number": float(eigenvalues[-1] / eigenvalues[0]) if eigenvalues[0] > 0 else None,
+        "flat_direction": {name: float(component) for name, component in zip(names, flat)}
+    }
+
+
+def calibrate_parameters(entry_tile_positions, observed, spawn_data, grid_data, method=METHOD_LIKELIHOOD,
+                         fit=DEFAULT_FIT, start=None, mode=MODE_BATCH, num_rounds=1000,
+                         master_seed=None, max_workers=None, grid_points=GRID_POINTS,
+                         distance_metric=DISTANCE_EUCLIDEAN, sampler=SAMPLER_PSEUDO,
+                         refresh_interval=DEFAULT_REFRESH_INTERVAL, progress_cb=None, cancel_cb=None):
+    """
+    Fits the choice model parameters to observed per-door counts.
+
+    A coarse grid over the fitted slider parameters (evaluated on the process pool) picks the
+    start point, then Nelder-Mead refines every fitted parameter inside the PARAMETER_BOUNDS box.
+    Finally the whole-number neighbours of the fitted slider values are compared, so the
+    reported slider defaults are the best values the sliders can actually hold.
+
+    Identification: in the stale model every passenger sees empty queues, so the choice
+    probabilities only depend on MU * beta_distance. The data then pins down two quantities
+    (MU * k and MU * std_dev_distance): fit at most two of k_length_ratio, rationality_factor
+    and std_dev_distance with the likelihood, and std_dev_length not at all. The moments
+    method in the sequential or refresh mode also sees the queue length term and can fit all four.
+    With more than one fitted parameter the curvature of the objective at the fit is checked
+    (_identification), and a flat direction is reported in "identification" and "warnings".
+
+    :param entry_tile_positions: List of (r, c) tuples for all entry tiles (ID 4).
+    :param observed: Dictionary from load_observed_counts().
+    :param spawn_data: Layout stair counts (used when the observed file has no Spawn columns).
+    :param grid_data: 2D grid the positions come from (walking distances, cache key).
+    :param method: METHOD_LIKELIHOOD or METHOD_MOMENTS.
+    :param fit: Names of the parameters to fit (subset of PARAMETER_NAMES); the rest stay at start
+        (default DEFAULT_FIT).
+    :param start: Optional dictionary of start values (default: middle of the k range,
+        rationality 1 and the module standard deviations).
+    :param mode: Simulation mode of the moments method (any mode except the reference loop).
+    :param sampler: Preference sampler of the moments method (pseudo only: Halton rounds have too little spread).
+    :param num_rounds: Simulated rounds per parameter point (moments method).
+    :param master_seed: Seed of the simulated rounds (None = fresh seed).
+    :param max_workers: Number of worker processes; 1 evaluates inline.
+    :param grid_points: Grid values per fitted slider parameter (0 or 1 skips the grid).
+    :param progress_cb: Optional callable receiving the completed fraction (0..1).
+    :param cancel_cb: Optional callable; when it returns True the search stops with the best point so far.
+    :return: JSON-serialisable dictionary with "parameters", "slider_defaults" and fit diagnostics;
+        "warnings" lists what makes the fit doubtful (no convergence, a flat direction).
+    """
+    if method not in CALIBRATION_METHODS:
+        raise ValueError(f"Unknown calibration method: {method}")
+    if method == METHOD_MOMENTS and mode == MODE_REFERENCE:
+        raise ValueError("The moments method needs a seedable mode; the reference loop uses the global random state.")
+    if method == METHOD_MOMENTS and sampler == SAMPLER_HALTON:
+        raise ValueError("The moments method matches per-round variances, which the halton sampler understates; "
+                         "use the pseudo sampler.")
+    unknown = set(fit) - set(PARAMETER_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown calibration parameters: {sorted(unknown)}")
+
+    fit = [name for name in PARAMETER_NAMES if name in fit]
+    if method == METHOD_LIKELIHOOD and "std_dev_length" in fit:
+        print("  std_dev_length has no effect on empty-queue choices; it is kept at its start value.")
+        fit.remove("std_dev_length")
+    if method == METHOD_LIKELIHOOD and {"k_length_ratio", "rationality_factor", "std_dev_distance"} <= set(fit):
+        print("  Note: only two of k_length_ratio, rationality_factor and std_dev_distance are identified "
+              "by the stale likelihood; the fit is one point of a flat ridge.")
+    if not fit:
+        raise ValueError("Nothing to calibrate")
+
+    if master_seed is None:
+        master_seed = new_master_seed()
+    problem = _build_problem(entry_tile_positions, observed, spawn_data, grid_data, method, mode, num_rounds,
+                             master_seed, distance_metric, sampler, refresh_interval)
+
+    base = {
+        "k_length_ratio": MAX_WEIGHT_VALUE / 2.0,
+        "rationality_factor": 1.0,
+        "std_dev_distance": STD_DEV_DISTANCE,
+        "std_dev_length": STD_DEV_LENGTH
+    }
+    base.update(start or {})
+    lower = np.array([PARAMETER_BOUNDS[name][0] for name in fit])
+    upper = np.array([PARAMETER_BOUNDS[name][1] for name in fit])
+    fit_indices = [PARAMETER_NAMES.index(name) for name in fit]
+
+    # Fitted parameters travel as unit-box points (0..1 per parameter); Nelder-Mead works on z
+    def to_parameters(unit_point):
+        parameters = np.array([base[name] for name in PARAMETER_NAMES], dtype=float)
+        parameters[fit_indices] = lower + np.clip(unit_point, 0.0, 1.0) * (upper - lower)
+        return parameters
+
+    def to_unit(z):
+        return (1.0 + np.sin(z)) / 2.0
+
+    evaluations = [0]
+
+    def evaluate(unit_points):
+        evaluations[0] += len(unit_points)
+        return _evaluate_parallel(problem, [to_parameters(point) for point in unit_points], max_workers)
+
+    def report(fraction):
+        if progress_cb:
+            progress_cb(fraction)
+
+    # 1. Coarse grid over the fitted slider parameters (standard deviations start at base)
+    x0 = np.array([(base[name] - lo) / (hi - lo) for name, lo, hi in zip(fit, lower, upper)])
+    grid_dims = [i for i, name in enumerate(fit) if name in SLIDER_PARAMETERS]
+    if grid_points > 1 and grid_dims:
+        axes = np.meshgrid(*[np.linspace(0.0, 1.0, grid_points)] * len(grid_dims), indexing='ij')
+        grid = np.tile(x0, (axes[0].size, 1))
+        for dim, axis in zip(grid_dims, axes):
+            grid[:, dim] = axis.ravel()
+        grid_values = evaluate(list(grid))
+        x0 = grid[int(np.argmin(grid_values))]
+        print(f"  Grid search: {len(grid)} points, best objective {min(grid_values):.6g}")
+    report(0.3)
+
+    # 2. Nelder-Mead refinement of every fitted parameter
+    best_z, best_value, iterations, converged = nelder_mead(
+        lambda z_points: evaluate([to_unit(z) for z in z_points]), np.arcsin(2.0 * x0 - 1.0),
+        progress_cb=lambda fraction: report(0.3 + 0.6 * fraction), cancel_cb=cancel_cb
+    )
+    parameters = to_parameters(to_unit(best_z))
+
+    # Poorly identified combinations of the fitted parameters show up as a flat direction
+    identification = None
+    if len(fit) > 1 and not (cancel_cb and cancel_cb()):
+        identification = _identification(evaluate, to_unit(best_z), fit)
+
+    # 3. Best whole-number slider values around the fit
+    candidates = [parameters]
+    for name in SLIDER_PARAMETERS:
+        i = PARAMETER_NAMES.index(name)
+        lo, hi = PARAMETER_BOUNDS[name]
+        values = {min(hi, max(lo, np.floor(parameters[i]))), min(hi, max(lo, np.ceil(parameters[i])))}
+        candidates = [np.where(np.arange(len(PARAMETER_NAMES)) == i, value, candidate)
+                      for candidate in candidates for value in sorted(values)]
+    candidate_values = _evaluate_parallel(problem, candidates, max_workers)
+    evaluations[0] += len(candidates)
+    slider_parameters = candidates[int(np.argmin(candidate_values))]
+    report(1.0)
+
+    # Fit diagnostics: fitted vs observed mean per entrance (all groups pooled)
+    predictions = _group_predictions(problem, _group_queue_managers(problem), parameters)
+    fitted_means = sum(group["rounds"] * means for group, (means, _) in zip(problem["groups"], predictions))
+    observed_means = sum(group["rounds"] * group["observed_mean"] for group in problem["groups"])
+    num_observed_rounds = problem["num_observed_rounds"]
+
+    calibration = {
+        "parameters": {name: float(value) for name, value in zip(PARAMETER_NAMES, parameters)},
+        "slider_defaults": {name: int(slider_parameters[PARAMETER_NAMES.index(name)]) for name in SLIDER_PARAMETERS},
+        "fitted": fit,
+        "method": method,
+        "mode": mode if method == METHOD_MOMENTS else MODE_BATCH,
+        "objective": best_value,
+        "objective_at_slider_defaults": float(min(candidate_values)),
+        "scale_parameter": compute_scale_parameter(parameters[1]),
+        "iterations": iterations,
+        "evaluations": evaluations[0],
+        "converged": converged,
+        "num_observed_rounds": num_observed_rounds,
+        "num_simulated_rounds": num_rounds if method == METHOD_MOMENTS else 0,
+        "master_seed": str(master_seed) if method == METHOD_MOMENTS else None,
+        "entrances": {
+            f"Entry [{r},{c}]": {
+                "observed_mean": float(observed / num_observed_rounds),
+                "fitted_mean": float(fitted / num_observed_rounds)
+            }
+            for (r, c), observed, fitted in zip(problem["entry_tile_positions"], observed_means, fitted_means)
+        }
+    }
+    if method == METHOD_LIKELIHOOD:
+        # Up to the multinomial coefficients, which do not depend on the parameters
+        calibration["log_likelihood"] = -best_value * num_observed_rounds
+
+    warnings = []
+    if not converged:
+        warnings.append(f"Nelder-Mead stopped after {iterations} iterations without converging; the fit may "
+                        f"not be the optimum (fit fewer parameters or check the observed counts).")
+    if identification is not None:
+        calibration["identification"] = identification
+        condition = identification["condition_number"]
+        if condition is None or condition > IDENTIFICATION_CONDITION_LIMIT:
+            direction = ", ".join(f"{name} {component:+.2f}"
+                                  for name, component in identification["flat_direction"].items())
+            warnings.append(f"The fit is poorly identified: the objective is nearly flat along ({direction}) "
+                            f"in units of each parameter's range; fit fewer parameters.")
+    calibration["warnings"] = warnings
+    return calibration
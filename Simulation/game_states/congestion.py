@@ -0,0 +1,288 @@
+# game_states/congestion.py
+import numpy as np
+
+from .distance_fields import NEIGHBOUR_OFFSETS, UNREACHABLE
+
+# --- Fundamental Diagram (Weidmann) ---
+# Free walking speed scales with 1 - exp(-gamma * (1/rho - 1/rho_max)) at rho persons per m2:
+# nearly free below ~0.5 p/m2, about half speed at 2 p/m2 and standstill at rho_max.
+WEIDMANN_GAMMA = 1.913
+WEIDMANN_MAX_DENSITY = 5.4
+MIN_SPEED_FACTOR = 0.05 # Even a jammed crowd creeps forward (keeps the doors reachable)
+
+# 3x3 binomial smoothing kernel (separable [1, 2, 1] / 4 per axis) for the occupancy grid
+SMOOTHING_KERNEL = np.array([0.25, 0.5, 0.25])
+
+# Field values closer than this count as unchanged during the incremental repair
+FIELD_EPSILON = 1e-9
+
+# Labels handled per step of a time-sliced repair (CongestionFields.start_update/advance)
+REPAIR_CHUNK_LABELS = 1024
+
+
+def _convolve_rows_cols(grid, kernel):
+    """Separable 'same' convolution of a 2D grid with a 1D kernel along both axes (zero padding)."""
+    reach = len(kernel) // 2
+    padded = np.pad(grid, reach)
+    height, width = grid.shape
+    rows = sum(weight * padded[k:k + height, :] for k, weight in enumerate(kernel))
+    return sum(weight * rows[:, k:k + width] for k, weight in enumerate(kernel))
+
+
+def smoothed_density(counts, walkable, tile_area=1.0):
+    """
+    Local density (persons per m2) of every tile: the per-tile occupancy convolved with the
+    smoothing kernel, normalised by the walkable share of the kernel so tiles next to walls
+    or tracks are not diluted by blocked tiles. Blocked tiles get 0.
+
+    :param counts: (H, W) agents per tile (e.g. SpatialHash.density()).
+    :param walkable: (H, W) boolean mask.
+    :param tile_area: Area of one tile in m2.
+    """
+    walkable_weight = _convolve_rows_cols(walkable.astype(float), SMOOTHING_KERNEL)
+    spread = _convolve_rows_cols(counts.astype(float), SMOOTHING_KERNEL)
+    density = np.where(walkable, spread / np.maximum(walkable_weight, 1e-9), 0.0)
+    return density / tile_area
+
+
+def speed_factor(density):
+    """Fundamental diagram: share of the free walking speed left at each density (persons per m2)."""
+    density = np.asarray(density, dtype=float)
+    with np.errstate(divide='ignore'):
+        inverse = np.where(density > 0, 1.0 / np.maximum(density, 1e-12), np.inf)
+    factor = 1.0 - np.exp(-WEIDMANN_GAMMA * (inverse - 1.0 / WEIDMANN_MAX_DENSITY))
+    return np.clip(factor, MIN_SPEED_FACTOR, 1.0)
+
+
+def congestion_costs(density, weight=1.0):
+    """
+    Cost of crossing each tile relative to an empty tile: 1 + weight * (travel time factor - 1),
+    where the travel time factor is 1 / speed_factor(density).
+    """
+    return 1.0 + weight * (1.0 / speed_factor(density) - 1.0)
+
+
+class CongestionFields:
+    """
+    Cost-weighted integration and direction fields for a fixed list of targets, kept up to
+    date as the tile costs change.
+
+    Moving between neighbouring tiles v and u costs (cost[v] + cost[u]) / 2. With all costs
+    at 1 this is the unit-step walking distance, so the fields start as copies of the cached
+    FlowFieldSet fields. update_costs() then repairs only what a cost change can affect:
+    labels that lost the path their value came from are reset and re-solved from their
+    surroundings, cheaper tiles are relaxed outwards, and the direction field is recomputed
+    around every label whose value moved. The targets of one update are repaired together,
+    as one batch of (target, tile) labels, like batched_bfs().
+
+    Every target keeps the costs its field was solved with, so the targets can be refreshed
+    in turns (a few per update) without their fields ever mixing two cost snapshots.
+    start_update() and advance() spread the repair of one update over several calls (agent
+    ticks), so a large repair never stalls a single frame.
+    """
+    def __init__(self, flow_fields, targets):
+        """
+        :param flow_fields: FlowFieldSet of the layout (unit-cost fields and neighbour table).
+        :param targets: List of (r, c) target tiles.
+        """
+        self.neighbours = flow_fields.neighbours
+        self.num_cells = flow_fields.num_cells
+        # Neighbour table per direction with missing neighbours sent to an extra (always empty) cell
+        self.padded_neighbours = np.where(self.neighbours == UNREACHABLE, self.num_cells, self.neighbours).T.copy()
+        self.num_targets = len(targets)
+        self.costs = np.ones((self.num_targets, self.num_cells))
+
+        steps = flow_fields.integration_fields(targets)
+        self.field = np.where(steps == UNREACHABLE, np.inf, steps.astype(float))
+        self.next_cell = flow_fields.next_cells(targets).copy() # Updated in place
+        self.target_cells = np.array([r * flow_fields.width + c for r, c in targets], dtype=np.int64)
+
+        self.updated_labels = 0 # (target, tile) labels repaired by the last update (diagnostics)
+        self._pending = None # (rows, field, costs, next_cell, repair steps) of a time-sliced update
+
+    def update_costs(self, new_costs, tolerance=0.0, targets=None):
+        """
+        Applies new tile costs to some or all targets and repairs their fields incrementally.
+
+        :param new_costs: (H*W,) cost of every tile.
+        :param tolerance: Tiles whose cost moved by at most this much keep their old cost, so
+            small density fluctuations do not trigger repairs.
+        :param targets: Optional indices of the targets to update (default: all).
+        :return: Number of (target, tile) costs that were changed.
+        """
+        changed = self.start_update(new_costs, tolerance, targets, chunk_labels=None)
+        self.advance()
+        return changed
+
+    def start_update(self, new_costs, tolerance=0.0, targets=None, chunk_labels=REPAIR_CHUNK_LABELS):
+        """
+        Starts an update like update_costs() whose repair is then carried out by advance(), a few
+        chunks of labels per call. Until the repair completes, the fields, costs and directions
+        of the targets keep their previous values. An update still pending is completed first.
+
+        :param chunk_labels: Labels handled per repair step (None = whole waves).
+        :return: Number of (target, tile) costs that will change.
+        """
+        self.advance()
+        rows = np.arange(self.num_targets) if targets is None else np.asarray(targets, dtype=np.int64)
+        new_costs = np.broadcast_to(np.asarray(new_costs, dtype=float).ravel(), (len(rows), self.num_cells))
+        costs = self.costs[rows]
+        changed = np.abs(new_costs - costs) > tolerance
+        self.updated_labels = 0
+        if not changed.any():
+            return 0
+        dearer = changed & (new_costs > costs)
+        costs[changed] = new_costs[changed]
+
+        # The batch is repaired on copies of its rows: labels are flat (row, tile) indices into them
+        field, next_cell = self.field[rows], self.next_cell[rows]
+        steps = self._repair(field, costs, next_cell, self.target_cells[rows], changed, dearer, chunk_labels)
+        self._pending = (rows, field, costs, next_cell, steps)
+        return int(np.count_nonzero(changed))
+
+    @property
+    def updating(self):
+        """True while an update started with start_update() has not completed."""
+        return self._pending is not None
+
+    def advance(self, max_labels=None):
+        """
+        Continues the pending update until about max_labels labels were handled (the whole
+        remaining repair by default) and publishes the repaired rows once it completes.
+
+        :return: True when no update is pending any more.
+        """
+        if self._pending is None:
+            return True
+        rows, field, costs, next_cell, steps = self._pending
+        handled = 0
+        for labels in steps:
+            handled += labels
+            if max_labels is not None and handled >= max_labels:
+                return False
+        self.field[rows], self.costs[rows], self.next_cell[rows] = field, costs, next_cell
+        self._pending = None
+        return True
+
+    def _repair(self, field, costs, next_cell, target_cells, changed, dearer, chunk_labels=None):
+        """
+        Repairs the (t, H*W) fields of one batch in place after its costs changed. This is a
+        generator: it works through the labels in chunks of at most chunk_labels (whole waves
+        with None) and yields the number of labels of every chunk.
+        """
+        num_targets, num_cells = field.shape
+        flat_field = field.reshape(-1)
+        is_target = np.zeros(flat_field.size, dtype=bool)
+        is_target[target_cells + np.arange(num_targets) * num_cells] = True
+
+        # 1. Labels next to a dearer tile may have lost the path their value came from. A label
+        # whose neighbours can no longer support its value is reset, and its neighbours are
+        # checked in turn; labels with another path of the same cost (common on a grid) stay
+        frontier = np.flatnonzero(self._dilate(dearer).reshape(-1) & np.isfinite(flat_field) & ~is_target)
+        reset = np.zeros(flat_field.size, dtype=bool)
+        while frontier.size:
+            chunk, frontier = _split_chunk(frontier, chunk_labels)
+            best_values = self._best_neighbours(flat_field, costs, chunk)[0]
+            unsupported = chunk[best_values > flat_field[chunk] + FIELD_EPSILON]
+            flat_field[unsupported] = np.inf
+            reset[unsupported] = True
+            checks = self._neighbour_labels(unsupported)
+            checks = checks[np.isfinite(flat_field[checks]) & ~is_target[checks]]
+            frontier = np.concatenate([frontier, checks]) if frontier.size else checks
+            yield chunk.size
+
+        # 2. Re-solve from every finite label next to a reset label or a changed tile
+        touched = reset.reshape(num_targets, num_cells) | changed
+        seeds = self._dilate(touched).reshape(-1) & np.isfinite(flat_field)
+        before = flat_field.copy()
+        yield from self._relax(flat_field, costs, np.flatnonzero(seeds), chunk_labels)
+
+        # 3. Directions around every label whose value moved (plus the changed tiles)
+        moved = ((before != flat_field) | reset).reshape(num_targets, num_cells) | changed
+        remaining = np.flatnonzero(self._dilate(moved).reshape(-1))
+        flat_next = next_cell.reshape(-1)
+        while remaining.size:
+            labels, remaining = _split_chunk(remaining, chunk_labels)
+            cells = labels % num_cells
+            best_cells = self._best_neighbours(flat_field, costs, labels)[1]
+            best_cells[~np.isfinite(flat_field[labels])] = UNREACHABLE
+            at_target = flat_field[labels] == 0
+            best_cells[at_target] = cells[at_target] # Targets point to themselves
+            flat_next[labels] = best_cells
+            yield labels.size
+        self.updated_labels = int(np.count_nonzero(moved))
+
+    def _dilate(self, mask):
+        """Grows a (t, H*W) mask by one 4-neighbour step."""
+        padded = np.zeros((mask.shape[0], self.num_cells + 1), dtype=bool) # Last column: missing neighbour
+        padded[:, :-1] = mask
+        grown = mask.copy()
+        for neighbour in self.padded_neighbours:
+            grown |= padded[:, neighbour]
+        return grown
+
+    def _neighbour_labels(self, labels):
+        """Returns the distinct (row, neighbouring tile) labels of the given flat labels."""
+        cells = labels % self.num_cells
+        candidates = self.neighbours[cells]
+        valid = candidates != UNREACHABLE
+        neighbours = np.broadcast_to((labels - cells)[:, None], candidates.shape)[valid] + candidates[valid]
+        return np.unique(neighbours)
+
+    def _best_neighbours(self, flat_field, costs, labels):
+        """Returns the cheapest value reachable through a neighbour, and that neighbour's tile, for every flat label."""
+        flat_costs = costs.reshape(-1)
+        cells = labels % self.num_cells
+        bases = labels - cells
+        best_values = np.full(labels.size, np.inf)
+        best_cells = np.full(labels.size, UNREACHABLE, dtype=np.int64)
+        for k in range(len(NEIGHBOUR_OFFSETS)):
+            neighbour = self.neighbours[cells, k]
+            valid = neighbour != UNREACHABLE
+            neighbour_labels = bases[valid] + neighbour[valid]
+            values = np.full(labels.size, np.inf)
+            values[valid] = flat_field[neighbour_labels] + 0.5 * (flat_costs[labels[valid]] + flat_costs[neighbour_labels])
+            better = values < best_values
+            best_values[better] = values[better]
+            best_cells[better] = neighbour[better]
+        return best_values, best_cells
+
+    def _relax(self, flat_field, costs, active, chunk_labels=None):
+        """
+        Label-correcting shortest paths from the active flat labels until nothing improves.
+        A generator like _repair(): the work list is handled in chunks of at most chunk_labels
+        (whole waves with None), and every improved label joins its end once.
+        """
+        half_costs = 0.5 * costs.reshape(-1)
+        slot = np.empty(flat_field.size, dtype=np.int64) # Scratch for de-duplicating the work list
+        while active.size:
+            chunk, active = _split_chunk(active, chunk_labels)
+            cells = chunk % self.num_cells
+            bases = chunk - cells
+            values_here = flat_field[chunk] + half_costs[chunk]
+
+            # One neighbour direction at a time keeps the temporaries at the chunk size
+            improved = [active]
+            for k in range(len(NEIGHBOUR_OFFSETS)):
+                neighbour = self.neighbours[cells, k]
+                valid = neighbour != UNREACHABLE
+                labels = bases[valid] + neighbour[valid]
+                values = values_here[valid] + half_costs[labels]
+                improves = values < flat_field[labels] - FIELD_EPSILON
+                labels = labels[improves]
+                np.minimum.at(flat_field, labels, values[improves])
+                improved.append(labels)
+
+            # Every waiting or improved label stays on the work list once (no sort needed)
+            labels = np.concatenate(improved)
+            positions = np.arange(labels.size)
+            slot[labels] = positions
+            active = labels[slot[labels] == positions]
+            yield chunk.size
+
+
+def _split_chunk(labels, chunk_labels):
+    """Splits a work list into its first chunk_labels labels and the rest (everything at once with None)."""
+    if chunk_labels is None or labels.size <= chunk_labels:
+        return labels, labels[:0]
+    return labels[:chunk_labels], labels[chunk_labels:]
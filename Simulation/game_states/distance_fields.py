@@ -0,0 +1,282 @@
+# game_states/distance_fields.py
+import itertools
+
+import numpy as np
+
+# --- Walkability ---
+# Passengers may only walk on platform floor (1), platform edge (2),
+# entrance (4) and stairs (5) tiles. Empty tiles (0) and tracks (3) are blocked.
+WALKABLE_TILE_IDS = (1, 2, 4, 5)
+
+# 4-connected moves (row, col): one tile step costs 1, matching the (r, c) units
+# of the Euclidean distance it replaces. Distances are therefore Manhattan lengths
+# around the obstacles: a diagonal walk counts up to sqrt(2) times its straight line,
+# so entrances at an angle to a stairs tile read farther than those straight ahead.
+NEIGHBOUR_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+# Upper bound on (sources x grid cells) held in memory by one batched BFS
+BFS_BATCH_CELLS = 1 << 23
+
+UNREACHABLE = -1
+
+# Upper bound on (sources x compressed cells) swept at once by walking_distance_matrix()
+SWEEP_BATCH_CELLS = 1 << 21
+
+
+def walkable_mask(grid_data):
+    """Returns an (H, W) boolean array that is True on walkable tiles."""
+    grid = np.asarray(grid_data, dtype=np.int16)
+    return np.isin(grid, WALKABLE_TILE_IDS)
+
+
+def build_neighbour_table(walkable):
+    """
+    Returns an (H*W, 4) int32 table of flat neighbour indices for every cell.
+    Entries are UNREACHABLE where the neighbour is off-grid or not walkable.
+    """
+    height, width = walkable.shape
+    rows, cols = np.indices((height, width))
+    flat_walkable = walkable.ravel()
+
+    table = np.full((height * width, len(NEIGHBOUR_OFFSETS)), UNREACHABLE, dtype=np.int32)
+    for k, (dr, dc) in enumerate(NEIGHBOUR_OFFSETS):
+        nr = rows + dr
+        nc = cols + dc
+        inside = (nr >= 0) & (nr < height) & (nc >= 0) & (nc < width)
+        flat_neighbour = np.where(inside, nr * width + nc, 0).ravel()
+        valid = inside.ravel() & flat_walkable[flat_neighbour] & flat_walkable
+        table[valid, k] = flat_neighbour[valid]
+    return table
+
+
+def batched_bfs(neighbours, source_cells, num_cells, target_cells=None):
+    """
+    Runs one BFS per source cell, all sources advancing together level by level.
+
+    Every (source, cell) pair is addressed as source_index * num_cells + cell, so a
+    single frontier array covers the whole batch and each level is a handful of
+    array operations regardless of the number of sources.
+
+    :param neighbours: (num_cells, 4) table from build_neighbour_table().
+    :param source_cells: Sequence of flat source cell indices.
+    :param target_cells: Optional flat cell indices; the search stops once every
+        source has reached all of them (cells further away are left UNREACHABLE).
+    :return: (len(source_cells), num_cells) int32 step counts, UNREACHABLE where not connected.
+    """
+    num_sources = len(source_cells)
+    distances = np.full(num_sources * num_cells, UNREACHABLE, dtype=np.int32)
+
+    # Halve the memory traffic with 32-bit indices whenever the batch allows it
+    index_type = np.int32 if num_sources * num_cells < np.iinfo(np.int32).max else np.int64
+
+    frontier = np.arange(num_sources, dtype=index_type) * num_cells + np.asarray(source_cells, dtype=index_type)
+    distances[frontier] = 0
+
+    is_target = None
+    if target_cells is not None:
+        is_target = np.zeros(num_cells, dtype=bool)
+        is_target[np.asarray(target_cells, dtype=np.int64)] = True
+        targets_left = num_sources * int(is_target.sum())
+
+    level = 0
+    while frontier.size:
+        cells = frontier % num_cells
+        if is_target is not None:
+            targets_left -= int(is_target[cells].sum())
+            if targets_left <= 0:
+                break
+
+        level += 1
+        bases = frontier - cells
+
+        candidates = neighbours[cells]
+        expanded = (bases[:, None] + candidates)[candidates != UNREACHABLE]
+        expanded = expanded[distances[expanded] == UNREACHABLE]
+
+        # De-duplicate without sorting: tag every candidate with its position and keep
+        # the one whose tag survived (tags are negative, so they never clash with levels)
+        tags = -2 - np.arange(expanded.size, dtype=np.int32)
+        distances[expanded] = tags
+        frontier = expanded[distances[expanded] == tags]
+        distances[frontier] = level
+
+    return distances.reshape(num_sources, num_cells)
+
+
+def distance_fields(grid_data, sources):
+    """
+    Computes a walking-distance field for each source tile.
+
+    :param grid_data: 2D station grid.
+    :param sources: List of (r, c) tuples.
+    :return: (len(sources), H, W) float array of step counts, np.inf where unreachable.
+    """
+    walkable = walkable_mask(grid_data)
+    height, width = walkable.shape
+    num_cells = height * width
+    neighbours = build_neighbour_table(walkable)
+    source_cells = [r * width + c for r, c in sources]
+
+    fields = np.full((len(sources), num_cells), np.inf)
+    batch_size = max(1, BFS_BATCH_CELLS // max(1, num_cells))
+    for start in range(0, len(source_cells), batch_size):
+        steps = batched_bfs(neighbours, source_cells[start:start + batch_size], num_cells)
+        block = fields[start:start + batch_size]
+        reached = steps != UNREACHABLE
+        block[reached] = steps[reached]
+
+    return fields.reshape(len(sources), height, width)
+
+
+def _kept_lines(walkable):
+    """
+    Returns the rows of walkable that start or end a run of identical rows. Every other
+    row lies strictly inside a run and has the same walkable tiles as the run's bounds.
+    """
+    changes = np.flatnonzero(np.any(walkable[1:] != walkable[:-1], axis=1))
+    return np.unique(np.concatenate([[0, len(walkable) - 1], changes, changes + 1]))
+
+
+def _line_bounds(kept, positions):
+    """Returns the indices (into kept) of the kept lines at or just before / after every position."""
+    positions = np.asarray(positions, dtype=np.int64)
+    below = np.searchsorted(kept, positions, side='right') - 1
+    above = np.searchsorted(kept, positions, side='left')
+    return below, above
+
+
+def _sweep_offsets(walkable, coords, unreached, axis, reverse):
+    """
+    Offsets for one sweep of _sweep() along an axis of the (R, C) walkable mask: every run of
+    walkable tiles is its own segment, and later segments are pushed far below earlier ones so
+    a running minimum never carries a value past a blocked tile.
+    """
+    if reverse:
+        walkable, coords = np.flip(walkable, axis), -coords[::-1]
+    segments = np.cumsum(~walkable, axis=axis)
+    spread = 2.0 * (unreached + coords[-1] - coords[0] + 1.0)
+    return segments * spread + (coords if axis == 1 else coords[:, None])
+
+
+def _sweep(field, offsets, axis, reverse):
+    """
+    Relaxes the (B, R, C) field along one grid axis in one direction: every tile takes the
+    cheapest value carried to it along its run of walkable tiles, value + coordinate distance.
+
+    :return: True if any tile improved.
+    """
+    if reverse:
+        field = np.flip(field, axis + 1)
+    keys = field - offsets
+    np.minimum.accumulate(keys, axis=axis + 1, out=keys)
+    keys += offsets # Never above field: every running minimum includes the tile itself
+    changed = bool((keys < field).any())
+    field[...] = keys
+    return changed
+
+
+def walking_distance_matrix(grid_data, stair_tile_positions, entry_tile_positions):
+    """
+    Builds the (stairs x entrances) walking-distance matrix over walkable tiles.
+
+    Instead of one BFS per source over every tile, the grid is compressed first: runs of
+    identical rows (and columns) are reduced to their first and last line, which keeps
+    every shortest path but leaves a station a small fraction of its tiles. The fields of
+    all sources are then solved together on the compressed grid by alternating row and
+    column sweeps (a running minimum per run of walkable tiles, until nothing improves).
+
+    A tile inside a run reaches the compressed grid through the corners of its uniform
+    block, except for walks that never leave the run, which are straight Manhattan walks
+    along one row (or column) pattern. Both are exact, so the result matches a BFS.
+
+    :return: (S, E) float array of step counts, np.inf where an entrance cannot be reached.
+    """
+    num_stairs = len(stair_tile_positions)
+    num_entries = len(entry_tile_positions)
+    if num_stairs == 0 or num_entries == 0:
+        return np.zeros((num_stairs, num_entries))
+
+    walkable = walkable_mask(grid_data)
+    kept_rows = _kept_lines(walkable)
+    kept_cols = _kept_lines(walkable.T)
+    compressed = walkable[np.ix_(kept_rows, kept_cols)]
+    row_coords = kept_rows.astype(float)
+    col_coords = kept_cols.astype(float)
+
+    stairs = np.array(stair_tile_positions, dtype=np.int64).reshape(-1, 2)
+    entries = np.array(entry_tile_positions, dtype=np.int64).reshape(-1, 2)
+    from_stairs = num_stairs <= num_entries
+    sources, targets = (stairs, entries) if from_stairs else (entries, stairs)
+
+    # Every tile's block: the kept rows and columns around it, and the tile's offset to them
+    def corners(tiles):
+        rows_below, rows_above = _line_bounds(kept_rows, tiles[:, 0])
+        cols_below, cols_above = _line_bounds(kept_cols, tiles[:, 1])
+        indices, offsets = [], []
+        for row_index in (rows_below, rows_above):
+            for col_index in (cols_below, cols_above):
+                indices.append((row_index, col_index))
+                offsets.append(np.abs(tiles[:, 0] - kept_rows[row_index]) + np.abs(tiles[:, 1] - kept_cols[col_index]))
+        return indices, offsets
+
+    source_corners, source_offsets = corners(sources)
+    target_corners, target_offsets = corners(targets)
+    source_walkable = walkable[sources[:, 0], sources[:, 1]]
+    target_walkable = walkable[targets[:, 0], targets[:, 1]]
+
+    # Unreached tiles hold a value above any walk; both directions of one axis per pass
+    unreached = float(2 * walkable.size + 2)
+    passes = [
+        [(axis, reverse, _sweep_offsets(compressed, coords, unreached, axis, reverse)) for reverse in (False, True)]
+        for axis, coords in ((1, col_coords), (0, row_coords))
+    ]
+
+    matrix = np.full((len(sources), len(targets)), np.inf)
+    batch_size = max(1, SWEEP_BATCH_CELLS // compressed.size)
+    for start in range(0, len(sources), batch_size):
+        stop = min(start + batch_size, len(sources))
+        seeded = source_walkable[start:stop]
+        batch = np.flatnonzero(seeded)
+        field = np.full((stop - start,) + compressed.shape, unreached)
+        for (row_index, col_index), offset in zip(source_corners, source_offsets):
+            cells = (batch, row_index[start:stop][batch], col_index[start:stop][batch])
+            field[cells] = np.minimum(field[cells], offset[start:stop][batch])
+
+        # Rows and columns in turn. A pass that changes nothing leaves the field relaxed along
+        # both axes (the other axis was relaxed by the pass before), so the fields are final
+        for count in itertools.count():
+            changed = False
+            for axis, reverse, offsets in passes[count % 2]:
+                changed |= _sweep(field, offsets, axis, reverse)
+            if count and not changed:
+                break
+
+        block = np.full((stop - start, len(targets)), unreached)
+        for (row_index, col_index), offset in zip(target_corners, target_offsets):
+            np.minimum(block, field[:, row_index, col_index] + offset[None, :], out=block)
+        block[:, ~target_walkable] = unreached
+        block[~seeded] = unreached
+        matrix[start:stop] = np.where(block < unreached, block, np.inf)
+
+    # Walks that stay inside one run of identical rows (or columns) never reach a kept line
+    for axis in (0, 1):
+        kept = kept_rows if axis == 0 else kept_cols
+        pattern = walkable if axis == 0 else walkable.T
+        source_line, target_line = sources[:, axis], targets[:, axis]
+        source_below = _line_bounds(kept, source_line)[0]
+        target_below = _line_bounds(kept, target_line)[0]
+        inside = ~np.isin(source_line, kept)[:, None] & ~np.isin(target_line, kept)[None, :]
+        same_run = inside & (source_below[:, None] == target_below[None, :])
+        if not same_run.any():
+            continue
+
+        # Runs of walkable tiles along each kept line's pattern (labels are per line)
+        segment_labels = np.cumsum(~pattern, axis=1)
+        source_segment = segment_labels[kept[source_below], sources[:, 1 - axis]]
+        target_segment = segment_labels[kept[target_below], targets[:, 1 - axis]]
+        connected = same_run & (source_segment[:, None] == target_segment[None, :])
+        connected &= source_walkable[:, None] & target_walkable[None, :]
+        manhattan = np.abs(sources[:, None, :] - targets[None, :, :]).sum(axis=2)
+        matrix = np.where(connected, np.minimum(matrix, manhattan), matrix)
+
+    return matrix if from_stairs else matrix.T.copy()
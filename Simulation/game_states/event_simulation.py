@@ -0,0 +1,397 @@
+# game_states/event_simulation.py
+import csv
+import heapq
+import json
+from collections import deque
+
+import numpy as np
+
+from .queue_manager import compute_scale_parameter
+
+# --- Event Types ---
+# Events are (time, sequence, type, data) tuples on a binary heap; the sequence number keeps
+# events at the same instant in the order they were scheduled.
+EVENT_ARRIVAL = 0 # A passenger steps off a stairs tile (data: stair index)
+EVENT_JOIN = 1 # A passenger reaches the queue of the door they chose (data: entrance index)
+EVENT_BOARDED = 2 # A door finished boarding one passenger (data: (entrance index, service token))
+EVENT_TRAIN_ARRIVAL = 3 # A train stops at a platform and opens its doors (data: platform index)
+EVENT_TRAIN_DEPARTURE = 4 # The train closes its doors and leaves (data: platform index)
+
+# --- Arrival Processes ---
+# The stairs counts are daily totals. Given its total, the arrival times of a Poisson process
+# are independent draws from its rate over the day: flat for "poisson", shaped by a rate
+# profile (relative rates of equal slices of the day) for "profile".
+ARRIVALS_POISSON = "poisson"
+ARRIVALS_PROFILE = "profile"
+ARRIVAL_PROCESSES = (ARRIVALS_POISSON, ARRIVALS_PROFILE)
+
+# Hourly relative arrival rates of a commuter day from 05:00 to 24:00 (morning and evening peaks)
+COMMUTER_PROFILE = (0.3, 1.2, 2.8, 3.0, 1.8, 1.0, 0.8, 0.9, 1.0, 0.9, 1.0, 1.4, 2.6, 2.9, 1.9, 1.1, 0.7, 0.5, 0.3)
+
+# Tracks are tile ID 3: every connected run of track is one platform with its own trains
+TRACK_TILE_ID = 3
+NEIGHBOUR_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+# Arrival events between two progress / cancel checks
+PROGRESS_EVENTS = 20000
+
+
+def platform_groups(grid_data, entry_tile_positions):
+    """
+    Assigns every entrance to a platform: the connected track (tile ID 3) next to it. Doors
+    along the same track open and close with the same trains; an entrance without a track
+    next to it gets a platform of its own.
+
+    :return: Tuple (platform index per entrance, number of platforms).
+    """
+    height = len(grid_data)
+    width = len(grid_data[0]) if height else 0
+    track_label = {}
+    num_tracks = 0
+    for r in range(height):
+        for c in range(width):
+            if grid_data[r][c] != TRACK_TILE_ID or (r, c) in track_label:
+                continue
+            # Flood fill one track component
+            track_label[(r, c)] = num_tracks
+            pending = [(r, c)]
+            while pending:
+                tr, tc = pending.pop()
+                for dr, dc in NEIGHBOUR_OFFSETS:
+                    nr, nc = tr + dr, tc + dc
+                    if 0 <= nr < height and 0 <= nc < width and grid_data[nr][nc] == TRACK_TILE_ID \
+                            and (nr, nc) not in track_label:
+                        track_label[(nr, nc)] = num_tracks
+                        pending.append((nr, nc))
+            num_tracks += 1
+
+    platform_of_track = {}
+    platforms = []
+    for r, c in entry_tile_positions:
+        tracks = [track_label[(r + dr, c + dc)] for dr, dc in NEIGHBOUR_OFFSETS if (r + dr, c + dc) in track_label]
+        key = ("track", min(tracks)) if tracks else ("door", (r, c))
+        if key not in platform_of_track:
+            platform_of_track[key] = len(platform_of_track)
+        platforms.append(platform_of_track[key])
+    return np.array(platforms, dtype=np.int64), len(platform_of_track)
+
+
+def arrival_times(rng, stair_counts, day_length, profile=None):
+    """
+    Draws the arrival times of every stairs tile's daily total over [0, day_length).
+
+    :param stair_counts: (S,) passengers per stairs tile.
+    :param profile: Optional relative arrival rates of equal slices of the day (None = flat).
+    :return: List with one sorted array of arrival times (seconds) per stairs tile.
+    """
+    stair_counts = np.asarray(stair_counts, dtype=np.int64)
+    uniforms = rng.random(int(stair_counts.sum()))
+    if profile is None:
+        times = uniforms * day_length
+    else:
+        # Inverse CDF of the piecewise-constant rate: pick the slice, then a uniform point in it
+        weights = np.asarray(profile, dtype=float)
+        if weights.ndim != 1 or len(weights) == 0 or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError("The arrival profile needs non-negative rates with a positive sum")
+        cdf = np.cumsum(weights) / weights.sum()
+        slices = np.minimum(np.searchsorted(cdf, uniforms, side='right'), len(weights) - 1)
+        slice_start = np.concatenate(([0.0], cdf[:-1]))[slices]
+        within = (uniforms - slice_start) / np.maximum(cdf[slices] - slice_start, 1e-300)
+        times = (slices + np.clip(within, 0.0, 1.0)) * (day_length / len(weights))
+
+    bounds = np.concatenate(([0], np.cumsum(stair_counts)))
+    return [np.sort(times[bounds[s]:bounds[s + 1]]) for s in range(len(stair_counts))]
+
+
+class EventScheduler:
+    """Binary-heap event list: schedule() in any order, pop() returns the earliest event."""
+    def __init__(self):
+        self.heap = []
+        self.sequence = 0
+        self.now = 0.0
+        self.processed = 0
+
+    def schedule(self, time, event_type, data=None):
+        heapq.heappush(self.heap, (time, self.sequence, event_type, data))
+        self.sequence += 1
+
+    def pop(self):
+        """Removes the earliest event, advances the clock to it and returns (time, type, data)."""
+        time, _, event_type, data = heapq.heappop(self.heap)
+        self.now = time
+        self.processed += 1
+        return time, event_type, data
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class DayEventSimulation:
+    """
+    Discrete-event simulation of an operating day, next to the QueueManager choice model.
+
+    Nothing is ticked: the simulation jumps from event to event. Passengers arrive at the
+    stairs over the day, choose a door with the MIXL model against the queues at that moment
+    (like the sequential mode), walk there, and queue. Every platform gets a train every
+    `headway` seconds that stays `dwell` seconds; while it is in, each of its doors boards
+    one passenger every 1 / door_rate seconds, first come first served, up to
+    `door_capacity` passengers per train. Only one arrival per stairs tile is pending on
+    the heap at a time, so the heap stays at about stairs + doors + platforms events.
+    """
+    def __init__(self, queue_manager, rationality_factor, k_length_ratio, day_length, headway, dwell,
+                 door_rate, walk_speed, arrivals=ARRIVALS_POISSON, profile=None, door_capacity=None,
+                 seed=None):
+        """
+        :param queue_manager: QueueManager with the layout, choice model and daily totals (spawn_data).
+        :param day_length: Seconds in which passengers arrive; trains run until then.
+        :param headway: Seconds between two trains at a platform.
+        :param dwell: Seconds a train keeps its doors open.
+        :param door_rate: Passengers per second boarding through one door.
+        :param walk_speed: Tiles per second from the stairs to the door (0 = no walking time).
+        :param arrivals: ARRIVALS_POISSON (flat rate) or ARRIVALS_PROFILE (rates from `profile`).
+        :param profile: Relative arrival rates of equal slices of the day (ARRIVALS_PROFILE only).
+        :param door_capacity: Optional passengers boarding one door per train (None = no limit).
+        :param seed: Seed of the arrival times (the preferences use the manager's sampler and RNG).
+        """
+        if arrivals not in ARRIVAL_PROCESSES:
+            raise ValueError(f"Unknown arrival process: {arrivals}")
+        if day_length <= 0 or headway <= 0 or dwell < 0 or door_rate <= 0:
+            raise ValueError("day_length, headway and door_rate must be positive and dwell non-negative")
+
+        self.queue_manager = queue_manager
+        self.day_length = float(day_length)
+        self.headway = float(headway)
+        self.dwell = float(dwell)
+        self.service_time = 1.0 / door_rate
+        self.walk_speed = float(walk_speed)
+        self.arrivals = arrivals
+        self.door_capacity = door_capacity
+        self.rng = np.random.default_rng(seed)
+
+        self.entry_positions = list(queue_manager.entry_tile_positions)
+        self.num_entries = len(self.entry_positions)
+        self.platforms, self.num_platforms = platform_groups(queue_manager.grid_data or [], self.entry_positions)
+        self.platform_doors = [np.flatnonzero(self.platforms == p).tolist() for p in range(self.num_platforms)]
+
+        # --- Passengers: arrival times per stair and pre-drawn preferences (scaled by MU) ---
+        self.stair_counts = queue_manager._stair_counts()
+        self.stair_times = arrival_times(
+            self.rng, self.stair_counts, self.day_length, profile if arrivals == ARRIVALS_PROFILE else None
+        )
+        agent_stairs = np.repeat(np.arange(len(self.stair_counts)), self.stair_counts)
+        THETA = queue_manager.population_theta(k_length_ratio)
+        agent_betas, uniforms = queue_manager._draw_agent_preferences(agent_stairs, THETA)
+        agent_betas *= compute_scale_parameter(rationality_factor)
+        self.beta_distance = agent_betas[:, 0].tolist() # Lists: cheap scalar access per event
+        self.beta_length = agent_betas[:, 1].tolist()
+        self.uniforms = uniforms.tolist()
+        self.stair_offsets = np.concatenate(([0], np.cumsum(self.stair_counts)))[:-1].tolist()
+        self.next_passenger = [0] * len(self.stair_counts) # Passengers of each stair arrived so far
+
+        # Every stair only evaluates the doors it can reach (on separate platforms, a small share)
+        distances = queue_manager._get_cached_distances()[0]
+        self.stair_entries, self.stair_distances, self.stair_walk_times = [], [], []
+        for stair in range(len(self.stair_counts)):
+            entries = np.flatnonzero(np.isfinite(distances[stair])) if self.num_entries else np.zeros(0, dtype=np.int64)
+            self.stair_entries.append(entries)
+            self.stair_distances.append(distances[stair, entries])
+            walk_times = distances[stair, entries] / self.walk_speed if self.walk_speed > 0 else np.zeros(len(entries))
+            self.stair_walk_times.append(walk_times.tolist())
+
+        # --- Door state ---
+        self.waiting = np.zeros(self.num_entries) # Live queue lengths (what arriving passengers see)
+        self.queues = [deque() for _ in range(self.num_entries)] # Join times, first come first served
+        self.door_open = [False] * self.num_entries
+        self.door_busy = [False] * self.num_entries
+        self.service_token = [0] * self.num_entries # Bumped on departure: pending boardings are void
+        self.train_load = [0] * self.num_entries # Passengers boarded through the door on the current train
+
+        # --- Statistics ---
+        self.boarded = [0] * self.num_entries
+        self.total_wait = [0.0] * self.num_entries
+        self.max_wait = [0.0] * self.num_entries
+        self.max_queue = [0] * self.num_entries
+        self.queue_area = [0.0] * self.num_entries # Integral of the queue length over time
+        self.last_change = [0.0] * self.num_entries
+        self.trains = 0
+        self.boarding_times = []
+        self.wait_times = []
+
+        self.scheduler = EventScheduler()
+        self.cancelled = False
+
+    # --- Event handlers ---
+
+    def _arrival(self, now, stair):
+        """A passenger leaves the stairs, chooses a door against the live queues and walks there."""
+        n = self.stair_offsets[stair] + self.next_passenger[stair]
+        self.next_passenger[stair] += 1
+
+        entries = self.stair_entries[stair]
+        utilities = self.stair_distances[stair] * self.beta_distance[n] + self.waiting[entries] * self.beta_length[n]
+        utilities -= utilities.max()
+        cumulative = np.cumsum(np.exp(utilities))
+        choice = min(int(np.searchsorted(cumulative, self.uniforms[n] * cumulative[-1], side='right')),
+                     len(entries) - 1)
+        self.scheduler.schedule(now + self.stair_walk_times[stair][choice], EVENT_JOIN, int(entries[choice]))
+
+        # Keep exactly one pending arrival per stairs tile on the heap
+        times = self.stair_times[stair]
+        if self.next_passenger[stair] < len(times):
+            self.scheduler.schedule(float(times[self.next_passenger[stair]]), EVENT_ARRIVAL, stair)
+
+    def _join(self, now, entrance):
+        self._record_queue(now, entrance)
+        self.waiting[entrance] += 1.0
+        self.queues[entrance].append(now)
+        self.max_queue[entrance] = max(self.max_queue[entrance], len(self.queues[entrance]))
+        self._start_boarding(now, entrance)
+
+    def _boarded(self, now, data):
+        entrance, token = data
+        if token != self.service_token[entrance]:
+            return # The train left before this passenger got in
+        self._record_queue(now, entrance)
+        self.waiting[entrance] -= 1.0
+        wait = now - self.queues[entrance].popleft()
+        self.total_wait[entrance] += wait
+        self.max_wait[entrance] = max(self.max_wait[entrance], wait)
+        self.wait_times.append(wait)
+        self.boarding_times.append(now)
+        self.boarded[entrance] += 1
+        self.train_load[entrance] += 1
+        self.door_busy[entrance] = False
+        self._start_boarding(now, entrance)
+
+    def _train_arrival(self, now, platform):
+        self.trains += 1
+        for entrance in self.platform_doors[platform]:
+            self.door_open[entrance] = True
+            self.train_load[entrance] = 0
+            self._start_boarding(now, entrance)
+        self.scheduler.schedule(now + self.dwell, EVENT_TRAIN_DEPARTURE, platform)
+        if now + self.headway < self.day_length:
+            self.scheduler.schedule(now + self.headway, EVENT_TRAIN_ARRIVAL, platform)
+
+    def _train_departure(self, now, platform):
+        for entrance in self.platform_doors[platform]:
+            self.door_open[entrance] = False
+            self.door_busy[entrance] = False
+            self.service_token[entrance] += 1
+
+    def _start_boarding(self, now, entrance):
+        """Starts boarding the next passenger if the door is open, idle, has a queue and the train has room."""
+        if not self.door_open[entrance] or self.door_busy[entrance] or not self.queues[entrance]:
+            return
+        if self.door_capacity is not None and self.train_load[entrance] >= self.door_capacity:
+            return
+        self.door_busy[entrance] = True
+        self.scheduler.schedule(now + self.service_time, EVENT_BOARDED, (entrance, self.service_token[entrance]))
+
+    def _record_queue(self, now, entrance):
+        """Adds the queue length held since the last change to the time-weighted queue integral."""
+        self.queue_area[entrance] += len(self.queues[entrance]) * (now - self.last_change[entrance])
+        self.last_change[entrance] = now
+
+    # --- Run ---
+
+    def run(self, progress_cb=None, cancel_cb=None):
+        """
+        Processes events until the day is over and every arrived passenger has boarded or no train
+        is left to board them.
+
+        :param progress_cb: Optional callable receiving the completed fraction of the day (0..1).
+        :param cancel_cb: Optional callable; when it returns True the run stops where it is.
+        :return: report() of the (possibly partial) day.
+        """
+        scheduler = self.scheduler
+        for stair, times in enumerate(self.stair_times):
+            if len(times) and len(self.stair_entries[stair]):
+                scheduler.schedule(float(times[0]), EVENT_ARRIVAL, stair)
+        # Trains of different platforms are staggered over the headway
+        for platform in range(self.num_platforms):
+            scheduler.schedule(self.headway * platform / max(1, self.num_platforms), EVENT_TRAIN_ARRIVAL, platform)
+
+        handlers = {
+            EVENT_ARRIVAL: self._arrival,
+            EVENT_JOIN: self._join,
+            EVENT_BOARDED: self._boarded,
+            EVENT_TRAIN_ARRIVAL: self._train_arrival,
+            EVENT_TRAIN_DEPARTURE: self._train_departure,
+        }
+        self.cancelled = False
+        while scheduler:
+            now, event_type, data = scheduler.pop()
+            handlers[event_type](now, data)
+            if scheduler.processed % PROGRESS_EVENTS == 0:
+                if progress_cb is not None:
+                    progress_cb(min(1.0, now / self.day_length))
+                if cancel_cb is not None and cancel_cb():
+                    self.cancelled = True
+                    break
+
+        for entrance in range(self.num_entries):
+            self._record_queue(scheduler.now, entrance)
+        if progress_cb is not None:
+            progress_cb(1.0)
+        return self.report()
+
+    def report(self):
+        """Returns the JSON-serialisable day summary: totals, waits and per-entrance queue statistics."""
+        end = max(self.scheduler.now, 1e-9)
+        arrived = sum(self.next_passenger)
+        wait_times = np.asarray(self.wait_times)
+        hours = int(np.ceil(self.day_length / 3600.0))
+        arrivals_per_hour = np.zeros(hours, dtype=np.int64)
+        for s, times in enumerate(self.stair_times):
+            arrivals_per_hour += np.bincount(
+                (times[:self.next_passenger[s]] // 3600).astype(np.int64), minlength=hours)[:hours]
+        boarded_per_hour = np.bincount(
+            np.minimum(np.asarray(self.boarding_times) // 3600, hours - 1).astype(np.int64), minlength=hours)
+
+        entrances = {}
+        for e, (r, c) in enumerate(self.entry_positions):
+            entrances[f"Entry [{r},{c}]"] = {
+                "platform": int(self.platforms[e]),
+                "boarded": self.boarded[e],
+                "mean_wait": float(self.total_wait[e] / self.boarded[e]) if self.boarded[e] else None,
+                "max_wait": float(self.max_wait[e]),
+                "mean_queue": float(self.queue_area[e] / end),
+                "max_queue": self.max_queue[e],
+                "left_waiting": len(self.queues[e]),
+            }
+        return {
+            "day_length": self.day_length,
+            "arrivals": self.arrivals,
+            "headway": self.headway,
+            "dwell": self.dwell,
+            "door_rate": 1.0 / self.service_time,
+            "door_capacity": self.door_capacity,
+            "platforms": self.num_platforms,
+            "passengers": int(self.stair_counts.sum()),
+            "arrived": arrived,
+            "boarded": sum(self.boarded),
+            "left_waiting": int(sum(len(queue) for queue in self.queues)),
+            "trains": self.trains,
+            "events": self.scheduler.processed,
+            "end_time": float(self.scheduler.now),
+            "cancelled": self.cancelled,
+            "mean_wait": float(wait_times.mean()) if len(wait_times) else None,
+            "p95_wait": float(np.percentile(wait_times, 95)) if len(wait_times) else None,
+            "max_wait": float(wait_times.max()) if len(wait_times) else None,
+            "hourly": {"arrivals": arrivals_per_hour.tolist(), "boarded": boarded_per_hour[:hours].tolist()},
+            "entrances": entrances,
+        }
+
+
+def save_day_report(json_path, csv_path, report):
+    """Writes a DayEventSimulation report as JSON (everything) and as a CSV table with one row per entrance."""
+    with open(json_path, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    columns = ["platform", "boarded", "mean_wait", "max_wait", "mean_queue", "max_queue", "left_waiting"]
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Entrance"] + columns)
+        for name, values in report["entrances"].items():
+            writer.writerow([name] + [values[column] for column in columns])
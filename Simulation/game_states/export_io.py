@@ -0,0 +1,272 @@
+# game_states/export_io.py
+import ast
+import csv
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+# --- Constants ---
+# Rows are buffered in memory and handed to the csv module in chunks of this size
+CSV_BUFFER_ROWS = 4096
+
+# Columnar exports store counts as little-endian int32 in a .npy file whose header is
+# reserved at a fixed size, so the round count can be rewritten in place on every append
+COUNT_DTYPE = np.dtype('<i4')
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_HEADER_BYTES = 128
+
+
+class StreamingCsvWriter:
+    """
+    Constant-memory CSV writer for simulation exports.
+
+    Rows are buffered in small chunks and written as rounds finish. Every
+    checkpoint_rows rows the file is flushed (and fsync'ed) so a crashed or
+    cancelled run still leaves a usable partial export. With compress=True the
+    output is gzip'ed, and each checkpoint is a gzip sync flush, so the partial
+    file can be decompressed up to the last checkpoint.
+
+    Use as a context manager:
+        with StreamingCsvWriter(path, header) as writer:
+            writer.write_rows(rows)
+    """
+    def __init__(self, path, header, compress=False, checkpoint_rows=50000):
+        """
+        :param path: Output path; '.gz' is appended when compress=True and missing.
+        :param header: List of column names written as the first row.
+        :param compress: Write a gzip-compressed CSV.
+        :param checkpoint_rows: Rows between flush-to-disk checkpoints (None = only at close).
+        """
+        path = Path(path)
+        if compress and path.suffix != '.gz':
+            path = path.with_name(path.name + '.gz')
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.path = path
+        self.compress = compress
+        self.checkpoint_rows = checkpoint_rows
+        self.rows_written = 0
+        self._rows_since_checkpoint = 0
+        self._buffer = []
+
+        if compress:
+            self._raw_file = gzip.open(path, 'wb')
+            self._file = io.TextIOWrapper(self._raw_file, newline='')
+        else:
+            self._raw_file = None
+            self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def write_row(self, row):
+        """Buffers a single row."""
+        self._buffer.append(row)
+        if len(self._buffer) >= CSV_BUFFER_ROWS:
+            self._drain()
+
+    def write_rows(self, rows):
+        """Buffers several rows, draining to disk as the buffer fills."""
+        for row in rows:
+            self.write_row(row)
+
+    def checkpoint(self):
+        """Writes all buffered rows and forces them to disk."""
+        self._drain(force_checkpoint=True)
+
+    def close(self):
+        """Writes the remaining rows and closes the file."""
+        if self._file is None:
+            return
+        self._drain()
+        self._file.close()
+        self._file = None
+
+    def _drain(self, force_checkpoint=False):
+        """Hands the buffered rows to the csv writer and checkpoints when due."""
+        if self._buffer:
+            self._writer.writerows(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._rows_since_checkpoint += len(self._buffer)
+            self._buffer = []
+
+        due = self.checkpoint_rows and self._rows_since_checkpoint >= self.checkpoint_rows
+        if force_checkpoint or due:
+            self._flush_to_disk()
+            self._rows_since_checkpoint = 0
+
+    def _flush_to_disk(self):
+        """Flushes the text layer, the gzip stream (sync flush) and the OS buffers."""
+        self._file.flush()
+        if self._raw_file is not None:
+            self._raw_file.flush()
+            os.fsync(self._raw_file.fileobj.fileno())
+        else:
+            os.fsync(self._file.fileno())
+
+
+def _npy_header(num_rounds, num_columns):
+    """Builds the fixed-size version 1.0 .npy header for a (num_rounds, num_columns) count array."""
+    header = f"{{'descr': '{COUNT_DTYPE.str}', 'fortran_order': False, 'shape': ({num_rounds}, {num_columns}), }}"
+    header_len = NPY_HEADER_BYTES - len(NPY_MAGIC) - 2
+    header = header.ljust(header_len - 1) + '\n'
+    return NPY_MAGIC + header_len.to_bytes(2, 'little') + header.encode('latin1')
+
+
+def _read_npy_shape(handle):
+    """Returns the shape stored in a header written by _npy_header, or None if it does not match."""
+    preamble = handle.read(NPY_HEADER_BYTES)
+    if len(preamble) < NPY_HEADER_BYTES or not preamble.startswith(NPY_MAGIC):
+        return None
+    header_len = int.from_bytes(preamble[len(NPY_MAGIC):len(NPY_MAGIC) + 2], 'little')
+    if len(NPY_MAGIC) + 2 + header_len != NPY_HEADER_BYTES:
+        return None
+    header = ast.literal_eval(preamble[len(NPY_MAGIC) + 2:].decode('latin1'))
+    if header.get('descr') != COUNT_DTYPE.str or header.get('fortran_order'):
+        return None
+    return header['shape']
+
+
+class ColumnarCountWriter:
+    """
+    Binary companion of the CSV export: a (rounds x entrances) int32 .npy file plus a
+    small JSON header (same name, .json) with the spawn and entry positions and the
+    parameters of every run written to it.
+
+    Blocks are appended straight to the end of the file; the round count in the .npy
+    header is rewritten in place at every checkpoint and at close. With append=True a
+    later export with the same spawn and entry positions is added after the rounds
+    already in the file, so one file can grow across many runs.
+
+    The result loads zero-copy with np.load(path, mmap_mode='r'), see load_columnar_export().
+    """
+    def __init__(self, path, spawn_data, entry_positions, run_parameters,
+                 append=False, checkpoint_rows=50000):
+        """
+        :param path: Output .npy path.
+        :param spawn_data: Dictionary mapping stair tiles to their spawn count (stored in the JSON header).
+        :param entry_positions: List of (r, c) entry tiles, in column order.
+        :param run_parameters: Dictionary describing this run (k, rationality, mode, seed, ...).
+        :param append: Continue an existing file with the same positions instead of replacing it.
+        :param checkpoint_rows: Rows between header rewrites and flushes to disk.
+        """
+        self.path = Path(path)
+        self.header_path = self.path.with_suffix('.json')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.num_columns = len(entry_positions)
+        self.checkpoint_rows = checkpoint_rows
+        self._rows_since_checkpoint = 0
+
+        spawn_positions = sorted(spawn_data.keys())
+        self.metadata = {
+            "format": "npy int32 (rounds x entrances), columns ordered like entry_positions",
+            "entry_positions": [list(pos) for pos in entry_positions],
+            "spawn_positions": [list(pos) for pos in spawn_positions],
+            "spawn_counts": [spawn_data[pos] for pos in spawn_positions],
+            "runs": []
+        }
+
+        self.num_rounds = 0
+        if append:
+            self.num_rounds = self._resume_existing()
+
+        if self.num_rounds == 0:
+            self._file = open(self.path, 'wb')
+            self._file.write(_npy_header(0, self.num_columns))
+        else:
+            # Drop anything past the last recorded round (e.g. an interrupted write) and continue
+            self._file = open(self.path, 'r+b')
+            self._file.truncate(NPY_HEADER_BYTES + self.num_rounds * self.num_columns * COUNT_DTYPE.itemsize)
+            self._file.seek(0, os.SEEK_END)
+
+        self.run = dict(run_parameters, first_round=self.num_rounds, rounds=0)
+        self.metadata["runs"].append(self.run)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _resume_existing(self):
+        """Loads the header of an existing export with matching positions; returns its round count (0 = start fresh)."""
+        if not (self.path.exists() and self.header_path.exists()):
+            return 0
+
+        with open(self.header_path) as f:
+            previous = json.load(f)
+        with open(self.path, 'rb') as f:
+            shape = _read_npy_shape(f)
+
+        same_layout = (
+            shape is not None and shape[1] == self.num_columns
+            and previous.get("entry_positions") == self.metadata["entry_positions"]
+            and previous.get("spawn_positions") == self.metadata["spawn_positions"]
+        )
+        if not same_layout:
+            print(f"Columnar export: {self.path} has a different layout, starting a new file.")
+            return 0
+
+        self.metadata["runs"] = previous.get("runs", [])
+        return shape[0]
+
+    def write_block(self, counts):
+        """Appends a (rounds x entrances) block of counts."""
+        block = np.ascontiguousarray(counts, dtype=COUNT_DTYPE)
+        if block.ndim != 2 or block.shape[1] != self.num_columns:
+            raise ValueError(f"Expected a (rounds x {self.num_columns}) block, got shape {block.shape}")
+
+        self._file.write(block.tobytes())
+        self.num_rounds += block.shape[0]
+        self.run["rounds"] += block.shape[0]
+        self._rows_since_checkpoint += block.shape[0]
+
+        if self.checkpoint_rows and self._rows_since_checkpoint >= self.checkpoint_rows:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Rewrites the round count and the JSON header so the file is loadable up to this point."""
+        end = self._file.tell()
+        self._file.seek(0)
+        self._file.write(_npy_header(self.num_rounds, self.num_columns))
+        self._file.seek(end)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        with open(self.header_path, 'w') as f:
+            json.dump(self.metadata, f, indent=4)
+        self._rows_since_checkpoint = 0
+
+    def close(self):
+        """Finalises the header and closes the file."""
+        if self._file is None:
+            return
+        self.checkpoint()
+        self._file.close()
+        self._file = None
+
+
+def load_columnar_export(path):
+    """
+    Opens a columnar export without reading it into memory.
+
+    :param path: Path of the .npy file written by ColumnarCountWriter.
+    :return: (counts, metadata) where counts is a read-only (rounds x entrances)
+        memory map and metadata is the parsed JSON header.
+    """
+    path = Path(path)
+    with open(path.with_suffix('.json')) as f:
+        metadata = json.load(f)
+    return np.load(path, mmap_mode='r'), metadata
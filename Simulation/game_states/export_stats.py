@@ -0,0 +1,193 @@
+# game_states/export_stats.py
+import numpy as np
+
+# z value of a two-sided 95% normal confidence interval
+Z_95 = 1.959963984540054
+
+
+class RunningMoments:
+    """
+    One-pass (Welford-style) mean and variance for every column of a stream of
+    (rounds x entrances) count blocks. Whole blocks are merged with Chan's parallel
+    update, so memory stays constant however many rounds are streamed through.
+    """
+    def __init__(self, num_columns):
+        self.count = 0
+        self.mean = np.zeros(num_columns)
+        self.m2 = np.zeros(num_columns) # Sum of squared deviations from the mean
+
+    def update(self, block):
+        """Merges a (rounds x columns) block of observations."""
+        block = np.asarray(block, dtype=float)
+        block_count = block.shape[0]
+        if block_count == 0:
+            return
+
+        block_mean = block.mean(axis=0)
+        block_m2 = ((block - block_mean) ** 2).sum(axis=0)
+
+        total = self.count + block_count
+        delta = block_mean - self.mean
+        self.mean += delta * (block_count / total)
+        self.m2 += block_m2 + delta ** 2 * (self.count * block_count / total)
+        self.count = total
+
+    def variance(self):
+        """Sample variance (ddof=1) of every column; zero until two observations exist."""
+        if self.count < 2:
+            return np.zeros_like(self.m2)
+        return self.m2 / (self.count - 1)
+
+    def ci_half_widths(self, z=Z_95):
+        """Half-width of the confidence interval of every column mean (95% by default)."""
+        if self.count == 0:
+            return np.full_like(self.mean, np.inf)
+        return z * np.sqrt(self.variance() / self.count)
+
+
+# --- Export Summary ---
+# Queue counts are bounded integers (0 .. total passengers), so a fixed histogram with
+# one bin per value gives exact quantiles; very large pools fall back to wider bins.
+HISTOGRAM_MAX_BINS = 1024
+SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def gini_index(counts):
+    """
+    Gini imbalance index of every row of a (rounds x entrances) count array:
+    0 when all entrances get the same queue, (E - 1) / E when one entrance gets everyone.
+    Rows without passengers count as perfectly balanced.
+    """
+    counts = np.sort(np.asarray(counts, dtype=float), axis=1)
+    num_columns = counts.shape[1]
+    totals = counts.sum(axis=1)
+    ranks = np.arange(1, num_columns + 1)
+
+    gini = np.zeros(counts.shape[0])
+    filled = totals > 0
+    gini[filled] = (2.0 * (counts[filled] @ ranks) / (num_columns * totals[filled])
+                    - (num_columns + 1.0) / num_columns)
+    return gini
+
+
+def max_mean_ratio(counts):
+    """Longest queue divided by the mean queue for every row (1 = balanced, 0 for empty rows)."""
+    counts = np.asarray(counts, dtype=float)
+    means = counts.mean(axis=1)
+    ratio = np.zeros(counts.shape[0])
+    filled = means > 0
+    ratio[filled] = counts[filled].max(axis=1) / means[filled]
+    return ratio
+
+
+class ExportSummary:
+    """
+    One-pass summary of a streamed export, updated block by block so huge runs need no
+    second pass over the data.
+
+    Per entrance: mean, variance, min, max and a fixed-size histogram (quantiles).
+    Across entrances: per-round max/mean queue ratio and Gini index (mean, spread, worst).
+    """
+    def __init__(self, column_names, max_value, num_bins=HISTOGRAM_MAX_BINS):
+        """
+        :param column_names: One label per count column (e.g. "Entry [7,3]").
+        :param max_value: Largest possible count (the total passenger pool).
+        :param num_bins: Maximum number of histogram bins per column.
+        """
+        self.column_names = list(column_names)
+        num_columns = len(self.column_names)
+
+        self.moments = RunningMoments(num_columns)
+        self.minimum = np.full(num_columns, np.inf)
+        self.maximum = np.full(num_columns, -np.inf)
+
+        self.bin_width = max(1, -(-(int(max_value) + 1) // num_bins))
+        self.num_bins = -(-(int(max_value) + 1) // self.bin_width)
+        self.histogram = np.zeros((num_columns, self.num_bins), dtype=np.int64)
+
+        self.ratio_moments = RunningMoments(1)
+        self.gini_moments = RunningMoments(1)
+        self.worst_ratio = 0.0
+        self.worst_gini = 0.0
+
+    def update(self, block):
+        """Merges a (rounds x columns) block of integer counts."""
+        block = np.asarray(block)
+        if block.shape[0] == 0:
+            return
+        num_columns = block.shape[1]
+
+        self.moments.update(block)
+        self.minimum = np.minimum(self.minimum, block.min(axis=0))
+        self.maximum = np.maximum(self.maximum, block.max(axis=0))
+
+        # All columns in one bincount: column j's bins live at j * num_bins + bin
+        bins = np.minimum(block // self.bin_width, self.num_bins - 1)
+        flat = (bins + np.arange(num_columns) * self.num_bins).ravel()
+        self.histogram += np.bincount(flat, minlength=num_columns * self.num_bins).reshape(num_columns, self.num_bins)
+
+        if num_columns:
+            ratios = max_mean_ratio(block)
+            ginis = gini_index(block)
+            self.ratio_moments.update(ratios[:, None])
+            self.gini_moments.update(ginis[:, None])
+            self.worst_ratio = max(self.worst_ratio, float(ratios.max()))
+            self.worst_gini = max(self.worst_gini, float(ginis.max()))
+
+    def quantiles(self, probabilities=SUMMARY_QUANTILES):
+        """
+        Returns a (len(probabilities), columns) array of quantiles read from the histograms
+        (exact when every bin holds a single value, bin centres clipped to the observed range otherwise).
+        """
+        cumulative = np.cumsum(self.histogram, axis=1)
+        result = np.zeros((len(probabilities), self.histogram.shape[0]))
+        if self.moments.count == 0:
+            return result
+
+        for i, p in enumerate(probabilities):
+            rank = np.ceil(p * self.moments.count)
+            first_bin = (cumulative < max(rank, 1)).sum(axis=1)
+            result[i] = first_bin * self.bin_width + (self.bin_width - 1) / 2.0
+        return np.clip(result, self.minimum, self.maximum)
+
+    def to_dict(self):
+        """Returns the summary as a JSON-serialisable dictionary."""
+        mean = self.moments.mean
+        variance = self.moments.variance()
+        std = np.sqrt(variance)
+        half_widths = self.moments.ci_half_widths()
+        quantiles = self.quantiles()
+
+        entrances = {}
+        for j, name in enumerate(self.column_names):
+            entrances[name] = {
+                "mean": float(mean[j]),
+                "std": float(std[j]),
+                "variance": float(variance[j]),
+                "ci95_half_width": float(half_widths[j]),
+                "min": int(self.minimum[j]) if self.moments.count else None,
+                "max": int(self.maximum[j]) if self.moments.count else None,
+                "quantiles": {f"p{int(p * 100):02d}": float(q) for p, q in zip(SUMMARY_QUANTILES, quantiles[:, j])}
+            }
+
+        # Imbalance of the average distribution, next to the average per-round imbalance
+        mean_row = mean[None, :]
+        return {
+            "rounds": int(self.moments.count),
+            "histogram_bin_width": self.bin_width,
+            "entrances": entrances,
+            "imbalance": {
+                "max_mean_ratio": {
+                    "mean": float(self.ratio_moments.mean[0]),
+                    "std": float(np.sqrt(self.ratio_moments.variance()[0])),
+                    "worst": self.worst_ratio,
+                    "of_mean_queues": float(max_mean_ratio(mean_row)[0]) if mean.size else 0.0
+                },
+                "gini": {
+                    "mean": float(self.gini_moments.mean[0]),
+                    "std": float(np.sqrt(self.gini_moments.variance()[0])),
+                    "worst": self.worst_gini,
+                    "of_mean_queues": float(gini_index(mean_row)[0]) if mean.size else 0.0
+                }
+            }
+        }
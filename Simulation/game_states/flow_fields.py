@@ -0,0 +1,181 @@
+# game_states/flow_fields.py
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .distance_fields import (
+    walkable_mask, build_neighbour_table, batched_bfs, NEIGHBOUR_OFFSETS, BFS_BATCH_CELLS, UNREACHABLE
+)
+
+# --- Flow Field Constants ---
+# Agents never search for paths themselves: every navigation target (entrance or stairs tile)
+# has one integration field (walking steps to the target from every tile) and one direction
+# field (the neighbouring tile that is one step closer), shared by every agent heading there.
+TARGET_TILE_IDS = (4, 5) # Entrances (boarding) and stairs (exits), precomputed per layout
+
+# Flow field sets kept in memory, keyed by the walkable tiles of a layout (LRU)
+FLOW_FIELD_CACHE_SIZE = 8
+_FLOW_FIELD_CACHE = OrderedDict()
+
+
+def walkable_key(walkable):
+    """Returns a stable hash of a walkable mask (retyping tiles that stay walkable keeps the key)."""
+    digest = hashlib.sha1()
+    digest.update(repr(walkable.shape).encode())
+    digest.update(np.packbits(walkable).tobytes())
+    return digest.hexdigest()
+
+
+def get_flow_fields(grid_data):
+    """
+    Returns the FlowFieldSet of a layout, making sure the fields of all its entrance and stairs
+    tiles exist. A layout seen before is served from the cache; a new one starts from the most
+    recently used set, so an edit only rebuilds the targets whose reachable area it touches.
+    """
+    walkable = walkable_mask(grid_data)
+    key = walkable_key(walkable)
+    flow_fields = _FLOW_FIELD_CACHE.get(key)
+    if flow_fields is None:
+        previous = next(reversed(_FLOW_FIELD_CACHE.values()), None)
+        flow_fields = FlowFieldSet(walkable, previous)
+        _FLOW_FIELD_CACHE[key] = flow_fields
+        if len(_FLOW_FIELD_CACHE) > FLOW_FIELD_CACHE_SIZE:
+            _FLOW_FIELD_CACHE.popitem(last=False)
+    else:
+        _FLOW_FIELD_CACHE.move_to_end(key)
+
+    grid = np.asarray(grid_data, dtype=np.int16)
+    rows, cols = np.nonzero(np.isin(grid, TARGET_TILE_IDS))
+    flow_fields.ensure(list(zip(rows.tolist(), cols.tolist())))
+    return flow_fields
+
+
+def clear_flow_field_cache():
+    """Drops every cached flow field set."""
+    _FLOW_FIELD_CACHE.clear()
+
+
+class FlowFieldSet:
+    """
+    Integration and direction fields of every navigation target on one walkable mask.
+
+    Fields are stored per target tile as flat (H*W,) int32 arrays: integration[target][cell]
+    is the number of steps from cell to the target (UNREACHABLE if cut off) and
+    next_cell[target][cell] is the flat index of the neighbouring tile one step closer
+    (the target points to itself).
+    """
+    def __init__(self, walkable, previous=None):
+        """
+        :param walkable: (H, W) boolean mask from walkable_mask().
+        :param previous: Optional FlowFieldSet of an earlier layout with the same grid size. Fields
+            of targets the walkability changes cannot reach are copied instead of rebuilt.
+        """
+        self.walkable = walkable
+        self.height, self.width = walkable.shape
+        self.num_cells = self.height * self.width
+        self.neighbours = build_neighbour_table(walkable)
+
+        self.integration = {}
+        self.next_cell = {}
+        self.reused_targets = 0 # Targets copied from `previous` (edit diagnostics)
+        self.built_targets = 0
+
+        if previous is not None and previous.walkable.shape == walkable.shape:
+            self._reuse_unaffected(previous)
+
+    def _reuse_unaffected(self, previous):
+        """
+        Copies the fields of `previous` that the walkability changes cannot alter. A target's
+        field changes only if a changed tile, or a neighbour of one, was reachable from it:
+        removing a tile needs the tile on a path, and a new tile only joins next to reached ones.
+        """
+        changed = previous.walkable != self.walkable
+        touched = changed.copy()
+        for dr, dc in NEIGHBOUR_OFFSETS:
+            touched |= np.roll(changed, (dr, dc), axis=(0, 1)) # Wrapped edges only add false positives
+        touched_cells = np.flatnonzero(touched)
+
+        for target, integration in previous.integration.items():
+            if not self.walkable[target]:
+                continue
+            if touched_cells.size and np.any(integration[touched_cells] != UNREACHABLE):
+                continue
+            self.integration[target] = integration
+            self.next_cell[target] = previous.next_cell[target]
+            self.reused_targets += 1
+
+    def ensure(self, targets):
+        """Builds the fields of every target that has none yet, all missing targets in batched BFS passes."""
+        missing = [tuple(target) for target in targets
+                   if tuple(target) not in self.integration and self.walkable[tuple(target)]]
+        if not missing:
+            return
+
+        source_cells = [r * self.width + c for r, c in missing]
+        batch_size = max(1, BFS_BATCH_CELLS // max(1, self.num_cells))
+        for start in range(0, len(missing), batch_size):
+            steps = batched_bfs(self.neighbours, source_cells[start:start + batch_size], self.num_cells)
+            next_cells = self._direction_fields(steps)
+            for offset, target in enumerate(missing[start:start + batch_size]):
+                integration, next_cell = steps[offset], next_cells[offset]
+                integration.setflags(write=False) # Shared by every agent heading to the target
+                next_cell.setflags(write=False)
+                self.integration[target] = integration
+                self.next_cell[target] = next_cell
+        self.built_targets += len(missing)
+
+    def _direction_fields(self, steps):
+        """
+        Turns (T, H*W) integration fields into direction fields: every reachable tile points to
+        its neighbour with the fewest steps left (ties go to the first NEIGHBOUR_OFFSETS entry).
+        """
+        no_path = np.iinfo(np.int32).max
+        best_steps = np.full(steps.shape, no_path, dtype=np.int32)
+        next_cells = np.full(steps.shape, UNREACHABLE, dtype=np.int32)
+
+        # One neighbour direction at a time keeps the temporaries at (T, H*W)
+        for k in range(len(NEIGHBOUR_OFFSETS)):
+            neighbour = self.neighbours[:, k]
+            neighbour_steps = steps[:, np.maximum(neighbour, 0)]
+            neighbour_steps[(neighbour_steps == UNREACHABLE) | (neighbour == UNREACHABLE)[None, :]] = no_path
+            better = neighbour_steps < best_steps
+            best_steps[better] = neighbour_steps[better]
+            next_cells[better] = np.broadcast_to(neighbour, steps.shape)[better]
+
+        next_cells[steps == UNREACHABLE] = UNREACHABLE
+        targets, cells = np.nonzero(steps == 0)
+        next_cells[targets, cells] = cells # Targets point to themselves
+        return next_cells
+
+    def next_cells(self, targets):
+        """Returns the stacked (T, H*W) direction fields of the targets (built on demand; UNREACHABLE rows for blocked targets)."""
+        self.ensure(targets)
+        table = np.full((len(targets), self.num_cells), UNREACHABLE, dtype=np.int32)
+        for row, target in enumerate(targets):
+            field = self.next_cell.get(tuple(target))
+            if field is not None:
+                table[row] = field
+        return table
+
+    def integration_fields(self, targets):
+        """Returns the stacked (T, H*W) integration fields (step counts, UNREACHABLE where cut off)."""
+        self.ensure(targets)
+        table = np.full((len(targets), self.num_cells), UNREACHABLE, dtype=np.int32)
+        for row, target in enumerate(targets):
+            field = self.integration.get(tuple(target))
+            if field is not None:
+                table[row] = field
+        return table
+
+    def directions(self, target):
+        """Returns the (H, W, 2) int8 (d_row, d_col) step towards the target from every tile (0, 0 where there is none)."""
+        self.ensure([target])
+        next_cells = self.next_cell.get(tuple(target))
+        steps = np.zeros((self.num_cells, 2), dtype=np.int8)
+        if next_cells is not None:
+            cells = np.arange(self.num_cells)
+            moving = (next_cells != UNREACHABLE) & (next_cells != cells)
+            steps[moving, 0] = next_cells[moving] // self.width - cells[moving] // self.width
+            steps[moving, 1] = next_cells[moving] % self.width - cells[moving] % self.width
+        return steps.reshape(self.height, self.width, 2)
@@ -0,0 +1,379 @@
+# game_states/overload_estimation.py
+import csv
+import json
+
+import numpy as np
+
+from .queue_manager import (
+    MODE_BATCH, MODE_REFERENCE, MODE_SEQUENTIAL, MODE_REFRESH, BATCH_CHUNK_ELEMENTS, compute_scale_parameter
+)
+from .export_stats import RunningMoments, Z_95
+
+# --- Overload Estimation Constants ---
+# Importance sampling: every passenger's choice is tilted towards one entrance,
+#   q_e = p_e * exp(theta) / (1 - p_e + p_e * exp(theta)),
+# and each round is weighted by its likelihood ratio p(path) / q(path). A round picks the
+# entrance it pushes up from a mixture (one component per entrance plus the untilted model),
+# so one run estimates the overload of every entrance and of "any entrance" at once, and the
+# untilted component keeps every weight below 1 / DEFENSIVE_WEIGHT.
+DEFENSIVE_WEIGHT = 0.1
+
+# Pilot rounds per entrance and refinement passes for the tilts. The tilt of an entrance is
+# chosen so the tilted model puts threshold + 1 passengers there on average; it starts from the
+# stale quadrature probabilities (exact for the batch mode) and the pilots correct it for queue feedback
+# with Newton steps (the tilted count's mean grows with slope = its variance), at most MAX_TILT_STEP each.
+PILOT_ROUNDS = 200
+PILOT_ITERATIONS = 5
+MAX_TILT = 50.0
+MAX_TILT_STEP = 2.0
+
+
+def _tilt_for_target(stair_counts, probabilities, target):
+    """
+    Returns the tilt theta for which sum_s n_s * q_s(theta) = target (bisection), where
+    q_s is the tilted choice probability of the entrance; 0 when the mean already reaches the target.
+    """
+    def tilted_mean(theta):
+        scale = np.exp(theta)
+        return float(stair_counts @ (probabilities * scale / (1.0 - probabilities + probabilities * scale)))
+
+    if tilted_mean(0.0) >= target:
+        return 0.0
+    low, high = 0.0, MAX_TILT
+    for _ in range(100):
+        middle = 0.5 * (low + high)
+        if tilted_mean(middle) < target:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def _simulate_tilted_rounds(model, components, thetas, rng):
+    """
+    Simulates len(components) rounds. The stale batch model has no queue feedback, so its
+    rounds are drawn for all passengers at once (_simulate_tilted_batch); the sequential and
+    refresh models go agent by agent, vectorised over the rounds.
+
+    :param model: Dictionary from _choice_model().
+    :param components: (B,) entrance each round is tilted towards (-1 = untilted model).
+    :param thetas: (E,) tilt of every entrance.
+    :return: Tuple (counts (B, E), log_normalisers (B, E)) where log_normalisers[:, j] is the sum over
+        all passengers of log(1 - p_j + p_j * exp(theta_j)), the per-round term of component j's
+        likelihood ratio: log q_j(path) / p(path) = theta_j * C_j - log_normalisers[:, j].
+    """
+    if not model["snapshot_interval"]:
+        return _simulate_tilted_batch(model, components, thetas, rng)
+
+    num_rounds = len(components)
+    num_entries = len(thetas)
+    agent_stairs = model["agent_stairs"]
+    distances = model["distances"]
+    unreachable = model["unreachable"]
+    mu = model["mu"]
+    snapshot_interval = model["snapshot_interval"]
+    scales = np.exp(thetas)
+
+    counts = np.zeros((num_rounds, num_entries))
+    log_normalisers = np.zeros((num_rounds, num_entries))
+    snapshot = np.zeros((num_rounds, num_entries))
+    rows = np.arange(num_rounds)
+    tilted = components >= 0
+    tilted_rows = rows[tilted]
+    tilted_entries = components[tilted]
+
+    # One shuffled arrival order per round (only matters when the queues feed back)
+    order = agent_stairs[np.argsort(rng.random((num_rounds, len(agent_stairs))), axis=1)]
+
+    for n in range(len(agent_stairs)):
+        stairs = order[:, n]
+        betas = model["means"] + model["std_devs"] * rng.standard_normal((num_rounds, 2))
+
+        utilities = betas[:, 0:1] * distances[stairs]
+        utilities += betas[:, 1:2] * snapshot
+        utilities *= mu
+        if unreachable is not None:
+            utilities[unreachable[stairs]] = -np.inf
+        utilities -= utilities.max(axis=1, keepdims=True)
+        probabilities = np.exp(utilities)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        normalisers = 1.0 - probabilities + probabilities * scales[None, :]
+        log_normalisers += np.log(normalisers)
+
+        # Tilt each round's own entrance, then sample with one uniform per round
+        choice_weights = probabilities
+        choice_weights[tilted_rows, tilted_entries] *= scales[tilted_entries]
+        cumulative = np.cumsum(choice_weights, axis=1)
+        thresholds = rng.random(num_rounds) * cumulative[:, -1]
+        choices = np.minimum((cumulative <= thresholds[:, None]).sum(axis=1), num_entries - 1)
+        counts[rows, choices] += 1.0
+
+        if (n + 1) % snapshot_interval == 0:
+            snapshot[:] = counts
+
+    return counts, log_normalisers
+
+
+def _simulate_tilted_batch(model, components, thetas, rng):
+    """
+    Stale-model version of _simulate_tilted_rounds: every passenger sees the empty queues, so
+    the arrival order does not matter and the (rounds x entrances x passengers) utilities are
+    built for chunks of passengers at once, BATCH_CHUNK_ELEMENTS cells at a time.
+    """
+    num_rounds = len(components)
+    num_entries = len(thetas)
+    agent_stairs = model["agent_stairs"]
+    distances = model["distances"]
+    unreachable = model["unreachable"]
+    scales = np.exp(thetas)
+
+    counts = np.zeros((num_rounds, num_entries))
+    log_normalisers = np.zeros((num_rounds, num_entries))
+    tilted = components >= 0
+    tilted_rows = np.flatnonzero(tilted)
+    tilted_entries = components[tilted]
+    round_offsets = (np.arange(num_rounds) * num_entries)[:, None]
+
+    # Untilted entrances (theta = 0) add nothing to the log normalisers
+    active = np.flatnonzero(thetas)
+    active_factors = scales[active] - 1.0
+
+    # The largest utility of a passenger is at the nearest reachable entrance when their distance
+    # beta is negative and at the farthest one otherwise, so the logit shift needs no max pass
+    nearest = (distances if unreachable is None else np.where(unreachable, np.inf, distances)).min(axis=1)
+    farthest = (distances if unreachable is None else np.where(unreachable, -np.inf, distances)).max(axis=1)
+
+    # Passengers run along the last axis, (B, E, n), so every reduction over the
+    # entrances adds whole contiguous rows
+    distance_columns = np.ascontiguousarray(distances.T)
+    unreachable_columns = None if unreachable is None else np.ascontiguousarray(unreachable.T)
+
+    chunk_size = max(1, BATCH_CHUNK_ELEMENTS // max(1, num_rounds * num_entries))
+    for start in range(0, len(agent_stairs), chunk_size):
+        stairs = agent_stairs[start:start + chunk_size]
+        # Only the distance term remains with empty queues, so the length betas are never drawn
+        scaled_betas = model["mu"] * (model["means"][0] + model["std_devs"][0]
+                                      * rng.standard_normal((num_rounds, 1, len(stairs))))
+        shifts = np.where(scaled_betas < 0, nearest[stairs], farthest[stairs])
+
+        # (B, E, n) unnormalised logit weights, at most 1 per passenger
+        weights = distance_columns[:, stairs] - shifts
+        weights *= scaled_betas
+        if unreachable_columns is not None:
+            weights[:, unreachable_columns[:, stairs]] = -np.inf
+        np.exp(weights, out=weights)
+
+        if len(active):
+            scaled = weights[:, active] / weights.sum(axis=1, keepdims=True)
+            scaled *= active_factors[:, None]
+            log_normalisers[:, active] += np.log1p(scaled, out=scaled).sum(axis=2)
+
+        # Tilt each round's own entrance, then sample with one uniform per passenger
+        weights[tilted_rows, tilted_entries] *= scales[tilted_entries][:, None]
+        np.cumsum(weights, axis=1, out=weights)
+        thresholds = rng.random((num_rounds, 1, len(stairs))) * weights[:, -1:]
+        choices = np.minimum((weights <= thresholds).sum(axis=1), num_entries - 1)
+        counts += np.bincount((choices + round_offsets).ravel(),
+                              minlength=num_rounds * num_entries).reshape(num_rounds, num_entries)
+
+    return counts, log_normalisers
+
+
+def _choice_model(queue_manager, rationality_factor, k_length_ratio, mode):
+    """Collects the arrays the tilted simulation needs from a QueueManager."""
+    THETA = queue_manager.population_theta(k_length_ratio)
+    _, distances, unreachable = queue_manager._get_cached_distances()
+    stair_counts = queue_manager._stair_counts()
+
+    snapshot_interval = None # Batch: everybody sees the empty queues
+    if mode == MODE_SEQUENTIAL:
+        snapshot_interval = 1
+    elif mode == MODE_REFRESH:
+        snapshot_interval = queue_manager.refresh_interval
+
+    return {
+        "agent_stairs": np.repeat(np.arange(len(stair_counts)), stair_counts),
+        "stair_counts": stair_counts,
+        "distances": distances,
+        "unreachable": unreachable,
+        "mu": compute_scale_parameter(rationality_factor),
+        "theta": THETA,
+        "means": np.array([THETA['distance']['mean'], THETA['length']['mean']]),
+        "std_devs": np.array([THETA['distance']['std_dev'], THETA['length']['std_dev']]),
+        "snapshot_interval": snapshot_interval
+    }
+
+
+def _mixture_weights(counts, log_normalisers, thetas, mixture):
+    """
+    Likelihood ratio p(path) / q_mix(path) of every round under the defensive mixture
+    q_mix = DEFENSIVE_WEIGHT * p + sum_j mixture_j * q_j.
+    """
+    log_terms = np.full((counts.shape[0], len(thetas) + 1), -np.inf)
+    log_terms[:, 0] = np.log(DEFENSIVE_WEIGHT)
+    active = mixture > 0
+    log_terms[:, 1:][:, active] = (np.log(mixture[active])[None, :] + thetas[active][None, :] * counts[:, active]
+                                   - log_normalisers[:, active])
+    peak = log_terms.max(axis=1, keepdims=True)
+    log_mixture = peak[:, 0] + np.log(np.exp(log_terms - peak).sum(axis=1))
+    return np.exp(-log_mixture)
+
+
+def _interval(moments, hits, column, num_rounds):
+    """
+    Estimate, standard error, 95% CI and diagnostics of one weighted-indicator column.
+    "hits" counts the simulated rounds that overloaded; with few hits the standard error
+    itself is unreliable, so a handful of hits means the estimate needs more rounds.
+    """
+    if num_rounds == 0:
+        return {"probability": None, "std_error": None, "ci95_low": None, "ci95_high": None,
+                "relative_error": None, "variance_reduction": None, "hits": 0}
+    probability = float(moments.mean[column])
+    variance = float(moments.variance()[column])
+    std_error = float(np.sqrt(variance / num_rounds))
+    return {
+        "probability": probability,
+        "std_error": std_error,
+        "ci95_low": max(0.0, probability - Z_95 * std_error),
+        "ci95_high": min(1.0, probability + Z_95 * std_error),
+        "relative_error": std_error / probability if probability > 0 else None,
+        # Plain Monte Carlo rounds per importance-sampling round for the same precision
+        "variance_reduction": probability * (1.0 - probability) / variance if variance > 0 else None,
+        "hits": int(hits[column])
+    }
+
+
+# An entrance fewer than threshold + 1 passengers can reach never overloads
+_IMPOSSIBLE = {"probability": 0.0, "std_error": 0.0, "ci95_low": 0.0, "ci95_high": 0.0,
+               "relative_error": None, "variance_reduction": None, "hits": 0}
+
+
+def estimate_overload(queue_manager, rationality_factor, k_length_ratio, threshold, num_rounds=10000,
+                      mode=None, seed=None, pilot_rounds=PILOT_ROUNDS, pilot_iterations=PILOT_ITERATIONS,
+                      progress_cb=None, cancel_cb=None):
+    """
+    Estimates P(max queue > threshold) and P(queue_e > threshold) for every entrance of a
+    QueueManager's model with importance sampling, including 95% confidence intervals.
+
+    Plain Monte Carlo needs about 100 / p rounds for a 10% relative error; tilting the choices
+    towards the overloaded entrance makes the event common in the simulated rounds and the
+    likelihood ratios correct for it, so rare overloads (p = 1e-6 and below) need thousands of rounds.
+
+    :param queue_manager: QueueManager with the layout, spawn counts and standard deviations to use.
+    :param threshold: Safety threshold; a queue is overloaded when it holds MORE than this many passengers.
+    :param num_rounds: Importance-sampling rounds (the pilot rounds come on top).
+    :param mode: Model to estimate (default: the manager's mode; the reference loop is the batch model).
+    :param seed: Seed of the random stream (None = fresh).
+    :param progress_cb: Optional callable receiving the completed fraction (0..1).
+    :param cancel_cb: Optional callable; when it returns True the estimate uses the rounds done so far.
+    :return: JSON-serialisable dictionary with "any_entrance" and per-entrance "entrances" estimates.
+    """
+    mode = mode or queue_manager.mode
+    if mode == MODE_REFERENCE:
+        mode = MODE_BATCH # Same stale model as the per-agent reference loop
+    rng = np.random.default_rng(seed)
+
+    entry_positions = list(queue_manager.entry_tile_positions)
+    num_entries = len(entry_positions)
+    model = _choice_model(queue_manager, rationality_factor, k_length_ratio, mode)
+    stair_counts = model["stair_counts"].astype(float)
+    target = threshold + 1.0
+
+    # 1. Starting tilts from the stale quadrature probabilities. An entrance that cannot be
+    # reached by more than `threshold` passengers can never overload and gets no component.
+    if num_entries:
+        probabilities = np.clip(queue_manager.stair_choice_probabilities(
+            model["mu"], model["theta"], np.zeros(num_entries)), 0.0, 1.0)
+    else:
+        probabilities = np.zeros((len(stair_counts), 0))
+    reachable = np.ones_like(probabilities, dtype=bool) if model["unreachable"] is None else ~model["unreachable"]
+    possible = stair_counts @ reachable >= target
+    thetas = np.array([
+        _tilt_for_target(stair_counts, probabilities[:, e], target) if possible[e] else 0.0
+        for e in range(num_entries)
+    ])
+
+    # 2. Pilot passes: move each tilt until the tilted rounds average threshold + 1 passengers there
+    candidates = np.flatnonzero(possible)
+    pilot_rounds_done = 0
+    for _ in range(pilot_iterations if len(candidates) else 0):
+        if cancel_cb and cancel_cb():
+            break
+        components = np.repeat(candidates, pilot_rounds)
+        counts, _ = _simulate_tilted_rounds(model, components, thetas, rng)
+        pilot_rounds_done += len(components)
+        pilot_counts = counts[np.arange(len(components)), components].reshape(len(candidates), pilot_rounds)
+        steps = (target - pilot_counts.mean(axis=1)) / np.maximum(pilot_counts.var(axis=1), 1e-9)
+        # An entrance whose untilted mean is already past the threshold needs no tilt (clipped at 0)
+        thetas[candidates] = np.clip(thetas[candidates] + np.clip(steps, -MAX_TILT_STEP, MAX_TILT_STEP), 0.0, MAX_TILT)
+
+    mixture = np.zeros(num_entries)
+    if len(candidates):
+        mixture[candidates] = (1.0 - DEFENSIVE_WEIGHT) / len(candidates)
+
+    # 3. Importance-sampling rounds in memory-bounded blocks
+    block_rounds = max(1, BATCH_CHUNK_ELEMENTS // max(1, num_entries + len(model["agent_stairs"])))
+    moments = RunningMoments(num_entries + 1) # Weighted indicators: every entrance, then "any entrance"
+    hits = np.zeros(num_entries + 1, dtype=np.int64)
+    weight_sum = weight_square_sum = 0.0
+    rounds_done = 0
+    while rounds_done < num_rounds and len(candidates):
+        if cancel_cb and cancel_cb():
+            break
+        size = min(block_rounds, num_rounds - rounds_done)
+        component_choices = rng.choice(
+            np.concatenate(([-1], candidates)), size=size,
+            p=np.concatenate(([DEFENSIVE_WEIGHT], mixture[candidates]))
+        )
+        counts, log_normalisers = _simulate_tilted_rounds(model, component_choices, thetas, rng)
+        weights = _mixture_weights(counts, log_normalisers, thetas, mixture)
+
+        overloaded = counts > threshold
+        overloaded = np.column_stack([overloaded, overloaded.any(axis=1)])
+        moments.update(overloaded * weights[:, None])
+        hits += overloaded.sum(axis=0)
+        weight_sum += float(weights.sum())
+        weight_square_sum += float((weights ** 2).sum())
+
+        rounds_done += size
+        if progress_cb:
+            progress_cb(rounds_done / num_rounds)
+
+    entrances = {}
+    for e, (r, c) in enumerate(entry_positions):
+        estimate = _interval(moments, hits, e, rounds_done) if possible[e] else dict(_IMPOSSIBLE)
+        estimate["tilt"] = float(thetas[e])
+        entrances[f"Entry [{r},{c}]"] = estimate
+
+    any_entrance = _interval(moments, hits, num_entries, rounds_done) if len(candidates) else dict(_IMPOSSIBLE)
+
+    return {
+        "threshold": threshold,
+        "mode": mode,
+        "rounds": rounds_done,
+        "pilot_rounds": pilot_rounds_done,
+        "rationality_factor": rationality_factor,
+        "k_length_ratio": k_length_ratio,
+        "effective_sample_size": weight_sum ** 2 / weight_square_sum if weight_square_sum > 0 else 0.0,
+        "any_entrance": any_entrance,
+        "entrances": entrances
+    }
+
+
+def save_overload_estimate(json_path, csv_path, estimate):
+    """
+    Writes an estimate_overload() result as JSON (everything) and as a CSV table with one row per
+    entrance plus an "Any entrance" row.
+    """
+    with open(json_path, 'w') as f:
+        json.dump(estimate, f, indent=4)
+
+    columns = ["probability", "std_error", "ci95_low", "ci95_high", "relative_error", "variance_reduction", "hits"]
+    rows = [(name, values) for name, values in estimate["entrances"].items()]
+    rows.append(("Any entrance", estimate["any_entrance"]))
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Entrance"] + columns + ["tilt"])
+        for name, values in rows:
+            writer.writerow([name] + [values[column] for column in columns] + [values.get("tilt", "")])
@@ -0,0 +1,162 @@
+# game_states/parallel_export.py
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .queue_manager import (
+    QueueManager, MODE_BATCH, MODE_REFERENCE, DISTANCE_EUCLIDEAN, SAMPLER_PSEUDO, DEFAULT_REFRESH_INTERVAL,
+    STD_DEV_DISTANCE, STD_DEV_LENGTH
+)
+
+# --- Parallel Export Constants ---
+# Rounds are split into fixed-size blocks and every block gets its own RNG stream
+# spawned from the master seed. Because the block layout never depends on the worker
+# count, the same seed always produces the same (R, E) matrix on 1 or 64 cores.
+BLOCK_ROUNDS = 250
+
+# The pool is created on first use and kept alive between Run & Export clicks
+_EXECUTOR = None
+_EXECUTOR_WORKERS = 0
+
+
+def get_export_executor(max_workers=None):
+    """
+    Returns the persistent process pool, (re)creating it if the worker count changed.
+
+    :param max_workers: Number of worker processes (defaults to os.cpu_count()).
+    """
+    global _EXECUTOR, _EXECUTOR_WORKERS
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if _EXECUTOR is not None and _EXECUTOR_WORKERS != max_workers:
+        shutdown_export_executor()
+
+    if _EXECUTOR is None:
+        _EXECUTOR = ProcessPoolExecutor(max_workers=max_workers)
+        _EXECUTOR_WORKERS = max_workers
+    return _EXECUTOR
+
+
+def shutdown_export_executor():
+    """Stops the persistent process pool (registered to run at interpreter exit)."""
+    global _EXECUTOR, _EXECUTOR_WORKERS
+
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=True, cancel_futures=True)
+    _EXECUTOR = None
+    _EXECUTOR_WORKERS = 0
+
+
+atexit.register(shutdown_export_executor)
+
+
+def new_master_seed():
+    """Draws fresh OS entropy for a run that was started without a seed."""
+    return np.random.SeedSequence().entropy
+
+
+def split_round_blocks(num_rounds, master_seed, first_round=0):
+    """
+    Splits num_rounds into fixed-size blocks, each paired with its own SeedSequence.
+
+    Block i of the whole export always gets the i-th child of the master seed, so a run
+    that is produced in several calls (first_round > 0) matches a single-call run.
+
+    :param first_round: Global index of the first round; must be a multiple of BLOCK_ROUNDS.
+    :return: List of (block_rounds, seed_sequence) tuples in round order.
+    """
+    if first_round % BLOCK_ROUNDS:
+        raise ValueError(f"first_round must be a multiple of {BLOCK_ROUNDS}, got {first_round}")
+
+    first_block = first_round // BLOCK_ROUNDS
+    num_blocks = -(-num_rounds // BLOCK_ROUNDS)
+
+    blocks = []
+    for index in range(num_blocks):
+        block_rounds = min(BLOCK_ROUNDS, num_rounds - index * BLOCK_ROUNDS)
+        block_seed = np.random.SeedSequence(master_seed, spawn_key=(first_block + index,))
+        blocks.append((block_rounds, block_seed))
+    return blocks
+
+
+def simulate_point_rounds(queue_manager, num_rounds, rationality_factor, k_length_ratio):
+    """
+    Returns the (R, E) round counts of one queue manager in its own distribution mode.
+    The stale batch mode uses the batched simulate_rounds(); the queue-feedback modes
+    (sequential, refresh) replay one full distribution per round.
+    """
+    if queue_manager.mode == MODE_BATCH:
+        return queue_manager.simulate_rounds(num_rounds, rationality_factor, k_length_ratio, verbose=False)
+
+    round_counts = np.zeros((num_rounds, len(queue_manager.entry_tile_positions)), dtype=np.int64)
+    for i in range(num_rounds):
+        queue_manager.distribute_passengers_utility_based(rationality_factor, k_length_ratio, verbose=False)
+        round_counts[i] = [queue_manager.queues[pos] for pos in queue_manager.entry_tile_positions]
+    return round_counts
+
+
+def _simulate_block(entry_tile_positions, spawn_data, grid_data, block_rounds, block_seed,
+                    rationality_factor, k_length_ratio, distance_metric, sampler,
+                    std_dev_distance=STD_DEV_DISTANCE, std_dev_length=STD_DEV_LENGTH,
+                    mode=MODE_BATCH, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+    """
+    Worker entry point: simulates one block of rounds with its own seeded stream,
+    in the given distribution mode.
+    The distance matrix is cached per process, so a persistent worker only builds it once per layout.
+    """
+    queue_manager = QueueManager(
+        entry_tile_positions, spawn_data, mode=mode, seed=block_seed, grid_data=grid_data,
+        refresh_interval=refresh_interval, distance_metric=distance_metric, sampler=sampler,
+        std_dev_distance=std_dev_distance, std_dev_length=std_dev_length
+    )
+    return simulate_point_rounds(queue_manager, block_rounds, rationality_factor, k_length_ratio)
+
+
+def run_parallel_rounds(entry_tile_positions, spawn_data, grid_data, num_rounds,
+                        rationality_factor, k_length_ratio, master_seed, max_workers=None,
+                        distance_metric=DISTANCE_EUCLIDEAN, sampler=SAMPLER_PSEUDO, first_round=0,
+                        std_dev_distance=STD_DEV_DISTANCE, std_dev_length=STD_DEV_LENGTH,
+                        mode=MODE_BATCH, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+    """
+    Simulates num_rounds rounds of the given distribution mode split across the persistent process pool.
+
+    :param entry_tile_positions: List of (r, c) tuples for all entry tiles (ID 4).
+    :param spawn_data: Dictionary mapping stair tiles (ID 5) to their spawn count.
+    :param grid_data: 2D grid the positions come from (distance cache key).
+    :param master_seed: Seed every block stream is spawned from.
+    :param max_workers: Number of worker processes; 1 runs inline without a pool.
+    :param distance_metric: Distance metric passed on to each worker's QueueManager.
+    :param sampler: Preference sampler passed on to each worker (Halton streams are scrambled per block).
+    :param first_round: Global index of the first round, for exports produced in several calls.
+    :param std_dev_distance: Taste heterogeneity of the distance beta.
+    :param std_dev_length: Taste heterogeneity of the queue length beta.
+    :param mode: Distribution mode of every block (any mode except the reference loop,
+        which draws from the global random state and cannot be seeded per block).
+    :param refresh_interval: Arrivals per queue snapshot in the refresh mode.
+    :return: (R, E) integer array, columns ordered like entry_tile_positions.
+    """
+    if mode == MODE_REFERENCE:
+        raise ValueError("Parallel exports need a seedable mode; the reference loop uses the global random state.")
+
+    entry_tile_positions = list(entry_tile_positions)
+    spawn_data = dict(spawn_data)
+    blocks = split_round_blocks(num_rounds, master_seed, first_round)
+
+    block_args = [
+        (entry_tile_positions, spawn_data, grid_data, block_rounds, block_seed,
+         rationality_factor, k_length_ratio, distance_metric, sampler, std_dev_distance, std_dev_length,
+         mode, refresh_interval)
+        for block_rounds, block_seed in blocks
+    ]
+
+    if max_workers == 1 or len(blocks) <= 1:
+        block_results = [_simulate_block(*args) for args in block_args]
+    else:
+        executor = get_export_executor(max_workers)
+        block_results = list(executor.map(_simulate_block, *zip(*block_args)))
+
+    if not block_results:
+        return np.zeros((0, len(entry_tile_positions)), dtype=np.int64)
+    return np.concatenate(block_results, axis=0)
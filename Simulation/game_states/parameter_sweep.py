@@ -0,0 +1,173 @@
+# game_states/parameter_sweep.py
+from concurrent.futures import as_completed
+
+import numpy as np
+
+from .queue_manager import (
+    QueueManager, MODE_BATCH, MODE_REFERENCE, DISTANCE_EUCLIDEAN, SAMPLER_PSEUDO, DEFAULT_REFRESH_INTERVAL,
+    SAMPLER_HALTON, HALTON_SPREAD_WARNING, STD_DEV_DISTANCE, STD_DEV_LENGTH
+)
+from .parallel_export import get_export_executor, new_master_seed, simulate_point_rounds
+from .export_stats import gini_index, max_mean_ratio
+
+
+def sweep_values(value_range):
+    """
+    Expands a (start, stop, num) range into its evenly spaced values (both ends included).
+    A plain sequence of values is returned unchanged.
+    """
+    if len(value_range) == 3 and isinstance(value_range[2], int):
+        start, stop, num = value_range
+        return np.linspace(start, stop, num)
+    return np.asarray(value_range, dtype=float)
+
+
+def scale_spawn_data(spawn_data, scale):
+    """Returns spawn_data with every stair count multiplied by scale (rounded to whole passengers)."""
+    return {pos: int(round(count * scale)) for pos, count in spawn_data.items()}
+
+
+def _evaluate_points(entry_tile_positions, spawn_data, grid_data, points, num_rounds, master_seed,
+                     mode, distance_metric, sampler, refresh_interval,
+                     std_dev_distance=STD_DEV_DISTANCE, std_dev_length=STD_DEV_LENGTH):
+    """
+    Worker entry point: evaluates a batch of parameter points.
+
+    Every point's RNG stream is spawned from the master seed with the point's stream index,
+    so the cube does not depend on how points are grouped or on the worker count.
+
+    :param points: List of (flat_index, stream_index, k_length_ratio, rationality_factor, spawn_scale) tuples.
+    :return: List of (flat_index, means (E,), variances (E,), gini, max_mean_ratio) tuples.
+    """
+    results = []
+    for flat_index, stream_index, k_length_ratio, rationality_factor, spawn_scale in points:
+        queue_manager = QueueManager(
+            entry_tile_positions, scale_spawn_data(spawn_data, spawn_scale), mode=mode,
+            seed=np.random.SeedSequence(master_seed, spawn_key=(stream_index,)), grid_data=grid_data,
+            refresh_interval=refresh_interval, distance_metric=distance_metric, sampler=sampler,
+            std_dev_distance=std_dev_distance, std_dev_length=std_dev_length
+        )
+        counts = simulate_point_rounds(queue_manager, num_rounds, rationality_factor, k_length_ratio)
+
+        variances = counts.var(axis=0, ddof=1) if num_rounds > 1 else np.zeros(counts.shape[1])
+        results.append((
+            flat_index,
+            counts.mean(axis=0),
+            variances,
+            float(gini_index(counts).mean()),
+            float(max_mean_ratio(counts).mean())
+        ))
+    return results
+
+
+def run_parameter_sweep(entry_tile_positions, spawn_data, grid_data, k_values, rationality_values,
+                        spawn_scales=(1.0,), num_rounds=1000, master_seed=None, max_workers=None,
+                        mode=MODE_BATCH, distance_metric=DISTANCE_EUCLIDEAN, sampler=SAMPLER_PSEUDO,
+                        refresh_interval=DEFAULT_REFRESH_INTERVAL, common_random_numbers=True,
+                        std_dev_distance=STD_DEV_DISTANCE, std_dev_length=STD_DEV_LENGTH,
+                        progress_cb=None, cancel_cb=None):
+    """
+    Evaluates the whole spawn_scale x k_length_ratio x rationality_factor grid on the
+    persistent process pool and returns the results cube.
+
+    :param entry_tile_positions: List of (r, c) tuples for all entry tiles (ID 4).
+    :param spawn_data: Dictionary mapping stair tiles (ID 5) to their spawn count (scale 1.0).
+    :param grid_data: 2D grid the positions come from (distance cache key).
+    :param k_values: Queue ratio values to sweep.
+    :param rationality_values: Rationality values to sweep.
+    :param spawn_scales: Multipliers applied to every stair's spawn count.
+    :param num_rounds: Rounds simulated per parameter point.
+    :param master_seed: Seed every point stream is spawned from (None = fresh seed).
+    :param max_workers: Number of worker processes; 1 runs inline without a pool.
+    :param mode: Distribution mode (any mode except the reference loop).
+    :param common_random_numbers: Give every (k, rationality) point of a spawn scale the same
+        random stream, so all points reuse the same standard-normal betas, arrival order and
+        choice uniforms and differences between points are not swamped by Monte Carlo noise.
+        With False every point draws an independent stream.
+    :param std_dev_distance: Taste heterogeneity of the distance beta (held fixed over the grid).
+    :param std_dev_length: Taste heterogeneity of the queue length beta (held fixed over the grid).
+    :param progress_cb: Optional callable receiving the completed fraction (0..1).
+    :param cancel_cb: Optional callable; when it returns True the remaining points are dropped
+        (their cube entries stay NaN).
+    :return: Dictionary of arrays: "mean" and "variance" (S, K, Q, E), "gini" and
+        "max_mean_ratio" (S, K, Q), plus the swept axes and the run settings.
+        With the Halton sampler only the means describe the model (see HALTON_SPREAD_WARNING).
+    """
+    if mode == MODE_REFERENCE:
+        raise ValueError("Parameter sweeps need a seedable mode; the reference loop uses the global random state.")
+    if sampler == SAMPLER_HALTON:
+        print(f"  Warning: {HALTON_SPREAD_WARNING}")
+
+    entry_tile_positions = list(entry_tile_positions)
+    spawn_data = dict(spawn_data)
+    k_values = np.asarray(k_values, dtype=float)
+    rationality_values = np.asarray(rationality_values, dtype=float)
+    spawn_scales = np.asarray(spawn_scales, dtype=float)
+    if master_seed is None:
+        master_seed = new_master_seed()
+
+    shape = (len(spawn_scales), len(k_values), len(rationality_values))
+    num_entries = len(entry_tile_positions)
+    results = {
+        "k_values": k_values,
+        "rationality_values": rationality_values,
+        "spawn_scales": spawn_scales,
+        "entry_positions": np.array(entry_tile_positions, dtype=np.int64).reshape(-1, 2),
+        "mean": np.full(shape + (num_entries,), np.nan),
+        "variance": np.full(shape + (num_entries,), np.nan),
+        "gini": np.full(shape, np.nan),
+        "max_mean_ratio": np.full(shape, np.nan),
+        "num_rounds": np.int64(num_rounds),
+        "master_seed": str(master_seed),
+        "mode": mode,
+        "sampler": sampler,
+        "common_random_numbers": bool(common_random_numbers),
+        "std_dev_distance": float(std_dev_distance),
+        "std_dev_length": float(std_dev_length)
+    }
+
+    # One task per (scale, k) row of rationality values keeps the pool overhead small
+    tasks = []
+    for s, spawn_scale in enumerate(spawn_scales):
+        for k, k_length_ratio in enumerate(k_values):
+            row = []
+            for q, rationality in enumerate(rationality_values):
+                flat_index = int(np.ravel_multi_index((s, k, q), shape))
+                stream_index = s if common_random_numbers else flat_index
+                row.append((flat_index, stream_index, float(k_length_ratio), float(rationality), float(spawn_scale)))
+            tasks.append((entry_tile_positions, spawn_data, grid_data, row, num_rounds, master_seed,
+                          mode, distance_metric, sampler, refresh_interval, std_dev_distance, std_dev_length))
+
+    def store(point_results):
+        for flat_index, means, variances, gini, ratio in point_results:
+            index = np.unravel_index(flat_index, shape)
+            results["mean"][index] = means
+            results["variance"][index] = variances
+            results["gini"][index] = gini
+            results["max_mean_ratio"][index] = ratio
+
+    if max_workers == 1 or len(tasks) <= 1:
+        for done, task in enumerate(tasks, start=1):
+            if cancel_cb and cancel_cb():
+                break
+            store(_evaluate_points(*task))
+            if progress_cb:
+                progress_cb(done / len(tasks))
+        return results
+
+    executor = get_export_executor(max_workers)
+    futures = [executor.submit(_evaluate_points, *task) for task in tasks]
+    for done, future in enumerate(as_completed(futures), start=1):
+        store(future.result())
+        if progress_cb:
+            progress_cb(done / len(tasks))
+        if cancel_cb and cancel_cb():
+            for pending in futures:
+                pending.cancel()
+            break
+    return results
+
+
+def save_sweep_results(path, results):
+    """Writes a sweep results cube to one compressed .npz file."""
+    np.savez_compressed(path, **results)
@@ -0,0 +1,109 @@
+# game_states/quasi_random.py
+import numpy as np
+
+# --- Halton Sequence Constants ---
+# One prime base per dimension. The queue model needs three:
+# beta_distance, beta_length and the choice uniform.
+HALTON_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29)
+
+# Keep drawn uniforms strictly inside (0, 1) so the inverse normal CDF stays finite
+UNIFORM_EPSILON = 1e-12
+
+# --- Inverse Normal CDF Coefficients (Acklam's rational approximation) ---
+# Relative error below 1.2e-9 over the whole (0, 1) range.
+_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+      1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+      6.680131188771972e+01, -1.328068155288572e+01)
+_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+      -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+      3.754408661907416e+00)
+_P_LOW = 0.02425
+
+
+def norm_ppf(u):
+    """
+    Inverse of the standard normal CDF, vectorised over a NumPy array of
+    probabilities in (0, 1).
+    """
+    u = np.asarray(u, dtype=float)
+    z = np.empty_like(u)
+
+    low = u < _P_LOW
+    high = u > 1.0 - _P_LOW
+    central = ~(low | high)
+
+    # Central region: rational function in (u - 0.5)
+    q = u[central] - 0.5
+    r = q * q
+    z[central] = (((((_A[0] * r + _A[1]) * r + _A[2]) * r + _A[3]) * r + _A[4]) * r + _A[5]) * q / \
+                 (((((_B[0] * r + _B[1]) * r + _B[2]) * r + _B[3]) * r + _B[4]) * r + 1.0)
+
+    # Tails: rational function in sqrt(-2 log(p))
+    for mask, sign, p in ((low, 1.0, u[low]), (high, -1.0, 1.0 - u[high])):
+        q = np.sqrt(-2.0 * np.log(p))
+        z[mask] = sign * (((((_C[0] * q + _C[1]) * q + _C[2]) * q + _C[3]) * q + _C[4]) * q + _C[5]) / \
+                  ((((_D[0] * q + _D[1]) * q + _D[2]) * q + _D[3]) * q + 1.0)
+    return z
+
+
+class ScrambledHalton:
+    """
+    Randomised Halton sequence with random digit permutations.
+
+    Each dimension uses its own prime base, and every digit position gets its own
+    random permutation of {0, ..., base - 1}. The scrambled points are marginally
+    uniform (so estimates stay unbiased) while keeping the low discrepancy that
+    makes averages converge faster than plain pseudo-random draws.
+
+    The sequence is stateful: successive calls to draw() continue where the previous
+    call stopped, so the draws of one round (e.g. its refresh chunks) keep filling the
+    unit cube evenly. A new instance (new permutations) gives an independent replicate.
+    """
+    def __init__(self, dims, rng):
+        """
+        :param dims: Number of dimensions (at most len(HALTON_PRIMES)).
+        :param rng: np.random.Generator used to draw the digit permutations.
+        """
+        if dims > len(HALTON_PRIMES):
+            raise ValueError(f"ScrambledHalton supports at most {len(HALTON_PRIMES)} dimensions, got {dims}")
+
+        self.dims = dims
+        self.index = 1 # Skip the all-zero first point
+
+        # Enough digits per base to reach double precision
+        self.permutations = []
+        self.zero_tails = []
+        for base in HALTON_PRIMES[:dims]:
+            num_digits = int(np.ceil(53 / np.log2(base)))
+            perms = np.array([rng.permutation(base) for _ in range(num_digits)])
+            self.permutations.append(perms)
+
+            # Once an index runs out of digits every remaining digit is 0, so the rest of
+            # the scrambled expansion is the same constant for all points: precompute it
+            scales = float(base) ** -np.arange(1, num_digits + 1)
+            tail = np.cumsum((perms[:, 0] * scales)[::-1])[::-1]
+            self.zero_tails.append(np.append(tail, 0.0))
+
+    def draw(self, num_points):
+        """Returns the next (num_points, dims) block of points in (0, 1)."""
+        indices = np.arange(self.index, self.index + num_points, dtype=np.int64)
+        self.index += num_points
+
+        points = np.empty((num_points, self.dims))
+        for d, base in enumerate(HALTON_PRIMES[:self.dims]):
+            perms = self.permutations[d]
+            remaining = indices.copy()
+            value = np.zeros(num_points)
+            factor = 1.0 / base
+            for position, digit_perm in enumerate(perms):
+                if not remaining.any():
+                    value += self.zero_tails[d][position]
+                    break
+                remaining, digits = np.divmod(remaining, base)
+                value += digit_perm[digits] * factor
+                factor /= base
+            points[:, d] = value
+
+        return np.clip(points, UNIFORM_EPSILON, 1.0 - UNIFORM_EPSILON)
@@ -1,7 +1,13 @@
 import random
-import math
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 import numpy as np 
 
+from .distance_fields import walking_distance_matrix
+from .quasi_random import ScrambledHalton, norm_ppf
+
 # --- ⚙️ GLOBAL CALIBRATION CONSTANTS ⚙️ ---
 # These are the constants that were missing.
 
@@ -18,6 +24,176 @@ MAX_WEIGHT_VALUE = 100
 STD_DEV_DISTANCE = 0.5
 STD_DEV_LENGTH = 0.5
 
+# 5. Distribution Modes
+# "batch" draws every agent at once with NumPy arrays (fast path).
+# "reference" is the original per-agent loop, kept for validating the batch engine.
+# "sequential" lets each agent see the queue lengths left by the agents before them.
+# "refresh" sits in between: the queue snapshot is refreshed every K arrivals.
+MODE_BATCH = "batch"
+MODE_REFERENCE = "reference"
+MODE_SEQUENTIAL = "sequential"
+MODE_REFRESH = "refresh"
+DISTRIBUTION_MODES = (MODE_BATCH, MODE_REFERENCE, MODE_SEQUENTIAL, MODE_REFRESH)
+
+# Default number of arrivals that share one queue snapshot in MODE_REFRESH
+DEFAULT_REFRESH_INTERVAL = 10
+
+# Upper bound on the number of (agent x entrance) utility cells held in memory at once.
+# The batch engine processes agents in chunks so 100k+ passengers never allocate a huge matrix.
+BATCH_CHUNK_ELEMENTS = 1 << 21
+
+# 6. Distance Matrix Cache
+# Stair and entrance positions never change while a layout is loaded, so the
+# (stairs x entrances) distance matrix is built once per layout and shared by every
+# QueueManager (RUN clicks, Run & Export rounds and layout reloads). RUN and the exports
+# run on a worker thread while the UI may ask for the same layout, so the cache is locked
+# and a layout being built is a Future the other callers wait on (built only once).
+DISTANCE_CACHE_SIZE = 16
+_DISTANCE_MATRIX_CACHE = OrderedDict()
+_DISTANCE_BUILDS = {}
+_DISTANCE_CACHE_LOCK = threading.Lock()
+
+
+# 7. Distance Metrics
+# "euclidean" is the straight-line distance; "walking" follows walkable tiles
+# (see distance_fields.py) so passengers no longer cut across tracks or empty tiles.
+DISTANCE_EUCLIDEAN = "euclidean"
+DISTANCE_WALKING = "walking"
+DISTANCE_METRICS = (DISTANCE_EUCLIDEAN, DISTANCE_WALKING)
+
+
+# 8. Preference Samplers
+# "pseudo" uses plain pseudo-random draws; "halton" draws the two betas and the choice
+# uniform from a scrambled Halton sequence (quasi-Monte Carlo) for faster convergence.
+# Every round gets freshly scrambled sequences, so rounds are independent randomised QMC
+# replicates: their average (and its CI) is unbiased, but the spread between rounds is
+# smaller than the model's own round-to-round variation. Per-round outputs (variances,
+# Gini, moment calibration) therefore need the pseudo sampler.
+SAMPLER_PSEUDO = "pseudo"
+SAMPLER_HALTON = "halton"
+SAMPLERS = (SAMPLER_PSEUDO, SAMPLER_HALTON)
+HALTON_SPREAD_WARNING = ("halton sampler: the round averages are valid, but the per-round spread "
+                         "(variances, std, Gini) understates the model's round-to-round variation")
+
+# 9. Common Random Numbers
+# Every engine draws its randomness in a fixed order whose sizes depend only on the
+# passenger counts: the arrival shuffle, standard-normal betas and choice uniforms.
+# The slider values only enter afterwards, through the mean/scale transforms. So
+# reseed() with the same seed before two runs with different parameters replays
+# the same underlying draws (common random numbers).
+
+# Gauss-Hermite nodes per beta for the quadrature (expected distribution) mode
+QUADRATURE_NODES = 16
+
+# 10. Stochastic User Equilibrium
+# The equilibrium queue lengths reproduce themselves: every passenger's choice probabilities,
+# evaluated at the queues they produce, give back those queues. Unlike the stale mode
+# ("queue overshooting") nobody would switch entrances in expectation.
+# "newton" (inexact Newton with conjugate gradients) converges in a handful of steps;
+# "msa" (method of successive averages) is the classic, slower reference.
+EQUILIBRIUM_NEWTON = "newton"
+EQUILIBRIUM_MSA = "msa"
+EQUILIBRIUM_METHODS = (EQUILIBRIUM_NEWTON, EQUILIBRIUM_MSA)
+EQUILIBRIUM_TOLERANCE = 1e-6 # Equilibrium gap (share of passengers that would switch) to stop at
+EQUILIBRIUM_MAX_ITERATIONS = 1000
+EQUILIBRIUM_NODES = 8 # Gauss-Hermite nodes per beta (every solver step evaluates all of them)
+EQUILIBRIUM_MIN_STEP = 1e-4 # Smallest Newton step fraction tried by the backtracking
+EQUILIBRIUM_CG_ITERATIONS = 200 # Conjugate gradient iterations per Newton step (upper bound)
+EQUILIBRIUM_REPORT_ROUNDS = 200 # Simulated sequential rounds in equilibrium_report()
+
+
+def layout_hash(grid_data, stair_tile_positions, entry_tile_positions, distance_metric=DISTANCE_EUCLIDEAN):
+    """
+    Returns a stable hash of a layout: the grid contents plus the ordered
+    stair and entrance positions (the row/column order of the distance matrix).
+    """
+    digest = hashlib.sha1()
+    digest.update(distance_metric.encode())
+    if grid_data:
+        grid = np.asarray(grid_data, dtype=np.int16)
+        digest.update(repr(grid.shape).encode())
+        digest.update(grid.tobytes())
+    digest.update(repr(tuple(map(tuple, stair_tile_positions))).encode())
+    digest.update(repr(tuple(map(tuple, entry_tile_positions))).encode())
+    return digest.hexdigest()
+
+
+def clear_distance_cache():
+    """Drops every cached distance matrix."""
+    with _DISTANCE_CACHE_LOCK:
+        _DISTANCE_MATRIX_CACHE.clear()
+
+
+def compute_scale_parameter(rationality_factor):
+    """
+    Maps the rationality slider value to the logit scale parameter (MU).
+    This 'rationality_factor' parameter controls the $\epsilon$ noise.
+    """
+    scaling_exponent = (rationality_factor - 80.0) / 10.0
+    scaling_factor = 2.0 ** scaling_exponent
+    MU = rationality_factor * scaling_factor
+    # Ensure MU is not negative if rationality_factor can be 0 or less
+    return max(0.0, MU)
+
+
+def clamp_k_ratio(k_length_ratio):
+    """Clamps the queue ratio slider value to [0, MAX_WEIGHT_VALUE], the range THETA is built from."""
+    return max(0.0, min(MAX_WEIGHT_VALUE, k_length_ratio))
+
+
+def _log_parameters(k_length_ratio, MU):
+    """Prints the DEBUG lines with the parameters a distribution runs with."""
+    print(f"DEBUG: Using k_length_ratio (slider value) = {clamp_k_ratio(k_length_ratio)}")
+    print(f"DEBUG: Using rationality_factor (slider value) = {MU}")
+
+
+def build_population_theta(k_length_ratio, std_dev_distance=STD_DEV_DISTANCE, std_dev_length=STD_DEV_LENGTH):
+    """
+    Builds THETA ($\theta$), the population-level preference distributions,
+    from the queue ratio slider value and the taste heterogeneity ($\sigma_k$).
+
+    Distance and Length are "costs", so both mean preferences are NEGATIVE.
+    """
+    k_ratio = clamp_k_ratio(k_length_ratio)
+    return {
+        'distance': {
+            'mean': -k_ratio,
+            'std_dev': std_dev_distance
+        },
+        'length': {
+            'mean': -(MAX_WEIGHT_VALUE - k_ratio),
+            'std_dev': std_dev_length
+        }
+    }
+
+
+def sample_logit_choices(utilities, mu, uniforms, unavailable=None):
+    """
+    Samples one choice per row of a (N, E) utility matrix under the logit model.
+
+    Each row is turned into probabilities with a numerically stable softmax and the
+    choice is the first entrance whose cumulative probability exceeds a uniform draw
+    (searchsorted with side="right"), so a zero-probability entrance is never chosen,
+    not even for a draw of exactly 0.
+
+    :param utilities: (N, E) array of systematic utilities V_in.
+    :param mu: Logit scale parameter.
+    :param uniforms: (N,) array of U(0, 1) draws, one per agent.
+    :param unavailable: Optional (N, E) boolean mask of choices with zero probability.
+    :return: (N,) array of chosen entrance indices.
+    """
+    scaled_v = utilities * mu
+    if unavailable is not None:
+        scaled_v[unavailable] = -np.inf
+    scaled_v -= scaled_v.max(axis=1, keepdims=True)
+    np.exp(scaled_v, out=scaled_v)
+    cumulative = np.cumsum(scaled_v, axis=1, out=scaled_v)
+
+    # Scale the uniform by the row total instead of normalising the whole matrix
+    thresholds = uniforms * cumulative[:, -1]
+    choices = (cumulative <= thresholds[:, None]).sum(axis=1)
+    return np.minimum(choices, utilities.shape[1] - 1)
+
 
 class QueueManager:
     """
@@ -30,15 +206,51 @@ class QueueManager:
     Crucially, passengers are drawn randomly from *all* spawn points 
     to simulate simultaneous arrivals.
     """
-    def __init__(self, entry_tile_positions, spawn_data):
+    def __init__(self, entry_tile_positions, spawn_data, mode=MODE_BATCH, seed=None, grid_data=None,
+                 refresh_interval=DEFAULT_REFRESH_INTERVAL, distance_metric=DISTANCE_EUCLIDEAN,
+                 sampler=SAMPLER_PSEUDO, std_dev_distance=STD_DEV_DISTANCE, std_dev_length=STD_DEV_LENGTH):
         """
         Initializes the queue manager with a queue for each entry tile.
 
         :param entry_tile_positions: List of (r, c) tuples for all entry tiles (ID 4).
         :param spawn_data: Dictionary mapping stair tiles (ID 5) to their spawn count.
+        :param mode: Default distribution mode (one of DISTRIBUTION_MODES).
+        :param seed: Optional seed for the batch engine's random generator.
+        :param grid_data: Optional 2D grid the positions come from (part of the distance cache key).
+        :param refresh_interval: Arrivals per queue snapshot in MODE_REFRESH (K).
+        :param distance_metric: DISTANCE_EUCLIDEAN or DISTANCE_WALKING (needs grid_data).
+        :param sampler: SAMPLER_PSEUDO or SAMPLER_HALTON for the batch-style engines.
+        :param std_dev_distance: Taste heterogeneity of the distance beta (e.g. a calibrated value).
+        :param std_dev_length: Taste heterogeneity of the queue length beta.
         """
+        if mode not in DISTRIBUTION_MODES:
+            raise ValueError(f"Unknown distribution mode: {mode}")
+        if distance_metric not in DISTANCE_METRICS:
+            raise ValueError(f"Unknown distance metric: {distance_metric}")
+        if sampler not in SAMPLERS:
+            raise ValueError(f"Unknown sampler: {sampler}")
+        if refresh_interval < 1:
+            raise ValueError(f"refresh_interval must be at least 1, got {refresh_interval}")
+        if std_dev_distance < 0 or std_dev_length < 0:
+            raise ValueError(f"Standard deviations must be non-negative, got {std_dev_distance}, {std_dev_length}")
+
         self.entry_tile_positions = entry_tile_positions
         self.spawn_data = spawn_data
+        self.mode = mode
+        self.grid_data = grid_data
+        self.refresh_interval = int(refresh_interval)
+        self.distance_metric = distance_metric
+        self.std_dev_distance = float(std_dev_distance)
+        self.std_dev_length = float(std_dev_length)
+        self._layout_key = None # Lazily computed layout_hash() for the distance cache
+
+        # Random source for the batch engine (the reference mode keeps the global state)
+        self.rng = np.random.default_rng(seed)
+
+        # Quasi-random (beta_distance, beta_length, choice uniform) streams, one per stair,
+        # scrambled afresh every round (created lazily by _draw_agent_preferences)
+        self.sampler = sampler
+        self.halton_streams = {}
         
         # Format: {(r, c): current_queue_length} for each entry tile
         self.queues = {pos: 0 for pos in entry_tile_positions}
@@ -49,20 +261,725 @@ class QueueManager:
         # Store stair positions (the spawn points for the passengers)
         self.stair_tile_positions = list(spawn_data.keys())
 
-    def _euclidean_distance(self, pos1, pos2):
+    def _build_distance_matrix(self):
         """
-        Calculates Euclidean distance (straight-line) between two (r, c) tuples.
+        Builds the (stairs x entrances) distance matrix, with rows ordered like
+        self.stair_tile_positions and columns like self.entry_tile_positions.
+
+        With the walking metric, entrances a stair cannot reach are np.inf; a stair
+        that reaches no entrance at all falls back to its Euclidean row.
         """
-        r1, c1 = pos1
-        r2, c2 = pos2
-        
-        distance = math.sqrt((r1 - r2)**2 + (c1 - c2)**2)
-        return distance
+        stairs = np.array(self.stair_tile_positions, dtype=float).reshape(-1, 2)
+        entries = np.array(self.entry_tile_positions, dtype=float).reshape(-1, 2)
+        deltas = stairs[:, None, :] - entries[None, :, :]
+        euclidean = np.sqrt((deltas ** 2).sum(axis=2))
+
+        if self.distance_metric != DISTANCE_WALKING or not self.grid_data:
+            return euclidean
+
+        walking = walking_distance_matrix(self.grid_data, self.stair_tile_positions, self.entry_tile_positions)
+        isolated = ~np.isfinite(walking).any(axis=1)
+        if isolated.any() and walking.shape[1]:
+            print(f"Warning: {int(isolated.sum())} stairs tile(s) cannot reach any entrance. Using straight-line distance.")
+            walking[isolated] = euclidean[isolated]
+        return walking
+
+    def _get_cached_distances(self):
+        """
+        Returns the cache entry for the current layout: (distances, choice_distances, unreachable).
+        choice_distances has unreachable pairs zeroed so they are safe in arithmetic, and
+        unreachable is the matching (S, E) boolean mask (None when every pair is reachable).
+        """
+        key = self.layout_key()
+        with _DISTANCE_CACHE_LOCK:
+            entry = _DISTANCE_MATRIX_CACHE.get(key)
+            if entry is not None:
+                _DISTANCE_MATRIX_CACHE.move_to_end(key)
+                return entry
+            build = _DISTANCE_BUILDS.get(key)
+            building_here = build is None
+            if building_here:
+                build = _DISTANCE_BUILDS[key] = Future()
+
+        # Another thread is building this layout: wait for its result
+        if not building_here:
+            return build.result()
+
+        try:
+            distances = self._build_distance_matrix()
+            unreachable = ~np.isfinite(distances)
+            choice_distances = np.where(unreachable, 0.0, distances)
+            if not unreachable.any():
+                unreachable = None
+
+            for array in (distances, choice_distances, unreachable):
+                if array is not None:
+                    array.setflags(write=False)
+            entry = (distances, choice_distances, unreachable)
+        except BaseException as error:
+            with _DISTANCE_CACHE_LOCK:
+                del _DISTANCE_BUILDS[key]
+            build.set_exception(error)
+            raise
+
+        with _DISTANCE_CACHE_LOCK:
+            _DISTANCE_MATRIX_CACHE[key] = entry
+            if len(_DISTANCE_MATRIX_CACHE) > DISTANCE_CACHE_SIZE:
+                _DISTANCE_MATRIX_CACHE.popitem(last=False)
+            del _DISTANCE_BUILDS[key]
+        build.set_result(entry)
+        return entry
+
+    def layout_key(self):
+        """Returns the layout_hash() of the current layout (computed once, reset when the stairs change)."""
+        if self._layout_key is None:
+            self._layout_key = layout_hash(
+                self.grid_data, self.stair_tile_positions, self.entry_tile_positions, self.distance_metric
+            )
+        return self._layout_key
+
+    def reseed(self, seed):
+        """
+        Restarts the random source from seed (and the Halton streams), so the next
+        distribution is reproducible. Reseeding with the same seed before runs with
+        different parameters gives common random numbers (see 9. above).
+        The reference mode keeps using the global state.
+        """
+        self.rng = np.random.default_rng(seed)
+        self.halton_streams = {}
+
+    def restart_halton_streams(self):
+        """
+        Starts a new round of the Halton sampler: the next draws come from freshly
+        scrambled sequences, independent of the previous rounds (see 8. above).
+        """
+        self.halton_streams = {}
+
+    def population_theta(self, k_length_ratio):
+        """Returns THETA for the queue ratio slider value with this manager's standard deviations."""
+        return build_population_theta(k_length_ratio, self.std_dev_distance, self.std_dev_length)
+
+    def get_distance_matrix(self):
+        """
+        Returns the cached (stairs x entrances) distance matrix for the current layout,
+        building it on the first request. The returned array is read-only and holds
+        np.inf for pairs that are not connected by walkable tiles.
+        """
+        return self._get_cached_distances()[0]
+
+    def distribute_passengers_utility_based(self, rationality_factor, k_length_ratio, mode=None, verbose=False):
+        """
+        Distributes passengers based on a Mixed Logit (MIXL) model,
+        inspired by "A High-Fidelity Agent-Based Framework..."
+
+        :param rationality_factor: Rationality slider value (sets the scale parameter MU).
+        :param k_length_ratio: Queue ratio slider value (sets the mean preferences).
+        :param mode: Optional override of self.mode for this call.
+        :param verbose: Print the DEBUG parameter lines (off for library callers).
+        :return: Zeroed spawn data for the main simulation loop.
+        """
+        mode = mode or self.mode
+        if mode == MODE_REFERENCE:
+            return self._distribute_reference(rationality_factor, k_length_ratio, verbose)
+        if mode == MODE_BATCH:
+            return self._distribute_batch(rationality_factor, k_length_ratio, verbose)
+        if mode == MODE_SEQUENTIAL:
+            return self._distribute_sequential(rationality_factor, k_length_ratio, verbose)
+        if mode == MODE_REFRESH:
+            return self._distribute_refresh(rationality_factor, k_length_ratio, verbose)
+        raise ValueError(f"Unknown distribution mode: {mode}")
+
+    def _distribute_batch(self, rationality_factor, k_length_ratio, verbose=False):
+        """
+        Vectorised version of the MIXL assignment.
+
+        All agents' betas are drawn as one (N, 2) array, the (N, E) utility matrix
+        is built in one pass (chunked to bound memory) and every choice is sampled
+        at once from the cumulative logit probabilities. Statistically identical to
+        the reference loop: same THETA, same MU, same stale (empty) queue snapshot.
+        """
+        MU = compute_scale_parameter(rationality_factor)
+        THETA = self.population_theta(k_length_ratio)
+        if verbose:
+            _log_parameters(k_length_ratio, MU)
+
+        # 1. Clear existing assignments (a new round of the Halton sampler)
+        self.clear_queues()
+        self.restart_halton_streams()
+
+        stair_counts = self._stair_counts()
+        if not self.entry_tile_positions or stair_counts.sum() == 0:
+            return {pos: 0 for pos in self.spawn_data.keys()}
+
+        # 2. One stair index per agent, shuffled like the reference arrival order
+        agent_stairs = np.repeat(np.arange(len(stair_counts)), stair_counts)
+        self.rng.shuffle(agent_stairs)
+
+        # 3. All agents see the same "stale" snapshot of the queues
+        stale_lengths = np.array([self.queues[pos] for pos in self.entry_tile_positions], dtype=float)
+        choices = self._sample_stale_choices(agent_stairs, MU, THETA, stale_lengths)
+        counts = np.bincount(choices, minlength=len(self.entry_tile_positions))
+
+        # 4. Apply all "simultaneous" choices to the queues
+        for pos, count in zip(self.entry_tile_positions, counts):
+            self.queues[pos] += int(count)
+
+        # 5. Return the zeroed spawn data for the main simulation loop
+        return {pos: 0 for pos in self.spawn_data.keys()}
+
+    def _distribute_sequential(self, rationality_factor, k_length_ratio, verbose=False):
+        """
+        Sequential-information version of the MIXL assignment.
+
+        Agents arrive one at a time (in shuffled order) and each one sees the queue
+        lengths left by the agents before them. The stair distance rows are scaled by
+        MU once up front, and after each choice only the chosen entrance's length is
+        incremented, so the whole pass is O(N * E) with no per-agent dict building.
+        """
+        MU = compute_scale_parameter(rationality_factor)
+        THETA = self.population_theta(k_length_ratio)
+        if verbose:
+            _log_parameters(k_length_ratio, MU)
+
+        # 1. Clear existing assignments (a new round of the Halton sampler)
+        self.clear_queues()
+        self.restart_halton_streams()
+
+        stair_counts = self._stair_counts()
+        num_entries = len(self.entry_tile_positions)
+        if num_entries == 0 or stair_counts.sum() == 0:
+            return {pos: 0 for pos in self.spawn_data.keys()}
+
+        # 2. Arrival order matters here, so shuffle it like the reference loop
+        agent_stairs = np.repeat(np.arange(len(stair_counts)), stair_counts)
+        self.rng.shuffle(agent_stairs)
+        num_agents = len(agent_stairs)
+
+        agent_betas, uniforms = self._draw_agent_preferences(agent_stairs, THETA)
+        agent_betas *= MU
+
+        # 3. Precomputed per-stair distance rows and the live queue lengths
+        _, distances, unreachable = self._get_cached_distances()
+        lengths = np.array([self.queues[pos] for pos in self.entry_tile_positions], dtype=float)
+
+        # Reused buffers: no allocations inside the agent loop
+        scaled_v = np.empty(num_entries)
+        length_term = np.empty(num_entries)
+        last_entry = num_entries - 1
+
+        beta_distance = agent_betas[:, 0].tolist()
+        beta_length = agent_betas[:, 1].tolist()
+        stairs_list = agent_stairs.tolist()
+        uniforms_list = uniforms.tolist()
+
+        # 4. Each agent chooses using the queues as they are *now*
+        for n in range(num_agents):
+            np.multiply(distances[stairs_list[n]], beta_distance[n], out=scaled_v)
+            np.multiply(lengths, beta_length[n], out=length_term)
+            scaled_v += length_term
+            if unreachable is not None:
+                scaled_v[unreachable[stairs_list[n]]] = -np.inf
+            scaled_v -= scaled_v.max()
+            np.exp(scaled_v, out=scaled_v)
+            np.cumsum(scaled_v, out=scaled_v)
+
+            choice = int(np.searchsorted(scaled_v, uniforms_list[n] * scaled_v[-1], side='right'))
+            choice = min(choice, last_entry)
+
+            # Only the chosen entrance's length term changes for the next agent
+            lengths[choice] += 1.0
+
+        # 5. The live lengths are the final queues
+        self.set_queue_lengths(lengths)
+
+        # 6. Return the zeroed spawn data for the main simulation loop
+        return {pos: 0 for pos in self.spawn_data.keys()}
+
+    def _distribute_refresh(self, rationality_factor, k_length_ratio, verbose=False):
+        """
+        Periodic information-refresh version of the MIXL assignment.
+
+        Agents arrive in shuffled order and are processed in vectorised chunks of
+        self.refresh_interval (K). Every agent in a chunk sees the same snapshot, and
+        the queue lengths are updated between chunks. K = 1 is the sequential mode
+        (and runs its per-agent loop) and K >= N matches the fully stale batch mode.
+
+        A round has no clock: arrivals are only ordered, not timed. A snapshot
+        refreshed every T seconds therefore corresponds to K = T * (arrivals per
+        second), which is how a time-based refresh maps onto this mode.
+        """
+        if self.refresh_interval == 1:
+            if verbose:
+                print("DEBUG: Refreshing queue snapshot every arrival (sequential mode)")
+            return self._distribute_sequential(rationality_factor, k_length_ratio, verbose)
+
+        MU = compute_scale_parameter(rationality_factor)
+        THETA = self.population_theta(k_length_ratio)
+        if verbose:
+            _log_parameters(k_length_ratio, MU)
+            print(f"DEBUG: Refreshing queue snapshot every {self.refresh_interval} arrivals")
+
+        # 1. Clear existing assignments (a new round of the Halton sampler)
+        self.clear_queues()
+        self.restart_halton_streams()
+
+        stair_counts = self._stair_counts()
+        num_entries = len(self.entry_tile_positions)
+        if num_entries == 0 or stair_counts.sum() == 0:
+            return {pos: 0 for pos in self.spawn_data.keys()}
+
+        # 2. Shuffled arrival order, split into snapshot chunks
+        agent_stairs = np.repeat(np.arange(len(stair_counts)), stair_counts)
+        self.rng.shuffle(agent_stairs)
+
+        lengths = np.array([self.queues[pos] for pos in self.entry_tile_positions], dtype=float)
+
+        # 3. Each chunk chooses from the same snapshot, then the snapshot is refreshed
+        for start in range(0, len(agent_stairs), self.refresh_interval):
+            chunk_stairs = agent_stairs[start:start + self.refresh_interval]
+            choices = self._sample_stale_choices(chunk_stairs, MU, THETA, lengths)
+            lengths += np.bincount(choices, minlength=num_entries)
+
+        # 4. The refreshed lengths are the final queues
+        self.set_queue_lengths(lengths)
+
+        # 5. Return the zeroed spawn data for the main simulation loop
+        return {pos: 0 for pos in self.spawn_data.keys()}
+
+    def expected_distribution(self, rationality_factor, k_length_ratio, queue_lengths=None,
+                              spawn_data=None, num_nodes=QUADRATURE_NODES):
+        """
+        Computes the expected queue length and its variance for every entrance
+        without drawing any agents (quadrature mode of the stale model).
+
+        Each stair's choice probabilities are the logit probabilities integrated over
+        the two normally distributed betas, evaluated with a tensor-product
+        Gauss-Hermite rule. Agents choose independently given the snapshot, so each
+        entrance count is a sum of per-stair binomials:
+            E[count_e]   = sum_s n_s * P_se
+            Var[count_e] = sum_s n_s * P_se * (1 - P_se)
+
+        :param queue_lengths: Optional (E,) snapshot every agent sees (default: empty queues).
+        :param spawn_data: Optional spawn counts to use instead of self.spawn_data.
+        :param num_nodes: Gauss-Hermite nodes per beta.
+        :return: Tuple (expected_counts, variances), (E,) arrays ordered like self.entry_tile_positions.
+        """
+        MU = compute_scale_parameter(rationality_factor)
+        THETA = self.population_theta(k_length_ratio)
+
+        num_entries = len(self.entry_tile_positions)
+        spawn_data = self.spawn_data if spawn_data is None else spawn_data
+        stair_counts = np.array([spawn_data.get(pos, 0) for pos in self.stair_tile_positions], dtype=float)
+        if num_entries == 0 or stair_counts.sum() == 0:
+            return np.zeros(num_entries), np.zeros(num_entries)
+
+        if queue_lengths is None:
+            queue_lengths = np.zeros(num_entries)
+        queue_lengths = np.asarray(queue_lengths, dtype=float)
+
+        probabilities = np.clip(self.stair_choice_probabilities(MU, THETA, queue_lengths, num_nodes), 0.0, 1.0)
+        expected_counts = stair_counts @ probabilities
+        variances = stair_counts @ (probabilities * (1.0 - probabilities))
+        return expected_counts, variances
+
+    def stair_choice_probabilities(self, MU, THETA, queue_lengths, num_nodes=QUADRATURE_NODES):
+        """
+        Returns the (S, E) mixed logit choice probabilities of one agent from each stair,
+        integrated over the beta distributions with Gauss-Hermite quadrature.
+        """
+        node_weights, base_utilities, length_slopes = self._quadrature_utilities(MU, THETA, num_nodes)
+        node_probabilities = self._quadrature_probabilities(base_utilities, length_slopes, queue_lengths)
+        return np.einsum('n,sne->se', node_weights, node_probabilities)
+
+    def _quadrature_utilities(self, MU, THETA, num_nodes):
+        """
+        Splits the quadrature utilities into their queue-independent part and the queue slope.
+
+        :return: Tuple (node_weights (nodes,), base_utilities (S, nodes, E) = MU * beta_distance * distance
+            with -inf for unreachable pairs, length_slopes (nodes,) = MU * beta_length).
+        """
+        nodes, weights = np.polynomial.hermite.hermgauss(num_nodes)
+
+        # beta = mean + sqrt(2) * std_dev * node, weights normalised by 1/sqrt(pi) per dimension
+        beta_distance = THETA['distance']['mean'] + np.sqrt(2.0) * THETA['distance']['std_dev'] * nodes
+        beta_length = THETA['length']['mean'] + np.sqrt(2.0) * THETA['length']['std_dev'] * nodes
+        node_weights = np.outer(weights, weights).ravel() / np.pi
+        node_beta_distance = np.repeat(beta_distance, num_nodes)
+        node_beta_length = np.tile(beta_length, num_nodes)
+
+        _, distances, unreachable = self._get_cached_distances()
+
+        # (S, nodes, E) utilities: every stair evaluated at every quadrature node at once
+        base_utilities = (MU * node_beta_distance)[None, :, None] * distances[:, None, :]
+        if unreachable is not None:
+            base_utilities[np.broadcast_to(unreachable[:, None, :], base_utilities.shape)] = -np.inf
+        return node_weights, base_utilities, MU * node_beta_length
+
+    def _quadrature_probabilities(self, base_utilities, length_slopes, queue_lengths):
+        """Returns the (S, nodes, E) logit probabilities of every quadrature node for one queue snapshot."""
+        utilities = base_utilities + length_slopes[None, :, None] * np.asarray(queue_lengths, dtype=float)[None, None, :]
+        utilities -= utilities.max(axis=2, keepdims=True)
+        np.exp(utilities, out=utilities)
+        utilities /= utilities.sum(axis=2, keepdims=True)
+        return utilities
+
+    # --- Stochastic User Equilibrium ---
+
+    def _equilibrium_model(self, rationality_factor, k_length_ratio, spawn_data, num_nodes):
+        """
+        Returns (class_weights, base_utilities, length_slopes, total) for the equilibrium solver.
+        Every (stair, quadrature node) pair is one passenger class; class_weights (S, nodes) is
+        the expected number of passengers in each class.
+        """
+        MU = compute_scale_parameter(rationality_factor)
+        THETA = self.population_theta(k_length_ratio)
+        spawn_data = self.spawn_data if spawn_data is None else spawn_data
+        stair_counts = np.array([spawn_data.get(pos, 0) for pos in self.stair_tile_positions], dtype=float)
+
+        node_weights, base_utilities, length_slopes = self._quadrature_utilities(MU, THETA, num_nodes)
+        return stair_counts[:, None] * node_weights[None, :], base_utilities, length_slopes, stair_counts.sum()
+
+    def _equilibrium_response(self, model, queue_lengths):
+        """Expected queue lengths F(q) when every passenger reacts to the snapshot q."""
+        class_weights, base_utilities, length_slopes, _ = model
+        probabilities = self._quadrature_probabilities(base_utilities, length_slopes, queue_lengths)
+        return np.einsum('sn,sne->e', class_weights, probabilities)
+
+    def equilibrium_gap(self, rationality_factor, k_length_ratio, queue_lengths, spawn_data=None,
+                        num_nodes=EQUILIBRIUM_NODES):
+        """
+        Returns the equilibrium gap of a queue distribution: the share of passengers whose expected
+        choice would change if they saw these queues, ||F(q) - q||_1 / (2 N). Zero at the equilibrium.
+        """
+        model = self._equilibrium_model(rationality_factor, k_length_ratio, spawn_data, num_nodes)
+        total = model[3]
+        if total == 0 or not self.entry_tile_positions:
+            return 0.0
+        queue_lengths = np.asarray(queue_lengths, dtype=float)
+        return float(np.abs(self._equilibrium_response(model, queue_lengths) - queue_lengths).sum() / (2.0 * total))
+
+    def solve_equilibrium(self, rationality_factor, k_length_ratio, spawn_data=None, method=EQUILIBRIUM_NEWTON,
+                          tolerance=EQUILIBRIUM_TOLERANCE, max_iterations=EQUILIBRIUM_MAX_ITERATIONS,
+                          num_nodes=EQUILIBRIUM_NODES):
+        """
+        Computes the logit stochastic user equilibrium: the expected queue lengths q* that
+        reproduce themselves, q* = sum_s n_s * P_s(q*), so no passenger gains (in expectation)
+        by switching entrances. Works on expected queue lengths only, no agents are drawn.
+
+        "msa" is the method of successive averages, q <- q + (F(q) - q) / (i + 1).
+        "newton" solves F(q) - q = 0 with inexact Newton steps. With negative length betas
+        q - F(q) is the gradient of a strictly convex function, so the Newton system
+        (I - J) d = F(q) - q is symmetric positive definite: it is solved matrix-free with
+        Jacobi-preconditioned conjugate gradients and every step is backtracked until the gap shrinks.
+
+        :param spawn_data: Optional spawn counts to use instead of self.spawn_data.
+        :param method: EQUILIBRIUM_NEWTON or EQUILIBRIUM_MSA.
+        :param tolerance: Stop once the equilibrium gap (share of passengers) is below this.
+        :param num_nodes: Gauss-Hermite nodes per beta.
+        :return: Dictionary with "queue_lengths" ((E,) array ordered like self.entry_tile_positions),
+            "gap", "iterations", "converged" and "method".
+        """
+        if method not in EQUILIBRIUM_METHODS:
+            raise ValueError(f"Unknown equilibrium method: {method}")
+
+        num_entries = len(self.entry_tile_positions)
+        model = self._equilibrium_model(rationality_factor, k_length_ratio, spawn_data, num_nodes)
+        class_weights, base_utilities, length_slopes, total = model
+        if num_entries == 0 or total == 0:
+            return {"queue_lengths": np.zeros(num_entries), "gap": 0.0, "iterations": 0,
+                    "converged": True, "method": method}
+
+        def gap_of(queue_lengths, response):
+            return float(np.abs(response - queue_lengths).sum() / (2.0 * total))
+
+        # Start from the stale distribution (everyone reacting to empty queues)
+        queue_lengths = self._equilibrium_response(model, np.zeros(num_entries))
+        response = self._equilibrium_response(model, queue_lengths)
+        gap = gap_of(queue_lengths, response)
+
+        # Per-class Jacobian factors: dF_e/dq_j = sum_c a_c * P_ce * (delta_ej - P_cj)
+        class_slopes = (class_weights * length_slopes[None, :]).ravel()
+
+        iterations = 0
+        while gap > tolerance and iterations < max_iterations:
+            iterations += 1
+            residual = response - queue_lengths
+
+            if method == EQUILIBRIUM_MSA:
+                queue_lengths = queue_lengths + residual / (iterations + 1)
+                response = self._equilibrium_response(model, queue_lengths)
+                gap = gap_of(queue_lengths, response)
+                continue
+
+            probabilities = self._quadrature_probabilities(base_utilities, length_slopes, queue_lengths)
+            probabilities = probabilities.reshape(-1, num_entries)
+            step = self._newton_direction(probabilities, class_slopes, residual, gap)
+
+            # Backtrack until the gap shrinks; fall back to an averaging step if it never does
+            scale = 1.0
+            while scale >= EQUILIBRIUM_MIN_STEP:
+                trial = queue_lengths + scale * step
+                trial_response = self._equilibrium_response(model, trial)
+                trial_gap = gap_of(trial, trial_response)
+                if trial_gap < gap:
+                    break
+                scale *= 0.5
+            else:
+                trial = queue_lengths + residual / (iterations + 1)
+                trial_response = self._equilibrium_response(model, trial)
+                trial_gap = gap_of(trial, trial_response)
+            queue_lengths, response, gap = trial, trial_response, trial_gap
+
+        return {"queue_lengths": queue_lengths, "gap": gap, "iterations": iterations,
+                "converged": gap <= tolerance, "method": method}
+
+    @staticmethod
+    def _newton_direction(probabilities, class_slopes, residual, gap):
+        """
+        Solves (I - J) d = residual with preconditioned conjugate gradients, where
+        J v = v * (a @ P) - P^T (a * (P v)) for the (classes x E) probabilities P and class factors a.
+        The solve is inexact: it stops once the residual dropped by a gap-dependent factor.
+        """
+        weighted_sum = class_slopes @ probabilities
+        diagonal = 1.0 - (weighted_sum - class_slopes @ (probabilities * probabilities))
+        diagonal = np.maximum(diagonal, 1e-12)
+
+        def apply(vector):
+            return vector - (vector * weighted_sum - probabilities.T @ (class_slopes * (probabilities @ vector)))
 
-    def distribute_passengers_utility_based(self, rationality_factor, k_length_ratio):
+        step = np.zeros_like(residual)
+        remainder = residual.copy()
+        preconditioned = remainder / diagonal
+        direction = preconditioned.copy()
+        product = remainder @ preconditioned
+        target = min(0.5, np.sqrt(gap)) * np.linalg.norm(residual)
+
+        for _ in range(EQUILIBRIUM_CG_ITERATIONS):
+            applied = apply(direction)
+            curvature = direction @ applied
+            if curvature <= 0: # Not positive definite (positive length betas): keep what we have
+                break
+            alpha = product / curvature
+            step += alpha * direction
+            remainder -= alpha * applied
+            if np.linalg.norm(remainder) <= target:
+                break
+            preconditioned = remainder / diagonal
+            next_product = remainder @ preconditioned
+            direction = preconditioned + (next_product / product) * direction
+            product = next_product
+
+        return step if step.any() else residual
+
+    def equilibrium_report(self, rationality_factor, k_length_ratio, spawn_data=None,
+                           num_rounds=EQUILIBRIUM_REPORT_ROUNDS, seed=None):
+        """
+        Compares the stale and sequential modes with the stochastic user equilibrium.
+
+        The stale distribution is the quadrature expectation for empty queues; the sequential one
+        is the mean of num_rounds simulated sequential rounds (on a separate, seeded manager so this
+        manager's queues and random stream are untouched). For each the report gives the
+        equilibrium gap and the distance to q*, both as shares of all passengers.
+
+        :return: JSON-serialisable dictionary with "equilibrium", "stale" and "sequential" entries.
+        """
+        spawn_data = dict(self.spawn_data if spawn_data is None else spawn_data)
+        total = sum(spawn_data.values())
+        equilibrium = self.solve_equilibrium(rationality_factor, k_length_ratio, spawn_data=spawn_data)
+        target = equilibrium["queue_lengths"]
+
+        model = self._equilibrium_model(rationality_factor, k_length_ratio, spawn_data, EQUILIBRIUM_NODES)
+        stale = self._equilibrium_response(model, np.zeros(len(self.entry_tile_positions)))
+
+        sequential_manager = QueueManager(
+            self.entry_tile_positions, spawn_data, mode=MODE_SEQUENTIAL, seed=seed, grid_data=self.grid_data,
+            distance_metric=self.distance_metric, sampler=self.sampler,
+            std_dev_distance=self.std_dev_distance, std_dev_length=self.std_dev_length
+        )
+        sequential = np.zeros(len(self.entry_tile_positions))
+        for _ in range(num_rounds):
+            sequential_manager.distribute_passengers_utility_based(rationality_factor, k_length_ratio, verbose=False)
+            sequential += [sequential_manager.queues[pos] for pos in self.entry_tile_positions]
+        sequential /= max(1, num_rounds)
+
+        def describe(queue_lengths):
+            return {
+                "queue_lengths": [float(length) for length in queue_lengths],
+                "equilibrium_gap": self.equilibrium_gap(rationality_factor, k_length_ratio, queue_lengths, spawn_data),
+                "distance_to_equilibrium": float(np.abs(queue_lengths - target).sum() / (2.0 * total)) if total else 0.0
+            }
+
+        return {
+            "entry_positions": [list(pos) for pos in self.entry_tile_positions],
+            "equilibrium": {
+                "queue_lengths": [float(length) for length in target],
+                "gap": equilibrium["gap"],
+                "iterations": equilibrium["iterations"],
+                "converged": equilibrium["converged"],
+                "method": equilibrium["method"]
+            },
+            "stale": describe(stale),
+            "sequential": dict(describe(sequential), rounds=num_rounds)
+        }
+
+    def simulate_rounds(self, num_rounds, rationality_factor, k_length_ratio, verbose=False):
+        """
+        Runs num_rounds independent stale-snapshot distributions as one batched draw.
+
+        Every round starts from empty queues, so the rounds only differ by their random
+        draws: the (R, N) choices are sampled in round blocks and turned into counts
+        with a single bincount per block. The queues are left holding the final round,
+        exactly as if distribute_passengers_utility_based had been called R times.
+
+        :param num_rounds: Number of rounds (R) to simulate.
+        :param verbose: Print the DEBUG parameter lines (off for library callers).
+        :return: (R, E) integer array of queue lengths, columns ordered like self.entry_tile_positions.
+        """
+        MU = compute_scale_parameter(rationality_factor)
+        THETA = self.population_theta(k_length_ratio)
+        if verbose:
+            _log_parameters(k_length_ratio, MU)
+
+        self.clear_queues()
+
+        num_entries = len(self.entry_tile_positions)
+        round_counts = np.zeros((num_rounds, num_entries), dtype=np.int64)
+        stair_counts = self._stair_counts()
+        num_agents = int(stair_counts.sum())
+        if num_entries == 0 or num_agents == 0 or num_rounds == 0:
+            return round_counts
+
+        # Arrival order does not matter for a stale snapshot, so no shuffle is needed
+        agent_stairs = np.repeat(np.arange(len(stair_counts)), stair_counts)
+        empty_lengths = np.zeros(num_entries)
+
+        rounds_per_block = max(1, BATCH_CHUNK_ELEMENTS // num_agents)
+        for start in range(0, num_rounds, rounds_per_block):
+            stop = min(start + rounds_per_block, num_rounds)
+            block_rounds = stop - start
+
+            choices = self._sample_stale_choices(
+                np.tile(agent_stairs, block_rounds), MU, THETA, empty_lengths, round_size=num_agents
+            )
+
+            # Offset every choice by its round so one bincount yields the (rounds x entrances) block
+            round_offsets = np.repeat(np.arange(block_rounds) * num_entries, num_agents)
+            flat_counts = np.bincount(choices + round_offsets, minlength=block_rounds * num_entries)
+            round_counts[start:stop] = flat_counts.reshape(block_rounds, num_entries)
+
+        # Only the final round is handed back to the UI
+        self.set_queue_lengths(round_counts[-1])
+
+        return round_counts
+
+    def choose_entrances(self, agent_stairs, rationality_factor, k_length_ratio, queue_lengths):
+        """
+        Samples one entrance per agent against a single queue snapshot, e.g. for the
+        passengers the agent engine spawns in one tick.
+
+        :param agent_stairs: (N,) array of stair indices (order of self.stair_tile_positions).
+        :param queue_lengths: (E,) queue lengths the agents see, ordered like self.entry_tile_positions.
+        :return: (N,) array of chosen entrance indices.
+        """
+        agent_stairs = np.asarray(agent_stairs, dtype=np.int64)
+        if len(agent_stairs) == 0 or not self.entry_tile_positions:
+            return np.zeros(0, dtype=np.int64)
+        MU = compute_scale_parameter(rationality_factor)
+        THETA = self.population_theta(k_length_ratio)
+        return self._sample_stale_choices(agent_stairs, MU, THETA, np.asarray(queue_lengths, dtype=float))
+
+    def _stair_counts(self):
+        """Returns the spawn count of every stair tile, ordered like self.stair_tile_positions."""
+        return np.array([self.spawn_data[pos] for pos in self.stair_tile_positions], dtype=np.int64)
+
+    def _draw_agent_preferences(self, agent_stairs, THETA, round_size=None):
+        """
+        Draws every agent's (beta_distance, beta_length) from THETA plus one choice uniform.
+
+        With the Halton sampler each stair has its own scrambled sequence and its agents
+        take the next points of it in order, the two betas mapped through the inverse
+        normal CDF. Per-stair streams keep every stair's choice integral low-discrepancy
+        no matter how the agents of different stairs are interleaved.
+
+        :param agent_stairs: (N,) array of stair indices, one per agent.
+        :param round_size: Optional number of agents per round when agent_stairs holds several
+            consecutive rounds; every round then draws from freshly scrambled sequences.
+        :return: Tuple (agent_betas (N, 2), uniforms (N,)).
+        """
+        num_agents = len(agent_stairs)
+        means = np.array([THETA['distance']['mean'], THETA['length']['mean']])
+        std_devs = np.array([THETA['distance']['std_dev'], THETA['length']['std_dev']])
+
+        if self.sampler == SAMPLER_HALTON:
+            if round_size is None:
+                points = self._draw_halton_points(agent_stairs)
+            else:
+                points = np.empty((num_agents, 3))
+                for start in range(0, num_agents, round_size):
+                    self.restart_halton_streams()
+                    points[start:start + round_size] = self._draw_halton_points(agent_stairs[start:start + round_size])
+            standard_normals = norm_ppf(points[:, :2])
+            uniforms = points[:, 2]
+        else:
+            standard_normals = self.rng.standard_normal((num_agents, 2))
+            uniforms = self.rng.random(num_agents)
+
+        return means + std_devs * standard_normals, uniforms
+
+    def _draw_halton_points(self, agent_stairs):
+        """Returns the next (N, 3) Halton points of every agent's stair stream."""
+        points = np.empty((len(agent_stairs), 3))
+
+        # Group agents by stair (stable, so each stair keeps its arrival order)
+        order = np.argsort(agent_stairs, kind='stable')
+        stair_sizes = np.bincount(agent_stairs)
+        start = 0
+        for stair, size in enumerate(stair_sizes.tolist()):
+            if size == 0:
+                continue
+            stream = self.halton_streams.get(stair)
+            if stream is None:
+                stream = self.halton_streams[stair] = ScrambledHalton(3, self.rng)
+            points[order[start:start + size]] = stream.draw(size)
+            start += size
+        return points
+
+    def _sample_stale_choices(self, agent_stairs, MU, THETA, queue_lengths, round_size=None):
+        """
+        Samples one entrance per agent when every agent sees the same queue snapshot.
+
+        Draws each agent's (beta_distance, beta_length) as one (N, 2) array and evaluates
+        the (N, E) utility matrix chunk by chunk to bound memory.
+
+        :param agent_stairs: (N,) array of stair indices (rows of the distance matrix).
+        :param queue_lengths: (E,) array of the queue lengths all agents see.
+        :param round_size: Agents per round when agent_stairs holds several rounds (Halton sampler).
+        :return: (N,) array of chosen entrance indices.
+        """
+        num_agents = len(agent_stairs)
+        num_entries = len(self.entry_tile_positions)
+
+        agent_betas, uniforms = self._draw_agent_preferences(agent_stairs, THETA, round_size)
+
+        _, distances, unreachable = self._get_cached_distances()
+        choices = np.empty(num_agents, dtype=np.int64)
+        chunk_size = max(1, BATCH_CHUNK_ELEMENTS // num_entries)
+        for start in range(0, num_agents, chunk_size):
+            stop = min(start + chunk_size, num_agents)
+            chunk_stairs = agent_stairs[start:stop]
+            betas = agent_betas[start:stop]
+            utilities = betas[:, 0:1] * distances[chunk_stairs]
+            utilities += betas[:, 1:2] * queue_lengths[None, :]
+            unavailable = unreachable[chunk_stairs] if unreachable is not None else None
+            choices[start:stop] = sample_logit_choices(utilities, MU, uniforms[start:stop], unavailable)
+        return choices
+
+    def _distribute_reference(self, rationality_factor, k_length_ratio, verbose=False):
             """
-            Distributes passengers based on a Mixed Logit (MIXL) model,
-            inspired by "A High-Fidelity Agent-Based Framework..."
+            Reference (per-agent) implementation of the MIXL assignment.
+            Kept to validate the batch engine; slow for large passenger counts.
+            Reads the same cached distance matrix as the batch engine, so both
+            modes sample the same model under any distance metric.
             """
 
             # --- ⚙️ HELPER FUNCTIONS (based on our previous code) ⚙️ ---
@@ -117,9 +1034,9 @@ class QueueManager:
 
             # The slider controls the MEAN preference.
             # We get the population mean $\overline{\beta}_{k}$ from the slider.
-            k_ratio = max(0.0, min(MAX_WEIGHT_VALUE, k_length_ratio))  # Clamp between 0 and MAX_WEIGHT_VALUE
-            print(f"DEBUG: Using k_length_ratio (slider value) = {k_ratio}")
-            print(f"DEBUG: Using rationality_factor (slider value) = {MU}")
+            k_ratio = clamp_k_ratio(k_length_ratio)
+            if verbose:
+                _log_parameters(k_length_ratio, MU)
 
             # **CRITICAL**: Distance and Length are "costs" or "disutilities".
             # In utility theory, costs have NEGATIVE preference coefficients.
@@ -132,19 +1049,20 @@ class QueueManager:
             THETA = {
                 'distance': {
                     'mean': mean_distance_cost_pref,
-                    'std_dev': STD_DEV_DISTANCE
+                    'std_dev': self.std_dev_distance
                 },
                 'length': {
                     'mean': mean_length_cost_pref,
-                    'std_dev': STD_DEV_LENGTH
+                    'std_dev': self.std_dev_length
                 }
             }
 
             # --- 3. Create the list of all individual agents to process ---
+            # Agents are kept as stair indices: the rows of the cached distance matrix
             all_agents_to_spawn = []
-            for stair_pos, count in self.spawn_data.items():
-                for _ in range(count):
-                    all_agents_to_spawn.append(stair_pos)
+            for stair_index, stair_pos in enumerate(self.stair_tile_positions):
+                for _ in range(self.spawn_data[stair_pos]):
+                    all_agents_to_spawn.append(stair_index)
 
             random.shuffle(all_agents_to_spawn)
 
@@ -154,10 +1072,14 @@ class QueueManager:
             # This is the "stale" information state.
             stale_queue_lengths = self.queues.copy() 
 
+            # Distances come from the same matrix as the batch engine (Euclidean or walking),
+            # with unreachable pairs zeroed here and masked out of the choice below
+            _, distances, unreachable = self._get_cached_distances()
+
             # --- 4. Main Loop: Each agent makes a choice based on STALE info ---
             # This loop *is* the simulation of the MIXL integral.
             # Each agent is one "draw" from the f($\beta$|$\theta$) distribution.
-            for stair_pos in all_agents_to_spawn:
+            for stair_index in all_agents_to_spawn:
 
                 # --- 4a. Generate Agent-Specific Preferences (MIXL $\beta_{k,n}$) ---
                 # Draw this agent's unique $\beta_{k,n}$ from the population distribution
@@ -168,10 +1090,10 @@ class QueueManager:
                 possible_choices = []
 
                 # --- 4b. Evaluate all choices to get V_in for each ---
-                for entry_pos in self.entry_tile_positions:
+                for entry_index, entry_pos in enumerate(self.entry_tile_positions):
 
                     # i. Get attributes ($X_{ikn}$) for this choice
-                    distance = self._euclidean_distance(stair_pos, entry_pos) 
+                    distance = distances[stair_index, entry_index]
                     queue_length = stale_queue_lengths[entry_pos]
 
                     choice_attributes = {
@@ -193,6 +1115,10 @@ class QueueManager:
                 # Multiply by scale parameter $\mu$ (which is now set by rationality_factor)
                 scaled_v = np.array(choice_utilities) * MU
 
+                # Entrances this stair cannot walk to get zero probability
+                if unreachable is not None:
+                    scaled_v[unreachable[stair_index]] = -np.inf
+
                 # Use softmax for numerical stability (prevents overflow)
                 exp_v = np.exp(scaled_v - np.max(scaled_v))
 
@@ -220,11 +1146,20 @@ class QueueManager:
         """Returns the current queue lengths dictionary."""
         return self.queues
 
+    def set_queue_lengths(self, counts):
+        """Overwrites the queues with a count per entry tile, ordered like self.entry_tile_positions."""
+        for pos, count in zip(self.entry_tile_positions, counts):
+            self.queues[pos] = int(count)
+
     def update_total_passengers(self, new_spawn_data):
         """Updates the internal spawn data reference and recalculates the total."""
         self.spawn_data = new_spawn_data
         self.total_passengers_to_spawn = sum(self.spawn_data.values())
-        self.stair_tile_positions = list(new_spawn_data.keys()) 
+
+        new_stair_positions = list(new_spawn_data.keys())
+        if new_stair_positions != self.stair_tile_positions:
+            self._layout_key = None # Row order of the distance matrix changed
+        self.stair_tile_positions = new_stair_positions
 
     def clear_queues(self):
         """Sets the length of all queues to zero."""
@@ -0,0 +1,103 @@
+# game_states/result_cache.py
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+# --- Result Cache Constants ---
+# Number of results kept in memory before the least recently used one is dropped
+RESULT_CACHE_SIZE = 64
+# Part of every key: bump it when the engines or the stored result format change, so
+# entries written by an older version are never served again
+RESULT_SCHEMA_VERSION = 1
+
+
+def result_key(layout_key, spawn_data, k_length_ratio, rationality_factor, mode, seed, **extra):
+    """
+    Returns a stable hash identifying one distribution request.
+
+    :param layout_key: QueueManager.layout_key() (grid, positions and distance metric).
+    :param spawn_data: Dictionary mapping stair tiles to their spawn count.
+    :param mode: Distribution mode (or "expected" for the quadrature preview).
+    :param seed: Seed of the run; None for analytic results.
+    :param extra: Any other setting that changes the result (sampler, refresh interval, ...).
+    """
+    request = {
+        "schema": RESULT_SCHEMA_VERSION,
+        "layout": layout_key,
+        "spawn": sorted([list(pos), int(count)] for pos, count in spawn_data.items()),
+        "k_length_ratio": float(k_length_ratio),
+        "rationality_factor": float(rationality_factor),
+        "mode": mode,
+        "seed": seed,
+        "extra": {name: extra[name] for name in sorted(extra)}
+    }
+    return hashlib.sha1(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Memoises distribution results (queue counts and summary statistics) keyed by
+    result_key(). Results are JSON-serialisable dictionaries.
+
+    The in-memory store is an LRU with max_entries slots. With disk_dir set every
+    result is also written there as <key>.json, so repeated configurations survive
+    a restart; a disk hit is promoted back into memory.
+
+    Only deterministic requests belong here (seeded runs and analytic results):
+    caching an unseeded run would freeze its randomness.
+    """
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, disk_dir=None):
+        """
+        :param max_entries: In-memory LRU capacity.
+        :param disk_dir: Optional directory for the on-disk store (created on first write).
+        """
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key):
+        """Returns the cached result for key, or None on a miss."""
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            try:
+                with open(self._disk_path(key)) as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                result = None # Unreadable entry: treat as a miss and overwrite it later
+            if result is not None:
+                self._store_in_memory(key, result)
+                self.hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        """Stores a result in memory and, when enabled, on disk."""
+        self._store_in_memory(key, result)
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(self._disk_path(key), 'w') as f:
+                json.dump(result, f)
+
+    def _store_in_memory(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drops every in-memory entry (the disk store is left untouched)."""
+        self._entries.clear()
@@ -0,0 +1,384 @@
+# game_states/simulation/agent_engine.py
+import numpy as np
+import pygame
+
+import config
+from ..congestion import CongestionFields, smoothed_density, speed_factor, congestion_costs
+from ..distance_fields import UNREACHABLE
+from ..flow_fields import get_flow_fields
+from ..spatial_hash import SpatialHash, radix_cell_size
+
+# RUN engines (config.RUN_ENGINE)
+RUN_ENGINE_INSTANT = "instant"
+RUN_ENGINE_AGENTS = "agents"
+
+# --- Agent States ---
+# Every agent is one slot of the engine's struct-of-arrays buffers; a boarded
+# passenger frees its slot for the next spawn.
+AGENT_FREE = 0
+AGENT_WALKING = 1
+AGENT_QUEUED = 2
+
+# --- Engine Defaults ---
+INITIAL_CAPACITY = 1024 # Slots allocated up front; the buffers double when they run full
+SPAWN_JITTER = 0.3 # Max offset (tiles) from the stairs centre, so agents of one stair do not overlap
+AGENT_DOT_RADIUS = 1 # Drawn agents are (2r+1) x (2r+1) pixel dots
+
+
+class AgentEngine:
+    """
+    Time-stepped passenger simulation: agents spawn at the stairs, pick an entrance with
+    the QueueManager choice model, walk across the platform tiles, queue at the door and
+    board while a train is in.
+
+    Agent state lives in struct-of-arrays NumPy buffers (one slot per agent), and every
+    tick is a fixed number of array operations over all agents, so the cost per tick does
+    not involve any per-agent Python code.
+    """
+    def __init__(self, queue_manager, grid_data, spawn_counts, rationality_factor, k_length_ratio, seed=None):
+        """
+        :param queue_manager: QueueManager whose choice model (and stairs/entrance order) the agents use.
+        :param grid_data: 2D station grid the agents walk on.
+        :param spawn_counts: Passengers still to spawn per stairs tile, ordered like queue_manager.stair_tile_positions.
+        :param rationality_factor: Slider value used for the entrance choices (may be changed between ticks).
+        :param k_length_ratio: Slider value used for the entrance choices (may be changed between ticks).
+        :param seed: Optional seed for spawn jitter, walking speeds and boarding order.
+        """
+        self.queue_manager = queue_manager
+        self.queue_manager.restart_halton_streams() # The whole engine run is one round of choices
+        self.rationality_factor = rationality_factor
+        self.k_length_ratio = k_length_ratio
+        self.rng = np.random.default_rng(seed)
+
+        self.height = len(grid_data)
+        self.width = len(grid_data[0]) if self.height else 0
+        # Direction fields: row e holds the next tile towards entrance e from every tile. They start
+        # as the shared shortest-path fields and are repaired around crowded tiles as the run goes on
+        self.flow_fields = get_flow_fields(grid_data)
+        self.navigation = CongestionFields(self.flow_fields, list(queue_manager.entry_tile_positions))
+        self.next_cell = self.navigation.next_cell # Same array, updated in place
+
+        # Tile-aligned spatial hash of the agents on the platform, rebuilt every tick
+        # (neighbour queries for collision avoidance, density for the heatmap and crowding)
+        self.spatial_hash = SpatialHash(self.height, self.width)
+        # Finer hash of the walking agents for collision avoidance, with cells about one body diameter
+        # wide, so a dense crowd yields a few candidate pairs per agent (cells grow on large stations
+        # so its rebuild stays a radix sort)
+        collision_cell = radix_cell_size(self.height, self.width, 2.0 * config.AGENT_RADIUS)
+        self.collision_hash = SpatialHash(self.height, self.width, cell_size=collision_cell)
+        self.local_density = np.zeros((self.height, self.width)) # Smoothed persons per m2
+        self.ticks = 0
+        self.refresh_cursor = 0 # First entrance of the next route refresh
+
+        stairs = np.array(queue_manager.stair_tile_positions, dtype=np.int64).reshape(-1, 2)
+        entries = np.array(queue_manager.entry_tile_positions, dtype=np.int64).reshape(-1, 2)
+        self.stair_cells = stairs[:, 0] * self.width + stairs[:, 1]
+        self.entry_cells = entries[:, 0] * self.width + entries[:, 1]
+        self.num_entries = len(entries)
+
+        # --- Spawning and boarding state ---
+        self.remaining = np.asarray(spawn_counts, dtype=np.int64).copy() # Passengers left per stairs tile
+        self.spawn_credit = np.zeros(len(stairs)) # Fractional spawns carried to the next tick
+        self.boarding_credit = np.zeros(self.num_entries)
+        self.boarded = np.zeros(self.num_entries, dtype=np.int64) # Passengers boarded per entrance
+        self.time = 0.0
+
+        # --- Struct-of-arrays agent buffers ---
+        self.capacity = 0
+        self.position = np.zeros((0, 2), dtype=np.float32) # (row, col) in tile units, tile centres at +0.5
+        self.cell = np.zeros(0, dtype=np.int32) # Flat index of the tile the agent stands on
+        self.target = np.zeros(0, dtype=np.int32) # Entrance index
+        self.speed = np.zeros(0, dtype=np.float32) # Tiles per second
+        self.state = np.zeros(0, dtype=np.uint8)
+        self.queue_time = np.zeros(0) # Arrival time at the door (boarding is first come, first served)
+        self._grow(INITIAL_CAPACITY)
+
+    def _grow(self, capacity):
+        """Reallocates every buffer with room for `capacity` agents, keeping the existing slots."""
+        old = self.capacity
+        self.capacity = capacity
+        for name in ("position", "cell", "target", "speed", "state", "queue_time"):
+            buffer = getattr(self, name)
+            grown = np.zeros((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+            grown[:old] = buffer
+            setattr(self, name, grown)
+
+    # --- Queries ---
+
+    def queue_lengths(self):
+        """Returns the (E,) number of agents waiting at every entrance."""
+        queued = self.state == AGENT_QUEUED
+        return np.bincount(self.target[queued], minlength=self.num_entries)
+
+    def num_walking(self):
+        return int(np.count_nonzero(self.state == AGENT_WALKING))
+
+    def is_finished(self):
+        """True once every passenger has spawned and no agent is left walking or (with boarding on) queued."""
+        if self.remaining.sum() > 0 or self.num_walking() > 0:
+            return False
+        return config.AGENT_BOARDING_RATE <= 0 or not np.any(self.state == AGENT_QUEUED)
+
+    # --- Tick ---
+
+    def density(self):
+        """Returns the (H, W) number of agents (walking or queued) on every tile after the last tick."""
+        return self.spatial_hash.density()
+
+    def step(self, dt):
+        """Advances the simulation by dt seconds: spawn, walk, arrive, keep apart, board, re-plan."""
+        self.time += dt
+        self.ticks += 1
+        self._spawn(dt)
+        self._walk(dt)
+        self.spatial_hash.rebuild(self.position, np.flatnonzero(self.state != AGENT_FREE))
+        self._separate()
+        self._board(dt)
+        self._update_crowding()
+
+    def _update_crowding(self):
+        """
+        Smooths this tick's occupancy into the local density (used for the walking speeds of the
+        next tick) and, every config.CONGESTION_REFRESH_TICKS ticks, re-plans the routes to the next
+        config.CONGESTION_TARGETS_PER_REFRESH entrances (round robin over the entrances somebody is
+        walking to). A re-plan is repaired over as many ticks as it needs, at most
+        config.CONGESTION_REPAIR_LABELS labels per tick, and the old routes are followed until it
+        completes; the next one starts on the first refresh tick after that. Only walking agents
+        count: the queue of a door is kept on the door tile itself and would otherwise read as a
+        jam in front of it.
+        """
+        if not config.AGENT_DENSITY_SPEED and not config.CONGESTION_REFRESH_TICKS:
+            return
+        walking = self.state == AGENT_WALKING
+        rows = np.clip(self.position[walking, 0].astype(np.int64), 0, self.height - 1)
+        cols = np.clip(self.position[walking, 1].astype(np.int64), 0, self.width - 1)
+        occupancy = np.bincount(rows * self.width + cols, minlength=self.height * self.width)
+        self.local_density = smoothed_density(
+            occupancy.reshape(self.height, self.width), self.flow_fields.walkable, config.AGENT_TILE_AREA
+        )
+        refresh = config.CONGESTION_REFRESH_TICKS
+        if not refresh:
+            return
+        if self.navigation.updating:
+            self.navigation.advance(config.CONGESTION_REPAIR_LABELS)
+            return
+        if self.ticks % refresh:
+            return
+        headed = np.flatnonzero(np.bincount(self.target[walking], minlength=self.num_entries))
+        if len(headed) == 0:
+            return
+        turn = np.roll(headed, -int(np.searchsorted(headed, self.refresh_cursor)))
+        group = turn[:config.CONGESTION_TARGETS_PER_REFRESH]
+        self.refresh_cursor = int(group[-1]) + 1
+        costs = congestion_costs(self.local_density, config.CONGESTION_COST_WEIGHT)
+        self.navigation.start_update(costs, config.CONGESTION_COST_TOLERANCE, group)
+        self.navigation.advance(config.CONGESTION_REPAIR_LABELS)
+
+    def _spawn(self, dt):
+        """Spawns config.AGENT_SPAWN_RATE passengers per second at every stairs tile until its pool is empty."""
+        if self.num_entries == 0 or not self.remaining.any():
+            return
+        self.spawn_credit += config.AGENT_SPAWN_RATE * dt
+        if config.AGENT_DENSITY_SPEED:
+            # Passengers wait on the stairs while the tile at its foot is packed (no burst once it clears)
+            packed = self.local_density.reshape(-1)[self.stair_cells] >= config.AGENT_SPAWN_MAX_DENSITY
+            self.spawn_credit[packed] = np.minimum(self.spawn_credit[packed], 0.999)
+        counts = np.minimum(self.spawn_credit.astype(np.int64), self.remaining)
+        self.spawn_credit -= counts
+        self.spawn_credit[self.remaining == counts] = 0.0 # Nothing left to carry over
+        self.remaining -= counts
+        total = int(counts.sum())
+        if total == 0:
+            return
+
+        free = np.flatnonzero(self.state == AGENT_FREE)
+        if len(free) < total:
+            self._grow(max(2 * self.capacity, self.capacity + total))
+            free = np.flatnonzero(self.state == AGENT_FREE)
+        slots = free[:total]
+
+        agent_stairs = np.repeat(np.arange(len(counts)), counts)
+        cells = self.stair_cells[agent_stairs]
+        jitter = self.rng.uniform(-SPAWN_JITTER, SPAWN_JITTER, (total, 2))
+
+        # Everybody spawning this tick sees the same queues (the door counters at this moment)
+        self.target[slots] = self.queue_manager.choose_entrances(
+            agent_stairs, self.rationality_factor, self.k_length_ratio, self.queue_lengths()
+        )
+        self.position[slots, 0] = cells // self.width + 0.5 + jitter[:, 0]
+        self.position[slots, 1] = cells % self.width + 0.5 + jitter[:, 1]
+        self.cell[slots] = cells
+        mean_speed, std_speed = config.AGENT_WALK_SPEED
+        self.speed[slots] = np.maximum(self.rng.normal(mean_speed, std_speed, total), 0.1 * mean_speed)
+        self.state[slots] = AGENT_WALKING
+
+    def _walk(self, dt):
+        """
+        Moves every walking agent towards the centre of the next tile on its flow field, looked
+        up from the tile it stands on; agents that stand on their door start queueing.
+        """
+        walking = np.flatnonzero(self.state == AGENT_WALKING)
+        if len(walking) == 0:
+            return
+
+        positions = np.take(self.position, walking, axis=0) # np.take: fast row gather
+        rows = np.clip(positions[:, 0].astype(np.int64), 0, self.height - 1)
+        cols = np.clip(positions[:, 1].astype(np.int64), 0, self.width - 1)
+        cells = rows * self.width + cols
+        self.cell[walking] = cells
+
+        targets = self.target[walking]
+        door_cells = self.entry_cells[targets]
+        arrived = cells == door_cells
+        self.state[walking[arrived]] = AGENT_QUEUED
+        self.queue_time[walking[arrived]] = self.time
+
+        moving = ~arrived
+        walking, positions, cells, targets = walking[moving], positions[moving], cells[moving], targets[moving]
+        next_cells = self.next_cell[targets, cells]
+
+        # No path (a stair cut off from its entrance): the agent heads straight for the door
+        stuck = next_cells == UNREACHABLE
+        next_cells[stuck] = door_cells[moving][stuck]
+
+        offsets = np.empty_like(positions)
+        offsets[:, 0] = next_cells // self.width + 0.5 - positions[:, 0]
+        offsets[:, 1] = next_cells % self.width + 0.5 - positions[:, 1]
+        distances = np.sqrt(offsets[:, 0] * offsets[:, 0] + offsets[:, 1] * offsets[:, 1])
+        steps = self.speed[walking] * dt
+        if config.AGENT_DENSITY_SPEED:
+            # Fundamental diagram: slower in a crowd (density of the tile the agent stands on)
+            steps = steps * speed_factor(self.local_density.reshape(-1)[cells])
+        scale = np.minimum(1.0, steps / np.maximum(distances, 1e-9)).astype(np.float32)
+        self.position[walking] = positions + offsets * scale[:, None]
+
+    def _separate(self):
+        """
+        Collision avoidance: walking agents closer than two radii push each other apart by half
+        their overlap (close pairs from the collision hash). Queued agents wait at the door and are
+        left out; a push that would leave the walkable tiles is dropped.
+        """
+        walking = np.flatnonzero(self.state == AGENT_WALKING)
+        if len(walking) < 2:
+            return
+        diameter = 2.0 * config.AGENT_RADIUS
+        self.collision_hash.rebuild(self.position, walking)
+        agents, neighbours = self.collision_hash.close_pairs(diameter, max_per_cell=config.AGENT_NEIGHBOUR_LIMIT)
+        if len(agents) == 0:
+            return
+
+        offsets = np.take(self.position, agents, axis=0) - np.take(self.position, neighbours, axis=0)
+        distances = np.sqrt(offsets[:, 0] * offsets[:, 0] + offsets[:, 1] * offsets[:, 1])
+        apart = distances > 1e-6 # Agents on the exact same spot have no direction to push in
+        scale = np.where(apart, 0.5 * (diameter - distances) / np.maximum(distances, 1e-6), 0.0)
+
+        # Sum the pushes per agent: each pair is found once and pushes both of its agents
+        pair_agents = np.concatenate([agents, neighbours])
+        push_rows = offsets[:, 0] * scale
+        push_cols = offsets[:, 1] * scale
+        push_rows = np.bincount(pair_agents, weights=np.concatenate([push_rows, -push_rows]), minlength=self.capacity)[walking]
+        push_cols = np.bincount(pair_agents, weights=np.concatenate([push_cols, -push_cols]), minlength=self.capacity)[walking]
+        pushed = np.take(self.position, walking, axis=0)
+        pushed[:, 0] += push_rows
+        pushed[:, 1] += push_cols
+
+        walkable = self.flow_fields.walkable
+        rows = np.clip(pushed[:, 0].astype(np.int64), 0, self.height - 1)
+        cols = np.clip(pushed[:, 1].astype(np.int64), 0, self.width - 1)
+        valid = walkable[rows, cols] & (pushed[:, 0] >= 0) & (pushed[:, 1] >= 0)
+        self.position[walking[valid]] = pushed[valid]
+
+    def train_at_platform(self):
+        """Trains arrive every config.AGENT_TRAIN_INTERVAL seconds and stay config.AGENT_TRAIN_DWELL seconds."""
+        interval = config.AGENT_TRAIN_INTERVAL
+        if not interval:
+            return True # No timetable: the doors are always open
+        return self.time % interval >= interval - config.AGENT_TRAIN_DWELL
+
+    def _board(self, dt):
+        """While a train is in, every door boards config.AGENT_BOARDING_RATE queued passengers per second, in arrival order."""
+        if config.AGENT_BOARDING_RATE <= 0 or not self.train_at_platform():
+            self.boarding_credit[:] = 0.0
+            return
+
+        queued = np.flatnonzero(self.state == AGENT_QUEUED)
+        self.boarding_credit += config.AGENT_BOARDING_RATE * dt
+        if len(queued) == 0:
+            self.boarding_credit[:] = 0.0
+            return
+
+        # Rank every queued agent within its door (first come, first served)
+        order = queued[np.lexsort((self.queue_time[queued], self.target[queued]))]
+        doors = self.target[order]
+        lengths = np.bincount(doors, minlength=self.num_entries)
+        ranks = np.arange(len(order)) - (np.cumsum(lengths) - lengths)[doors]
+
+        capacity = self.boarding_credit.astype(np.int64)
+        boarding = order[ranks < capacity[doors]]
+        boarded = np.bincount(self.target[boarding], minlength=self.num_entries)
+        self.boarding_credit -= boarded
+        self.boarding_credit[boarded >= lengths] = 0.0 # An empty door does not bank boarding capacity
+        self.boarded += boarded
+        self.state[boarding] = AGENT_FREE
+
+
+def draw_agents(screen, engine, colors=None):
+    """
+    Draws every walking agent as a small dot coloured by its entrance, writing straight
+    into the screen pixels so thousands of agents cost a few array assignments.
+    """
+    walking = np.flatnonzero(engine.state == AGENT_WALKING)
+    if len(walking) == 0:
+        return
+    if colors is None:
+        colors = entrance_colors(engine.num_entries)
+    mapped_colors = np.array([screen.map_rgb(tuple(int(v) for v in color)) for color in colors])
+
+    xs = (engine.position[walking, 1] * config.TILE_SIZE).astype(np.int64)
+    ys = (engine.position[walking, 0] * config.TILE_SIZE).astype(np.int64)
+    agent_colors = mapped_colors[engine.target[walking]]
+
+    pixels = pygame.surfarray.pixels2d(screen)
+    width, height = pixels.shape
+    inside = (xs >= AGENT_DOT_RADIUS) & (xs < width - AGENT_DOT_RADIUS) & \
+             (ys >= AGENT_DOT_RADIUS) & (ys < height - AGENT_DOT_RADIUS)
+    xs, ys, agent_colors = xs[inside], ys[inside], agent_colors[inside]
+
+    rows = pixels.T # (height, width) view; row-major when the surface has no row padding
+    if rows.flags.c_contiguous:
+        # Flat pixel indices: one cheap scatter per dot offset
+        flat = rows.reshape(-1)
+        centres = ys * width + xs
+        for dy in range(-AGENT_DOT_RADIUS, AGENT_DOT_RADIUS + 1):
+            for dx in range(-AGENT_DOT_RADIUS, AGENT_DOT_RADIUS + 1):
+                flat[centres + (dy * width + dx)] = agent_colors
+    else:
+        for dy in range(-AGENT_DOT_RADIUS, AGENT_DOT_RADIUS + 1):
+            for dx in range(-AGENT_DOT_RADIUS, AGENT_DOT_RADIUS + 1):
+                pixels[xs + dx, ys + dy] = agent_colors
+    del pixels # Unlocks the screen surface
+
+
+def draw_density_heatmap(screen, density, max_density):
+    """
+    Draws agents per tile as a red overlay, fully opaque at max_density: one pixel per tile
+    written into a small surface that is scaled up to the tile grid in a single blit.
+    """
+    height, width = density.shape
+    overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+    strength = np.clip(density.T / max_density, 0.0, 1.0) # surfarray arrays are (x, y)
+    pygame.surfarray.pixels3d(overlay)[:] = (255, 40, 0)
+    alpha = pygame.surfarray.pixels_alpha(overlay)
+    alpha[:] = (strength * 180).astype(np.uint8)
+    del alpha # Unlocks the overlay surface
+    screen.blit(pygame.transform.scale(overlay, (width * config.TILE_SIZE, height * config.TILE_SIZE)), (0, 0))
+
+
+def entrance_colors(num_entries):
+    """Returns (E, 3) uint8 colours spread around the hue circle, one per entrance."""
+    colors = np.zeros((max(num_entries, 1), 3), dtype=np.uint8)
+    for e in range(num_entries):
+        color = pygame.Color(0)
+        color.hsva = (360.0 * e / num_entries, 80, 100, 100)
+        colors[e] = (color.r, color.g, color.b)
+    return colors
@@ -0,0 +1,87 @@
+# game_states/simulation/background_task.py
+import threading
+import traceback
+
+
+class BackgroundTask:
+    """
+    Runs one long simulation action (RUN, Run & Export) on a worker thread so the
+    pygame loop keeps handling events and rendering while it works.
+
+    The task body is called as target(task) and uses the task object to report its
+    progress and to check whether the user pressed Cancel. It must not touch pygame
+    objects: SimulationState polls the task from update() and applies the result
+    (visual sync, counters) on the main thread through the on_done callback.
+    """
+    def __init__(self, name, target, on_done=None):
+        """
+        :param name: Label shown next to the progress bar.
+        :param target: Callable run on the worker as target(task); its return value becomes task.result.
+        :param on_done: Optional callable invoked as on_done(task) from poll() on the main thread.
+        """
+        self.name = name
+        self.target = target
+        self.on_done = on_done
+
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+
+        self._cancel_event = threading.Event()
+        self._thread = None
+        self._finished = False
+
+    def start(self, background=True):
+        """
+        Starts the task on a daemon thread, or runs it to completion right here when
+        background=False (headless use and config.RUN_IN_BACKGROUND = False).
+        """
+        if background:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        else:
+            self._run()
+        return self
+
+    def _run(self):
+        try:
+            self.result = self.target(self)
+        except Exception as error:
+            self.error = error
+            print(f"ERROR: {self.name} failed.")
+            traceback.print_exc()
+        self.progress = 1.0
+
+    # --- Called from the task body (worker thread) ---
+
+    def report_progress(self, fraction):
+        """Stores the completed fraction (0..1) for the progress bar."""
+        self.progress = min(1.0, max(0.0, float(fraction)))
+
+    @property
+    def cancelled(self):
+        """True once cancel() was called; the task body should stop at its next check."""
+        return self._cancel_event.is_set()
+
+    # --- Called from the main thread ---
+
+    def cancel(self):
+        """Asks the task body to stop at its next cancellation check."""
+        self._cancel_event.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def poll(self):
+        """
+        Returns True once the task has finished, invoking on_done(task) exactly once
+        (on the calling thread). Returns False while the worker is still busy.
+        """
+        if self.running:
+            return False
+        if not self._finished:
+            self._finished = True
+            if self.on_done:
+                self.on_done(self)
+        return True
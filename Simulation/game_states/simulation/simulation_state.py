@@ -1,16 +1,33 @@
 # game_states/simulation/simulation_state.py (The Refactored Version)
 import pygame
-import csv
+import json
 import config
 import os
+import numpy as np
+from contextlib import nullcontext
 
 from ..tile_manager import TileManager
 from ..layout_io import load_layout, get_layout_path 
 from ..state import State 
-from ..queue_manager import QueueManager
+from ..queue_manager import (
+    QueueManager, MODE_REFERENCE, MODE_BATCH, SAMPLER_PSEUDO, SAMPLER_HALTON, HALTON_SPREAD_WARNING,
+    STD_DEV_DISTANCE, STD_DEV_LENGTH
+)
+from ..parallel_export import run_parallel_rounds, new_master_seed, simulate_point_rounds, BLOCK_ROUNDS
+from ..export_stats import RunningMoments, ExportSummary
+from ..export_io import StreamingCsvWriter, ColumnarCountWriter
+from ..result_cache import ResultCache, result_key
+from ..parameter_sweep import run_parameter_sweep, save_sweep_results, sweep_values
+from ..calibration import (
+    calibrate_parameters, load_observed_counts, save_calibration, load_calibration, METHOD_MOMENTS
+)
+from ..overload_estimation import estimate_overload, save_overload_estimate
+from ..event_simulation import DayEventSimulation, save_day_report, COMMUTER_PROFILE
 # --- NEW IMPORT ---
 from .simulation_ui_controller import SimulationUIController 
 # ------------------
+from .background_task import BackgroundTask
+from .agent_engine import AgentEngine, draw_agents, draw_density_heatmap, entrance_colors, RUN_ENGINE_AGENTS
 
 from ui_elements.button import Button # Only needed if creating buttons here
 from dialog import LoadDialog
@@ -49,8 +66,16 @@ class SimulationState(State):
         self.ui_controller._create_queue_counters()
 
         # --- Queue Manager Setup ---
+        # Taste heterogeneity of the choice model (replaced by a calibration, see _apply_calibration)
+        self.std_dev_distance = STD_DEV_DISTANCE
+        self.std_dev_length = STD_DEV_LENGTH
+
         entry_tiles = self._get_tiles_by_id(4) 
-        self.queue_manager = QueueManager(entry_tiles, self.spawn_data)
+        self.queue_manager = QueueManager(
+            entry_tiles, self.spawn_data, mode=config.DISTRIBUTION_MODE, grid_data=self.grid_data,
+            refresh_interval=config.QUEUE_REFRESH_INTERVAL, distance_metric=config.DISTANCE_METRIC,
+            sampler=config.SAMPLER, std_dev_distance=self.std_dev_distance, std_dev_length=self.std_dev_length
+        )
         self.queue_manager.clear_queues()
         self._update_queue_visuals() # Initial visual update
 
@@ -63,6 +88,32 @@ class SimulationState(State):
         )
         self.active_dialog = None
         self.click_lockout_timer = 0 
+
+        # Achieved precision of the last precision-targeted export (see config.EXPORT_CI_TOLERANCE)
+        self.export_precision = None
+        # Master seed of the last export (None for unseeded runs)
+        self.export_seed = None
+
+        # RUN / Run & Export currently running on the background worker (None when idle)
+        self.active_task = None
+
+        # Memoised deterministic results (seeded RUNs, expected-distribution previews)
+        self.result_cache = ResultCache(
+            config.RESULT_CACHE_SIZE,
+            disk_dir=os.path.join("exports", "cache") if config.RESULT_CACHE_DISK else None
+        )
+        self.last_run_summary = None # Summary statistics of the last RUN
+
+        # Time-stepped agent RUN (config.RUN_ENGINE = "agents"), advanced by _simulation_step (None when idle)
+        self.agent_engine = None
+        self.agent_colors = None
+        self.show_density_heatmap = config.SHOW_DENSITY_HEATMAP
+
+        # Start from the last calibration (before the slider preview is connected)
+        if config.LOAD_CALIBRATION:
+            calibration = load_calibration(config.CALIBRATION_PATH)
+            if calibration is not None:
+                self._apply_calibration(calibration)
         
         # --- FINAL STEP: Connect UI Buttons to SimulationState methods ---
         self.ui_controller.set_run_reset_export_callbacks(
@@ -70,6 +121,13 @@ class SimulationState(State):
             self._reset_simulation_state, 
             self.start_simulation_and_export
         )
+        self.ui_controller.set_sweep_callback(self.start_parameter_sweep)
+        self.ui_controller.set_calibrate_callback(self.start_calibration)
+        self.ui_controller.set_overload_callback(self.start_overload_estimation)
+        self.ui_controller.set_day_callback(self.start_day_simulation)
+        self.ui_controller.set_cancel_task_callback(self._cancel_active_task)
+        if config.PREVIEW_EXPECTED_ON_SLIDER:
+            self.ui_controller.set_parameters_changed_callback(self._preview_expected_distribution)
 
 
     def handle_events(self, events):
@@ -79,8 +137,14 @@ class SimulationState(State):
         if self.active_dialog:
             self.active_dialog.handle_events(events)
             return
+
+        # 2. While a background task runs, only its Cancel button takes input
+        if self.active_task:
+            for event in events:
+                self.ui_controller.handle_busy_event(event)
+            return
             
-        # 2. Process and Delegate each event to the UI Controller
+        # 3. Process and Delegate each event to the UI Controller
         for event in events:
             
             # Check for General State Change Keys (Escape)
@@ -89,7 +153,12 @@ class SimulationState(State):
                 self.done = True
                 return # Exit immediately on state change
 
-            # 3. Delegate the individual event to the UI Controller
+            # H toggles the agent density heatmap
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                self.show_density_heatmap = not self.show_density_heatmap
+                continue
+
+            # 4. Delegate the individual event to the UI Controller
             # The controller handles buttons, slider, textbox, and stairs selection
             self.ui_controller.handle_event(event) 
             
@@ -103,21 +172,30 @@ class SimulationState(State):
             self.active_dialog.update()
             return
 
-        # 2. Lockout Check
+        # 2. Poll the background worker (its results are applied here, on the main thread)
+        if self.active_task:
+            self._poll_active_task()
+
+        # 3. Lockout Check
         if self.click_lockout_timer > 0:
             self.click_lockout_timer -= 1
             return 
             
-        # 3. Delegate UI updates
+        # 4. Delegate UI updates
         self.ui_controller.update()
 
-        # Add core simulation update logic here later...
-        pass
+        # 5. Advance the agent simulation by one frame
+        self._simulation_step()
 
     def draw(self, screen):
         """Draws all elements: tiles, control panel, buttons, and spawn counters."""
         screen.fill(config.BLACK)
         self.tile_manager.sprites.draw(screen)
+
+        if self.agent_engine is not None:
+            if self.show_density_heatmap:
+                draw_density_heatmap(screen, self.agent_engine.density(), config.DENSITY_HEATMAP_MAX)
+            draw_agents(screen, self.agent_engine, self.agent_colors)
         
         # Delegate drawing of all UI elements to the controller
         self.ui_controller.draw(screen)
@@ -159,7 +237,11 @@ class SimulationState(State):
             
             # Re-initialize the QueueManager with the new data and updated spawn_data references
             entry_tiles = self._get_tiles_by_id(4) 
-            self.queue_manager = QueueManager(entry_tiles, self.spawn_data)
+            self.queue_manager = QueueManager(
+                entry_tiles, self.spawn_data, mode=config.DISTRIBUTION_MODE, grid_data=self.grid_data,
+                refresh_interval=config.QUEUE_REFRESH_INTERVAL, distance_metric=config.DISTANCE_METRIC,
+                sampler=config.SAMPLER, std_dev_distance=self.std_dev_distance, std_dev_length=self.std_dev_length
+            )
             
             self.queue_manager.clear_queues()
             self._update_queue_visuals() 
@@ -174,10 +256,244 @@ class SimulationState(State):
         """
         Initiates multiple simulation runs, records the distribution results 
         in the specified CSV format, and saves the data.
+        The rounds run on the background worker (_export_rounds); the visuals are
+        re-synced on the main thread once it finishes (_finish_export).
         """
         # 1. Get the desired number of runs
         num_iterations = self.ui_controller.get_iteration_count()
         print(f"Starting simulation and export for {num_iterations} rounds...")
+
+        # Ensure a clean slate before the first run logic (main thread: this touches the visuals)
+        self._reset_simulation_state()
+
+        self._start_task(
+            "Run & Export",
+            lambda task: self._export_rounds(task, num_iterations),
+            self._finish_export
+        )
+
+    def start_parameter_sweep(self):
+        """
+        Callback for the 'Sweep' button: evaluates the config.SWEEP_* grid of queue ratio x
+        rationality (x spawn scale) values on the background worker and writes the results
+        cube (mean, variance and imbalance per entrance per point) to exports/parameter_sweep.npz.
+        """
+        print("Starting parameter sweep...")
+        self._start_task("Sweep", self._sweep_parameters, None)
+
+    def _sweep_parameters(self, task):
+        """Task body of Sweep (worker thread, no pygame calls)."""
+        mode = self.queue_manager.mode
+        if mode == MODE_REFERENCE:
+            print("The reference mode cannot be seeded per point. Sweeping with the batch engine instead.")
+            mode = MODE_BATCH
+
+        k_values = sweep_values(config.SWEEP_K_RANGE)
+        rationality_values = sweep_values(config.SWEEP_RATIONALITY_RANGE)
+        print(f"  {len(config.SWEEP_SPAWN_SCALES)} x {len(k_values)} x {len(rationality_values)} points, "
+              f"{config.SWEEP_ROUNDS} rounds each ({mode} mode)")
+
+        results = run_parameter_sweep(
+            self.queue_manager.entry_tile_positions, dict(self.initial_spawn_data), self.grid_data,
+            k_values, rationality_values, config.SWEEP_SPAWN_SCALES,
+            num_rounds=config.SWEEP_ROUNDS, master_seed=config.SIMULATION_SEED,
+            max_workers=config.EXPORT_WORKERS, mode=mode,
+            distance_metric=self.queue_manager.distance_metric, sampler=self.queue_manager.sampler,
+            refresh_interval=self.queue_manager.refresh_interval,
+            common_random_numbers=config.COMMON_RANDOM_NUMBERS,
+            std_dev_distance=self.std_dev_distance, std_dev_length=self.std_dev_length,
+            progress_cb=task.report_progress, cancel_cb=lambda: task.cancelled
+        )
+        if task.cancelled:
+            print("Sweep cancelled. Unfinished points are NaN in the results cube.")
+
+        output_dir = "exports"
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        sweep_filename = os.path.join(output_dir, "parameter_sweep.npz")
+        save_sweep_results(sweep_filename, results)
+        print(f"Sweep results saved to {sweep_filename} (seed {results['master_seed']})")
+
+    def start_calibration(self):
+        """
+        Callback for the 'Calibrate' button: fits the model parameters to the observed counts in
+        config.CALIBRATION_OBSERVED_PATH on the background worker, saves the fit to
+        config.CALIBRATION_PATH and moves the sliders to the calibrated values.
+        """
+        print("Starting calibration...")
+        self._start_task("Calibrate", self._calibrate, self._finish_calibration)
+
+    def _calibrate(self, task):
+        """Task body of Calibrate (worker thread, no pygame calls)."""
+        observed_path = config.CALIBRATION_OBSERVED_PATH
+        if not os.path.exists(observed_path):
+            print(f"Calibration needs observed counts in {observed_path} (same columns as simulation_results.csv).")
+            return None
+
+        mode = self.queue_manager.mode
+        if config.CALIBRATION_METHOD == METHOD_MOMENTS and mode == MODE_REFERENCE:
+            print("The reference mode cannot be seeded. Calibrating with the batch engine instead.")
+            mode = MODE_BATCH
+        sampler = self.queue_manager.sampler
+        if config.CALIBRATION_METHOD == METHOD_MOMENTS and sampler == SAMPLER_HALTON:
+            print("The halton sampler understates the per-round variances. Calibrating with the pseudo sampler instead.")
+            sampler = SAMPLER_PSEUDO
+
+        try:
+            observed = load_observed_counts(observed_path)
+            calibration = calibrate_parameters(
+                self.queue_manager.entry_tile_positions, observed, dict(self.initial_spawn_data), self.grid_data,
+                method=config.CALIBRATION_METHOD, fit=config.CALIBRATION_FIT,
+                start={
+                    "k_length_ratio": self.ui_controller.get_k_length_ratio(),
+                    "rationality_factor": self.ui_controller.get_rationality_factor(),
+                    "std_dev_distance": self.std_dev_distance,
+                    "std_dev_length": self.std_dev_length
+                },
+                mode=mode, num_rounds=config.CALIBRATION_ROUNDS, master_seed=config.SIMULATION_SEED,
+                max_workers=config.EXPORT_WORKERS, distance_metric=self.queue_manager.distance_metric,
+                sampler=sampler, refresh_interval=self.queue_manager.refresh_interval,
+                progress_cb=task.report_progress, cancel_cb=lambda: task.cancelled
+            )
+        except ValueError as error:
+            print(f"Calibration failed: {error}")
+            return None
+
+        if task.cancelled:
+            print("Calibration cancelled. Keeping the current parameters.")
+            return None
+
+        calibration["observed_path"] = observed_path
+        save_calibration(config.CALIBRATION_PATH, calibration)
+        print(f"Calibration saved to {config.CALIBRATION_PATH} "
+              f"({calibration['iterations']} iterations, {calibration['evaluations']} evaluations)")
+        for warning in calibration["warnings"]:
+            print(f"  Warning: {warning}")
+        return calibration
+
+    def _finish_calibration(self, task):
+        """Main-thread completion of Calibrate: applies a successful fit."""
+        if task.result is not None:
+            self._apply_calibration(task.result)
+
+    def _apply_calibration(self, calibration):
+        """Uses a calibration as the current model: slider values and the taste standard deviations."""
+        parameters = calibration["parameters"]
+        self.std_dev_distance = float(parameters.get("std_dev_distance", STD_DEV_DISTANCE))
+        self.std_dev_length = float(parameters.get("std_dev_length", STD_DEV_LENGTH))
+        self.queue_manager.std_dev_distance = self.std_dev_distance
+        self.queue_manager.std_dev_length = self.std_dev_length
+
+        slider_defaults = calibration["slider_defaults"]
+        self.ui_controller.set_model_parameters(
+            slider_defaults["k_length_ratio"], slider_defaults["rationality_factor"]
+        )
+        print(f"Calibrated parameters: k_length_ratio = {slider_defaults['k_length_ratio']}, "
+              f"rationality_factor = {slider_defaults['rationality_factor']}, "
+              f"std devs = ({self.std_dev_distance:.3f}, {self.std_dev_length:.3f})")
+
+    def start_overload_estimation(self):
+        """
+        Callback for the 'Overload' button: estimates how likely any entrance (and every single
+        entrance) gets more than config.OVERLOAD_THRESHOLD passengers, with importance sampling
+        on the background worker, and writes the estimates to exports/overload_estimate.json/.csv.
+        """
+        num_rounds = self.ui_controller.get_iteration_count()
+        print(f"Starting overload estimation (threshold {config.OVERLOAD_THRESHOLD}, {num_rounds} rounds)...")
+        self._start_task("Overload", lambda task: self._estimate_overload(task, num_rounds), None)
+
+    def _estimate_overload(self, task, num_rounds):
+        """Task body of Overload (worker thread, no pygame calls)."""
+        seed = config.SIMULATION_SEED if config.SIMULATION_SEED is not None else new_master_seed()
+
+        # Separate manager over the full spawn pool, so a RUN in progress keeps its queues
+        queue_manager = QueueManager(
+            self.queue_manager.entry_tile_positions, dict(self.initial_spawn_data), mode=self.queue_manager.mode,
+            grid_data=self.grid_data, refresh_interval=self.queue_manager.refresh_interval,
+            distance_metric=self.queue_manager.distance_metric, sampler=self.queue_manager.sampler,
+            std_dev_distance=self.std_dev_distance, std_dev_length=self.std_dev_length
+        )
+        estimate = estimate_overload(
+            queue_manager, self.ui_controller.get_rationality_factor(), self.ui_controller.get_k_length_ratio(),
+            config.OVERLOAD_THRESHOLD, num_rounds=num_rounds, seed=seed,
+            pilot_rounds=config.OVERLOAD_PILOT_ROUNDS, pilot_iterations=config.OVERLOAD_PILOT_ITERATIONS,
+            progress_cb=task.report_progress, cancel_cb=lambda: task.cancelled
+        )
+        estimate["seed"] = str(seed)
+        if task.cancelled:
+            print(f"Overload estimation cancelled after {estimate['rounds']} rounds.")
+
+        any_entrance = estimate["any_entrance"]
+        if any_entrance["probability"] is not None:
+            print(f"  P(any queue > {config.OVERLOAD_THRESHOLD}) = {any_entrance['probability']:.3e} "
+                  f"(95% CI {any_entrance['ci95_low']:.3e} .. {any_entrance['ci95_high']:.3e}, "
+                  f"{any_entrance['hits']} overloaded rounds, effective sample size "
+                  f"{estimate['effective_sample_size']:.0f})")
+
+        output_dir = "exports"
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        json_filename = os.path.join(output_dir, "overload_estimate.json")
+        save_overload_estimate(json_filename, os.path.join(output_dir, "overload_estimate.csv"), estimate)
+        print(f"Overload estimate saved to {json_filename} (seed {seed})")
+
+    def start_day_simulation(self):
+        """
+        Callback for the 'Day' button: runs a whole operating day as a discrete-event simulation
+        on the background worker (the stairs counts are daily totals, config.EVENT_*) and writes
+        the report to exports/event_day.json/.csv.
+        """
+        print(f"Starting operating day simulation ({config.EVENT_DAY_LENGTH / 3600:.0f} h, "
+              f"{config.EVENT_ARRIVALS} arrivals, a train every {config.EVENT_TRAIN_HEADWAY:.0f} s)...")
+        self._start_task("Day", self._simulate_day, None)
+
+    def _simulate_day(self, task):
+        """Task body of Day (worker thread, no pygame calls)."""
+        seed = config.SIMULATION_SEED if config.SIMULATION_SEED is not None else new_master_seed()
+
+        # Separate manager over the full spawn pool, so a RUN in progress keeps its queues
+        queue_manager = QueueManager(
+            self.queue_manager.entry_tile_positions, dict(self.initial_spawn_data), seed=seed,
+            grid_data=self.grid_data, distance_metric=self.queue_manager.distance_metric,
+            sampler=self.queue_manager.sampler,
+            std_dev_distance=self.std_dev_distance, std_dev_length=self.std_dev_length
+        )
+        profile = config.EVENT_ARRIVAL_PROFILE if config.EVENT_ARRIVAL_PROFILE is not None else COMMUTER_PROFILE
+        simulation = DayEventSimulation(
+            queue_manager, self.ui_controller.get_rationality_factor(), self.ui_controller.get_k_length_ratio(),
+            config.EVENT_DAY_LENGTH, config.EVENT_TRAIN_HEADWAY, config.EVENT_TRAIN_DWELL, config.EVENT_DOOR_RATE,
+            config.AGENT_WALK_SPEED[0], arrivals=config.EVENT_ARRIVALS, profile=profile,
+            door_capacity=config.EVENT_DOOR_CAPACITY, seed=seed
+        )
+        report = simulation.run(progress_cb=task.report_progress, cancel_cb=lambda: task.cancelled)
+        report["seed"] = str(seed)
+        if report["cancelled"]:
+            print(f"Day simulation cancelled at {report['end_time'] / 3600:.1f} h.")
+        if report["mean_wait"] is not None:
+            print(f"  {report['boarded']} of {report['passengers']} passengers boarded on {report['trains']} trains, "
+                  f"mean wait {report['mean_wait']:.0f} s (95th percentile {report['p95_wait']:.0f} s), "
+                  f"{report['left_waiting']} left waiting; {report['events']} events")
+
+        output_dir = "exports"
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        json_filename = os.path.join(output_dir, "event_day.json")
+        save_day_report(json_filename, os.path.join(output_dir, "event_day.csv"), report)
+        print(f"Day report saved to {json_filename} (seed {seed})")
+
+    def _export_rounds(self, task, num_iterations):
+        """
+        Task body of Run & Export (worker thread, no pygame calls).
+        Rounds are streamed to disk chunk by chunk, so memory use does not grow with the round count.
+        Cancelling stops after the current chunk and keeps every round written so far.
+        """
+        self.export_precision = None
+
+        # A seeded export starts from the same stream whatever the slider values, so two exports
+        # with the same seed share their random numbers (parallel exports seed every block instead)
+        self.export_seed = config.SIMULATION_SEED
+        if self.export_seed is not None:
+            self.queue_manager.reseed(np.random.SeedSequence(self.export_seed))
         
         # 2. Preparation
         output_dir = "exports"
@@ -186,9 +502,6 @@ class SimulationState(State):
 
         csv_filename = os.path.join(output_dir, "simulation_results.csv")
         
-        # Ensure a clean slate before the first run logic
-        self._reset_simulation_state()
-        
         # Get the ordered list of spawn and entry tiles for the header
         spawn_tiles_sorted = sorted(self.spawn_data.keys())
         entry_tiles_sorted = sorted(self.queue_manager.entry_tile_positions)
@@ -198,52 +511,118 @@ class SimulationState(State):
         header.extend([f"Spawn [{r},{c}]" for r, c in spawn_tiles_sorted])
         header.extend([f"Entry [{r},{c}]" for r, c in entry_tiles_sorted])
 
-        # 4. Create and open the CSV file
-        results = []
-        
-        # 5. Run the Simulation Rounds
-        for i in range(1, num_iterations + 1):
-            
-            # --- Run Logic: Distribute Passengers ---
-            # NOTE: _run_simulation_setup handles:
-            # 1. Restoring spawn_data if it was zeroed (on round 1 it's restored by _reset)
-            # 2. Updating QueueManager with the total passenger count (from spawn_data)
-            # 3. Distributing passengers into queues
-            # 4. Zeroing out the source spawn_data (for the *next* run/step)
-            # 5. Updating queue visuals
-            self._run_simulation_setup()
+        # Halton rounds are independent replicates, but each one is less spread out than a real round
+        if self.queue_manager.sampler == SAMPLER_HALTON:
+            print(f"Warning: {HALTON_SPREAD_WARNING}. Use SAMPLER = \"pseudo\" for per-round statistics.")
 
-            # --- Data Collection for Export ---
-            row_data = [f"round {i}"]
-            
-            # 5a. Collect Spawn Values (Fixed initial value based on self.initial_spawn_data)
-            # This is crucial: the output table shows the *source* count, not the remaining count.
-            for pos in spawn_tiles_sorted:
-                # Use initial_spawn_data to reflect the constant source value (e.g., 10 or 30)
-                spawn_count = self.initial_spawn_data.get(pos, 0)
-                row_data.append(spawn_count)
-            
-            # 5b. Collect Entry Queue Values (Result of distribution from the current round)
-            queue_lengths = self.queue_manager.get_queue_lengths()
-            for pos in entry_tiles_sorted:
-                # Get the queue length (e.g., 25 or 5)
-                queue_count = queue_lengths.get(pos, 0)
-                row_data.append(queue_count)
-            
-            results.append(row_data)
+        # 4. Run the Simulation Rounds: every mode yields (rounds x entrances) count chunks
+        # The distribution mode that is actually simulated (and recorded in the binary header)
+        distribution_mode = self.queue_manager.mode
+        if config.EXPORT_MODE == "parallel" and distribution_mode == MODE_REFERENCE:
+            print("The reference mode cannot be seeded per block. Exporting with the batch engine instead.")
+            distribution_mode = MODE_BATCH
 
-            if i % 10 == 0 or i == num_iterations:
-                print(f"  Completed Data Collection for Round {i}/{num_iterations}")
-        
-        
-        # 6. Write to CSV
-        with open(csv_filename, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(header)
-            writer.writerows(results)
+        if config.EXPORT_MODE in ("tensor", "parallel"):
+            count_chunks = self._iter_export_counts_tensor(
+                num_iterations, parallel=(config.EXPORT_MODE == "parallel"), distribution_mode=distribution_mode
+            )
+        else:
+            count_chunks = self._iter_export_counts_per_round(num_iterations)
 
-        print(f"All runs completed. Results saved to {csv_filename}")
-        
+        # Reorder the count columns to match the header
+        # The source count is constant: the table shows the *source* count, not the remaining count
+        entry_columns = [self.queue_manager.entry_tile_positions.index(pos) for pos in entry_tiles_sorted]
+        spawn_values = [self.initial_spawn_data.get(pos, 0) for pos in spawn_tiles_sorted]
+
+        # Optional columnar companion file: the same counts as a memory-mappable int32 array
+        binary_writer = nullcontext()
+        if config.EXPORT_BINARY:
+            binary_writer = ColumnarCountWriter(
+                os.path.join(output_dir, "simulation_results.npy"),
+                self.initial_spawn_data, entry_tiles_sorted,
+                run_parameters={
+                    "k_length_ratio": self.ui_controller.get_k_length_ratio(),
+                    "rationality_factor": self.ui_controller.get_rationality_factor(),
+                    "export_mode": config.EXPORT_MODE,
+                    "distribution_mode": distribution_mode,
+                    "distance_metric": self.queue_manager.distance_metric,
+                    "sampler": self.queue_manager.sampler,
+                    "std_dev_distance": self.std_dev_distance,
+                    "std_dev_length": self.std_dev_length
+                },
+                append=config.EXPORT_BINARY_APPEND,
+                checkpoint_rows=config.EXPORT_CHECKPOINT_ROUNDS
+            )
+
+        # One-pass summary statistics, so the summary needs no second pass over the rows
+        summary = ExportSummary(header[1 + len(spawn_tiles_sorted):], max_value=sum(self.initial_spawn_data.values()))
+
+        # 5. Stream the rows to CSV (and the binary file) as the chunks arrive
+        with StreamingCsvWriter(csv_filename, header, compress=config.EXPORT_GZIP,
+                                checkpoint_rows=config.EXPORT_CHECKPOINT_ROUNDS) as writer, \
+             binary_writer as binary_writer:
+            round_number = 0
+            for chunk_counts in count_chunks:
+                chunk_counts = chunk_counts[:, entry_columns]
+                summary.update(chunk_counts)
+                if binary_writer is not None:
+                    binary_writer.write_block(chunk_counts)
+                for counts in chunk_counts.tolist():
+                    round_number += 1
+                    writer.write_row([f"round {round_number}"] + spawn_values + counts)
+
+                task.report_progress(round_number / num_iterations)
+                if task.cancelled:
+                    count_chunks.close()
+                    print(f"Run & Export cancelled after {round_number} rounds.")
+                    break
+
+            if binary_writer is not None:
+                binary_writer.run["seed"] = self.export_seed
+
+        print(f"All runs completed. {writer.rows_written} rounds saved to {writer.path}")
+        if binary_writer is not None:
+            print(f"Columnar export: {binary_writer.num_rounds} rounds in {binary_writer.path}")
+
+        # 6. Report the achieved precision of a precision-targeted export
+        if self.export_precision:
+            precision_filename = os.path.join(output_dir, "simulation_precision.json")
+            with open(precision_filename, 'w') as f:
+                json.dump(self.export_precision, f, indent=4)
+            print(f"Precision report saved to {precision_filename}")
+
+        # 7. Write the summary statistics next to the CSV
+        if config.EXPORT_SUMMARY:
+            summary_data = summary.to_dict()
+            if self.queue_manager.sampler == SAMPLER_HALTON:
+                summary_data["warning"] = HALTON_SPREAD_WARNING
+            if config.REPORT_EQUILIBRIUM:
+                summary_data["equilibrium"] = self._equilibrium_report()
+            summary_filename = os.path.join(output_dir, "simulation_summary.json")
+            with open(summary_filename, 'w') as f:
+                json.dump(summary_data, f, indent=4)
+            print(f"Summary statistics saved to {summary_filename}")
+
+    def _equilibrium_report(self):
+        """
+        Stochastic user equilibrium of the current slider values for the full spawn pool,
+        with how far the stale and sequential modes are from it (printed and returned).
+        """
+        report = self.queue_manager.equilibrium_report(
+            self.ui_controller.get_rationality_factor(), self.ui_controller.get_k_length_ratio(),
+            spawn_data=self.initial_spawn_data, num_rounds=config.EQUILIBRIUM_REPORT_ROUNDS,
+            seed=self.export_seed
+        )
+        equilibrium = report["equilibrium"]
+        print(f"  User equilibrium: {equilibrium['iterations']} {equilibrium['method']} iterations, "
+              f"gap {equilibrium['gap']:.2e}")
+        for mode in ("stale", "sequential"):
+            print(f"  {mode.capitalize()} mode: {report[mode]['distance_to_equilibrium']:.1%} of passengers "
+                  f"away from equilibrium, equilibrium gap {report[mode]['equilibrium_gap']:.1%}")
+        return report
+
+    def _finish_export(self, task):
+        """Main-thread completion of Run & Export."""
         # Optional: Display a confirmation message in your game UI (you'll need to implement this)
         # self.show_dialog(f"Export Complete: {csv_filename}")
         
@@ -297,15 +676,132 @@ class SimulationState(State):
     def _run_simulation_setup(self):
         """
         Callback for the 'RUN' button. Triggers the initial passenger distribution 
-        and resets spawn counts to zero.
+        and resets spawn counts to zero. The distribution runs on the background
+        worker; _finish_run syncs the visuals once it is done.
         """
+        if config.RUN_ENGINE == RUN_ENGINE_AGENTS:
+            self._start_agent_run()
+            return
+
         print("Simulation: Starting passenger distribution.")
-        
+        self._start_task("RUN", lambda task: self._distribute_run(), self._finish_run)
+
+    def _start_agent_run(self):
+        """
+        RUN with the agent engine: the spawn pool empties over time as passengers walk from the
+        stairs to the doors, and _simulation_step advances and displays them frame by frame.
+        """
+        if self.active_task:
+            print(f"{self.active_task.name} is still running. Ignoring RUN.")
+            return
+        if sum(self.spawn_data.values()) == 0:
+            print("RUN called on empty spawn pool. Performing soft reset to restore spawn counts.")
+            self._restore_spawn_pool()
+        self.queue_manager.update_total_passengers(self.spawn_data)
+        self.queue_manager.clear_queues()
+
+        self.agent_engine = AgentEngine(
+            self.queue_manager, self.grid_data,
+            [self.spawn_data[pos] for pos in self.queue_manager.stair_tile_positions],
+            self.ui_controller.get_rationality_factor(), self.ui_controller.get_k_length_ratio(),
+            seed=config.SIMULATION_SEED
+        )
+        self.agent_colors = entrance_colors(len(self.queue_manager.entry_tile_positions))
+        print(f"Simulation: Starting agent run ({self.queue_manager.total_passengers_to_spawn} passengers).")
+
+    def _distribute_run(self):
+        """
+        RUN task body. With config.SIMULATION_SEED set a RUN is deterministic: it is seeded
+        from the seed and the request key, and a configuration that was run before is
+        served straight from the result cache. Unseeded RUNs always draw fresh.
+        """
+        seed = config.SIMULATION_SEED
+        if seed is None or self.queue_manager.mode == MODE_REFERENCE:
+            self._distribute_round()
+            self.last_run_summary = self._current_round_summary()
+            return
+
+        # The key needs the restored pool, so do the soft reset of _distribute_round up front
+        if sum(self.spawn_data.values()) == 0:
+            print("RUN called on empty spawn pool. Performing soft reset to restore spawn counts.")
+            self._restore_spawn_pool()
+        self.queue_manager.update_total_passengers(self.spawn_data)
+
+        key = self._result_key(self.spawn_data, self.queue_manager.mode, seed)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            self.queue_manager.set_queue_lengths(cached["queue_counts"])
+            self.spawn_data.update({pos: 0 for pos in self.spawn_data.keys()})
+            self.last_run_summary = cached["summary"]
+            print("RUN served from the result cache.")
+            return
+
+        # Same configuration and seed -> same draws. With common random numbers the stream
+        # ignores the slider values, so RUNs that only differ in k or rationality share their draws.
+        stream_key = key
+        if config.COMMON_RANDOM_NUMBERS:
+            stream_key = result_key(self.queue_manager.layout_key(), self.spawn_data, 0.0, 0.0,
+                                    self.queue_manager.mode, seed)
+        self.queue_manager.reseed(np.random.SeedSequence(seed, spawn_key=(int(stream_key[:8], 16),)))
+        self._distribute_round()
+        self.last_run_summary = self._current_round_summary()
+
+        queue_lengths = self.queue_manager.get_queue_lengths()
+        self.result_cache.put(key, {
+            "queue_counts": [queue_lengths[pos] for pos in self.queue_manager.entry_tile_positions],
+            "summary": self.last_run_summary
+        })
+
+    def _result_key(self, spawn_data, mode, seed):
+        """Result-cache key of a request on the current layout with the current slider values."""
+        return result_key(
+            self.queue_manager.layout_key(), spawn_data,
+            self.ui_controller.get_k_length_ratio(), self.ui_controller.get_rationality_factor(),
+            mode, seed,
+            sampler=self.queue_manager.sampler, refresh_interval=self.queue_manager.refresh_interval,
+            std_dev_distance=self.std_dev_distance, std_dev_length=self.std_dev_length,
+            common_random_numbers=config.COMMON_RANDOM_NUMBERS
+        )
+
+    def _current_round_summary(self):
+        """Summary statistics (imbalance metrics) of the queues left by the last RUN."""
+        entry_tiles_sorted = sorted(self.queue_manager.entry_tile_positions)
+        queue_lengths = self.queue_manager.get_queue_lengths()
+
+        summary = ExportSummary(
+            [f"Entry [{r},{c}]" for r, c in entry_tiles_sorted],
+            max_value=sum(queue_lengths.values())
+        )
+        summary.update(np.array([[queue_lengths[pos] for pos in entry_tiles_sorted]]))
+        summary = summary.to_dict()
+
+        if config.REPORT_EQUILIBRIUM:
+            k_ratio_val = self.ui_controller.get_k_length_ratio()
+            rationality_val = self.ui_controller.get_rationality_factor()
+            counts = np.array([queue_lengths[pos] for pos in self.queue_manager.entry_tile_positions], dtype=float)
+            equilibrium = self.queue_manager.solve_equilibrium(
+                rationality_val, k_ratio_val, spawn_data=self.initial_spawn_data
+            )
+            total = counts.sum()
+            summary["equilibrium"] = {
+                "equilibrium_gap": self.queue_manager.equilibrium_gap(
+                    rationality_val, k_ratio_val, counts, spawn_data=self.initial_spawn_data
+                ),
+                "distance_to_equilibrium": float(np.abs(counts - equilibrium["queue_lengths"]).sum() / (2.0 * total))
+                                           if total else 0.0
+            }
+        return summary
+
+    def _distribute_round(self):
+        """
+        One RUN without any visual updates, so it is safe on the worker thread:
+        restores an empty spawn pool, distributes every passenger and zeroes the spawn counts.
+        """
         current_total_passengers = sum(self.spawn_data.values())
         
         if current_total_passengers == 0:
             print("RUN called on empty spawn pool. Performing soft reset to restore spawn counts.")
-            self._reset_simulation_state()
+            self._restore_spawn_pool()
 
         # 1. Update QueueManager with current (restored/initial) spawn counts
         self.queue_manager.update_total_passengers(self.spawn_data)
@@ -319,22 +815,265 @@ class SimulationState(State):
         # --- Pass the two values to the correct parameters (RENAMED) ---
         zeroed_data_map = self.queue_manager.distribute_passengers_utility_based(
             rationality_factor = rationality_val, # RENAMED
-            k_length_ratio = k_ratio_val
+            k_length_ratio = k_ratio_val,
+            verbose = True
         )
         # ----------------------------------------------------------
         
         # 3. Reset internal spawn_data using the zeroed map
         self.spawn_data.update(zeroed_data_map) 
 
+    def _finish_run(self, task):
+        """Main-thread completion of RUN: a cancelled RUN is rolled back before the visual sync."""
+        if task.cancelled:
+            print("RUN cancelled. Restoring the spawn pool.")
+            self._restore_spawn_pool()
+        elif self.last_run_summary:
+            imbalance = self.last_run_summary["imbalance"]
+            print(f"RUN imbalance: max/mean {imbalance['max_mean_ratio']['mean']:.2f}, "
+                  f"Gini {imbalance['gini']['mean']:.3f}")
+            if "equilibrium" in self.last_run_summary:
+                equilibrium = self.last_run_summary["equilibrium"]
+                print(f"RUN vs. user equilibrium: {equilibrium['distance_to_equilibrium']:.1%} of passengers "
+                      f"would need to move, equilibrium gap {equilibrium['equilibrium_gap']:.1%}")
+
         # 4. Update Visuals (Delegate to the controller for visual sync)
         self._update_queue_visuals()
         self._update_all_spawn_visuals()
 
+    def _start_task(self, name, target, on_done):
+        """
+        Runs target(task) on the background worker (or inline when config.RUN_IN_BACKGROUND
+        is off). Only one task runs at a time; update() polls it and on_done(task) is
+        called on the main thread once it finishes.
+        """
+        if self.active_task:
+            print(f"{self.active_task.name} is still running. Ignoring {name}.")
+            return
+
+        self.active_task = BackgroundTask(name, target, on_done)
+        self.ui_controller.show_progress(name, 0.0)
+        self.active_task.start(background=config.RUN_IN_BACKGROUND)
+
+        if not config.RUN_IN_BACKGROUND:
+            self._poll_active_task()
+
+    def _poll_active_task(self):
+        """Mirrors the task progress on the progress bar and finalises the task once it is done."""
+        task = self.active_task
+        self.ui_controller.show_progress(task.name, task.progress)
+        if task.poll():
+            self.active_task = None
+            self.ui_controller.hide_progress()
+
+    def _cancel_active_task(self):
+        """Callback for the 'Cancel' button shown while a task runs."""
+        if self.active_task and not self.active_task.cancelled:
+            print(f"Cancelling {self.active_task.name}...")
+            self.active_task.cancel()
+
+    def _iter_export_counts_per_round(self, num_iterations):
+        """
+        Export rounds the original way: one full RUN (sync, distribute, zero) per round.
+        Yields a (1, E) count array per round, columns ordered like the QueueManager entries.
+
+        With config.EXPORT_CI_TOLERANCE set, the rounds go through the same running moments
+        as the tensor export and the CIs are checked every config.EXPORT_CI_CHECK_ROUNDS rounds.
+        """
+        tolerance = config.EXPORT_CI_TOLERANCE
+        self.export_precision = None
+        moments = RunningMoments(len(self.queue_manager.entry_tile_positions))
+
+        rounds_done = 0
+        for i in range(1, num_iterations + 1):
+            
+            # --- Run Logic: Distribute Passengers ---
+            # NOTE: _distribute_round handles:
+            # 1. Restoring spawn_data if it was zeroed (on round 1 it's restored by _reset)
+            # 2. Updating QueueManager with the total passenger count (from spawn_data)
+            # 3. Distributing passengers into queues
+            # 4. Zeroing out the source spawn_data (for the *next* run/step)
+            # Visuals are synced once the whole export has finished.
+            self._distribute_round()
+
+            # --- Data Collection for Export (Result of distribution from the current round) ---
+            queue_lengths = self.queue_manager.get_queue_lengths()
+            round_counts = np.array([[queue_lengths.get(pos, 0) for pos in self.queue_manager.entry_tile_positions]])
+            yield round_counts
+            rounds_done = i
+
+            if i % 10 == 0 or i == num_iterations:
+                print(f"  Completed Data Collection for Round {i}/{num_iterations}")
+
+            if tolerance is not None:
+                moments.update(round_counts)
+                if i % config.EXPORT_CI_CHECK_ROUNDS == 0 and self._precision_met(moments, rounds_done, tolerance):
+                    break
+
+        if tolerance is not None:
+            self._record_export_precision(moments, rounds_done, num_iterations, tolerance)
+
+    def _iter_export_counts_tensor(self, max_rounds, parallel=False, distribution_mode=None):
+        """
+        Export rounds in batched chunks: the QueueManager draws config.EXPORT_CHUNK_ROUNDS
+        rounds per pass and yields each (rounds x E) count chunk, columns ordered like the
+        QueueManager entries. Only the final round is synced to the UI. Modes other than
+        the stale batch mode are simulated round by round inside each chunk.
+        With parallel=True the rounds are split across the process pool instead, using
+        seeded streams so the same seed gives the same matrix for any worker count.
+        distribution_mode overrides the QueueManager's mode for the parallel workers
+        (they cannot run the unseedable reference loop).
+
+        With config.EXPORT_CI_TOLERANCE set, running means and variances are kept per
+        entrance; the export stops as soon as every 95% CI half-width is below the
+        tolerance (or max_rounds is reached), and the achieved precision is stored in
+        self.export_precision.
+        """
+        # Same bookkeeping as a RUN, but done once for all rounds
+        self.queue_manager.update_total_passengers(self.spawn_data)
+
+        rationality_val = self.ui_controller.get_rationality_factor()
+        k_ratio_val = self.ui_controller.get_k_length_ratio()
+        tolerance = config.EXPORT_CI_TOLERANCE
+        self.export_precision = None
+
+        master_seed = None
+        if parallel:
+            master_seed = config.SIMULATION_SEED
+            if master_seed is None:
+                master_seed = new_master_seed()
+            print(f"  Parallel export seed: {master_seed}")
+        self.export_seed = master_seed
+
+        # Only the stale batch mode can be drawn as one tensor. The queue-feedback modes
+        # (sequential, refresh) and the reference loop replay one distribution per round,
+        # like a parameter sweep point, so the export always matches the selected mode.
+        distribution_mode = distribution_mode or self.queue_manager.mode
+        if parallel and distribution_mode == MODE_REFERENCE:
+            distribution_mode = MODE_BATCH
+        if distribution_mode != MODE_BATCH:
+            print(f"  {distribution_mode.capitalize()} mode cannot be batched: "
+                  f"simulating one distribution per round")
+
+        def simulate_chunk(num_rounds, first_round):
+            if not parallel:
+                if distribution_mode != MODE_BATCH:
+                    return simulate_point_rounds(self.queue_manager, num_rounds, rationality_val, k_ratio_val)
+                return self.queue_manager.simulate_rounds(
+                    num_rounds,
+                    rationality_factor = rationality_val,
+                    k_length_ratio = k_ratio_val,
+                    verbose = (first_round == 0)
+                )
+            chunk_counts = run_parallel_rounds(
+                self.queue_manager.entry_tile_positions, self.spawn_data, self.grid_data,
+                num_rounds, rationality_val, k_ratio_val,
+                master_seed=master_seed, max_workers=config.EXPORT_WORKERS,
+                distance_metric=self.queue_manager.distance_metric,
+                sampler=self.queue_manager.sampler,
+                first_round=first_round,
+                std_dev_distance=self.std_dev_distance, std_dev_length=self.std_dev_length,
+                mode=distribution_mode, refresh_interval=self.queue_manager.refresh_interval
+            )
+            if len(chunk_counts):
+                self.queue_manager.set_queue_lengths(chunk_counts[-1])
+            return chunk_counts
+
+        # Precision-targeted exports check the CIs after every chunk, so they use smaller chunks.
+        # Parallel chunks are aligned to the seed blocks so chunking never changes the result.
+        chunk_rounds = config.EXPORT_CHUNK_ROUNDS if tolerance is None else config.EXPORT_CI_CHECK_ROUNDS
+        if parallel:
+            chunk_rounds = max(BLOCK_ROUNDS, chunk_rounds - chunk_rounds % BLOCK_ROUNDS)
+
+        moments = RunningMoments(len(self.queue_manager.entry_tile_positions))
+        rounds_done = 0
+        while rounds_done < max_rounds:
+            chunk_counts = simulate_chunk(min(chunk_rounds, max_rounds - rounds_done), rounds_done)
+            yield chunk_counts
+            rounds_done += len(chunk_counts)
+
+            if tolerance is not None:
+                moments.update(chunk_counts)
+                if self._precision_met(moments, rounds_done, tolerance):
+                    break
+
+        self.spawn_data.update({pos: 0 for pos in self.spawn_data.keys()})
+        print(f"  Completed Data Collection for {rounds_done} rounds ({config.EXPORT_MODE} mode)")
+
+        if tolerance is not None:
+            self._record_export_precision(moments, rounds_done, max_rounds, tolerance)
+
+    @staticmethod
+    def _precision_met(moments, rounds_done, tolerance):
+        """True once enough rounds are in and every entrance's 95% CI half-width is below the tolerance."""
+        return rounds_done >= config.EXPORT_CI_MIN_ROUNDS and bool(np.all(moments.ci_half_widths() < tolerance))
+
+    def _record_export_precision(self, moments, rounds_done, max_rounds, tolerance):
+        """Prints the achieved precision of a precision-targeted export and stores it in self.export_precision."""
+        half_widths = moments.ci_half_widths()
+        converged = bool(np.all(half_widths < tolerance))
+        max_half_width = float(half_widths.max()) if half_widths.size else 0.0
+        print(f"  Precision target {'met' if converged else 'NOT met'}: "
+              f"{rounds_done} rounds, max 95% CI half-width {max_half_width:.4f} (tolerance {tolerance})")
+
+        self.export_precision = {
+            "rounds_used": rounds_done,
+            "max_rounds": max_rounds,
+            "tolerance": tolerance,
+            "converged": converged,
+            "max_ci_half_width": max_half_width,
+            "ci_half_widths": {
+                f"Entry [{r},{c}]": float(width)
+                for (r, c), width in zip(self.queue_manager.entry_tile_positions, half_widths)
+            }
+        }
+
     def _simulation_step(self):
         """Contains all logic that advances the simulation by one frame/instance."""
-        # This remains a placeholder for future agent/train logic.
-        pass
+        engine = self.agent_engine
+        if engine is None:
+            return
+
+        # Passengers spawning from now on use the current slider values
+        engine.rationality_factor = self.ui_controller.get_rationality_factor()
+        engine.k_length_ratio = self.ui_controller.get_k_length_ratio()
+        engine.step(config.AGENT_TIME_SCALE / config.FPS)
 
+        # Mirror the engine into the spawn pool and queues the counters show
+        for pos, remaining in zip(self.queue_manager.stair_tile_positions, engine.remaining.tolist()):
+            self.spawn_data[pos] = remaining
+        self.queue_manager.set_queue_lengths(engine.queue_lengths())
+        self._update_queue_visuals()
+        self._update_all_spawn_visuals()
+
+        if engine.is_finished():
+            print(f"Agent run finished after {engine.time:.0f} simulated seconds, "
+                  f"{int(engine.boarded.sum())} passengers boarded.")
+            self.agent_engine = None
+
+
+    def _preview_expected_distribution(self):
+        """
+        Slider callback: shows the expected queue length per entrance (quadrature mode,
+        no sampling) for the full spawn pool, so exploring the sliders is instant.
+        """
+        # The quadrature result is deterministic, so slider settings seen before come from the cache
+        key = self._result_key(self.initial_spawn_data, "expected", None)
+        cached = self.result_cache.get(key)
+        if cached is None:
+            expected_counts, variances = self.queue_manager.expected_distribution(
+                rationality_factor = self.ui_controller.get_rationality_factor(),
+                k_length_ratio = self.ui_controller.get_k_length_ratio(),
+                spawn_data = self.initial_spawn_data
+            )
+            cached = {"expected_counts": expected_counts.tolist(), "variances": variances.tolist()}
+            self.result_cache.put(key, cached)
+        expected_counts = cached["expected_counts"]
+
+        queue_counter_map = self.ui_controller.queue_counter_map
+        for pos, expected in zip(self.queue_manager.entry_tile_positions, expected_counts):
+            if pos in queue_counter_map:
+                queue_counter_map[pos].set_value(f"{expected:.1f}")
 
     def _update_queue_visuals(self):
         """Synchronizes the visual queue counters with the QueueManager data."""
@@ -353,21 +1092,18 @@ class SimulationState(State):
         Restores the simulation progress to its initial state.
         """
         print("Simulation State Reset (Restoring Spawn Pool).")
+        self.agent_engine = None # Stops an agent run
         
-        # 1. RESTORE SPAWN DATA: Set the remaining count equal to the initial count
-        for pos_key, initial_count in self.initial_spawn_data.items():
-            self.spawn_data[pos_key] = initial_count 
+        # 1. RESTORE SPAWN DATA and clear all Queues in the QueueManager
+        self._restore_spawn_pool()
 
         # 2. Update Spawn Visual Counters 
         self._update_all_spawn_visuals() 
-
-        # 3. Clear all Queues in the QueueManager
-        self.queue_manager.clear_queues()
         
-        # 4. Update Queue Visuals 
+        # 3. Update Queue Visuals 
         self._update_queue_visuals()
         
-        # 5. Deselect any stairs tile and deactivate the slider (Delegate to controller)
+        # 4. Deselect any stairs tile and deactivate the slider (Delegate to controller)
         self.ui_controller.selected_stairs_pos = None
 
         # Deactivate the spawn count slider
@@ -377,6 +1113,15 @@ class SimulationState(State):
         self.ui_controller.stairs_description_text = "" 
 
 
+    def _restore_spawn_pool(self):
+        """Data half of the reset (no visuals, safe on the worker thread): refills the spawn pool and empties the queues."""
+        # Set the remaining count equal to the initial count
+        for pos_key, initial_count in self.initial_spawn_data.items():
+            self.spawn_data[pos_key] = initial_count 
+
+        self.queue_manager.clear_queues()
+
+
     def _update_all_spawn_visuals(self):
         """Synchronizes all visual spawn counters with the current self.spawn_data (current/initial format)."""
         
@@ -30,6 +30,8 @@ class SimulationUIController:
         self.open_load_dialog = open_load_dialog_cb
         self.get_tiles_by_id = get_tiles_by_id_cb
         self.load_new_layout_cb = load_new_layout_cb
+        self.parameters_changed_cb = None # Set by SimulationState for the live slider preview
+        self.cancel_task_cb = None # Set by SimulationState to cancel the running background task
         
         # State data for UI only
         self.selected_stairs_pos = None
@@ -107,6 +109,20 @@ class SimulationUIController:
             text_color=config.BLACK, bg_color=config.LIGHT_GRAY, 
             outline_color=config.DARK_GRAY, font=self.font_ui, editable=True
         )
+
+        # --- Background Task Progress (below the iterations box, only shown while a task runs) ---
+        progress_y = export_btn_y + export_btn_h + 15 # (600 + 50 + 15 = 665)
+        self.progress_bar_rect = pygame.Rect(config.PALETTE_PANEL_X + 20, progress_y, 170, 30)
+        self.progress_font = pygame.font.Font(config.FONT_NAME, 22)
+        self.task_label = ""
+        self.task_progress = None # None = no task running, progress bar hidden
+
+        self.cancel_button = Button(
+            self.progress_bar_rect.right + 10, progress_y - 5, 80, 40,
+            "Cancel", self._cancel_task,
+            config.BUTTON_IN_GAME, config.BUTTON_IN_GAME_HOVER,
+            text_size=24, hit_size=(80, 40)
+        )
         
     def _update_selected_stairs_count(self, new_count):
         """Callback from the slider to update internal data and visuals."""
@@ -125,11 +141,23 @@ class SimulationUIController:
     def _update_k_length_ratio(self, new_ratio):
         """Callback from the ratio slider to update internal data."""
         self.k_length_ratio = float(new_ratio)
+        self._notify_parameters_changed()
 
     # RENAMED callback for Slider 2
     def _update_rationality_factor(self, new_rationality):
         """Callback from the rationality slider to update internal data."""
         self.rationality_factor = float(new_rationality)
+        self._notify_parameters_changed()
+
+    def _cancel_task(self):
+        """Callback from the Cancel button."""
+        if self.cancel_task_cb:
+            self.cancel_task_cb()
+
+    def _notify_parameters_changed(self):
+        """Lets SimulationState refresh its preview whenever a model slider moves."""
+        if self.parameters_changed_cb:
+            self.parameters_changed_cb()
 
     def get_k_length_ratio(self):
         """Public getter for SimulationState to use."""
@@ -156,6 +184,10 @@ class SimulationUIController:
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1: # Left click
             mouse_x, mouse_y = event.pos
             self._select_stairs_at(mouse_x, mouse_y)
+
+    def handle_busy_event(self, event):
+        """Handles events while a background task runs: only the Cancel button reacts."""
+        self.cancel_button.handle_event(event)
             
     def update(self):
         """Updates UI component states (hover, input)."""
@@ -172,6 +204,9 @@ class SimulationUIController:
         
         for counter in self.spawn_counters:
             counter.update()
+
+        if self.task_progress is not None:
+            self.cancel_button.update()
             
         if self.click_lockout_timer > 0:
             self.click_lockout_timer -= 1
@@ -202,6 +237,10 @@ class SimulationUIController:
         self._draw_stairs_description(screen) 
         self.iterations_textbox.draw(screen)
 
+        if self.task_progress is not None:
+            self._draw_task_progress(screen)
+            self.cancel_button.draw(screen)
+
 
     def _create_action_buttons(self):
         """Creates buttons for the simulation control area (Load, Run, Reset, Export)."""
@@ -226,6 +265,10 @@ class SimulationUIController:
              def _run_simulation_setup(self): print("Placeholder RUN") 
              def _reset_simulation_state(self): print("Placeholder RESET")
              def start_simulation_and_export(self): print("Placeholder EXPORT")
+             def start_parameter_sweep(self): print("Placeholder SWEEP")
+             def start_calibration(self): print("Placeholder CALIBRATE")
+             def start_overload_estimation(self): print("Placeholder OVERLOAD")
+             def start_day_simulation(self): print("Placeholder DAY")
 
         temp_callbacks = PlaceholderCallbacks(self) 
 
@@ -254,7 +297,49 @@ class SimulationUIController:
             text_size=24, hit_size=(run_export_btn_w, run_export_btn_h)
         )
 
-        return [self.load_button, self.run_button, self.reset_button, self.run_export_button]
+        # Sweep sits to the right of the iterations box
+        sweep_btn_w, sweep_btn_h = 90, 50
+        self.sweep_button = Button(
+            config.PALETTE_PANEL_X + config.PALETTE_PANEL_WIDTH - sweep_btn_w - 5, 600, sweep_btn_w, sweep_btn_h,
+            "Sweep",
+            temp_callbacks.start_parameter_sweep,
+            config.BUTTON_IN_GAME, config.BUTTON_IN_GAME_HOVER,
+            text_size=24, hit_size=(sweep_btn_w, sweep_btn_h)
+        )
+
+        # Overload sits to the left of the iterations box
+        overload_btn_w, overload_btn_h = 90, 50
+        self.overload_button = Button(
+            config.PALETTE_PANEL_X + 5, 600, overload_btn_w, overload_btn_h,
+            "Overload",
+            temp_callbacks.start_overload_estimation,
+            config.BUTTON_IN_GAME, config.BUTTON_IN_GAME_HOVER,
+            text_size=24, hit_size=(overload_btn_w, overload_btn_h)
+        )
+
+        # Calibrate sits to the right of RESET
+        calibrate_btn_w, calibrate_btn_h = 100, 50
+        self.calibrate_button = Button(
+            config.PALETTE_PANEL_X + config.PALETTE_PANEL_WIDTH - calibrate_btn_w - 5,
+            buttons_row_y + (btn_h - calibrate_btn_h) // 2, calibrate_btn_w, calibrate_btn_h,
+            "Calibrate",
+            temp_callbacks.start_calibration,
+            config.BUTTON_IN_GAME, config.BUTTON_IN_GAME_HOVER,
+            text_size=24, hit_size=(calibrate_btn_w, calibrate_btn_h)
+        )
+
+        # Day sits to the right of Load Station, above Calibrate
+        day_btn_w, day_btn_h = 100, 50
+        self.day_button = Button(
+            config.PALETTE_PANEL_X + config.PALETTE_PANEL_WIDTH - day_btn_w - 5, 15, day_btn_w, day_btn_h,
+            "Day",
+            temp_callbacks.start_day_simulation,
+            config.BUTTON_IN_GAME, config.BUTTON_IN_GAME_HOVER,
+            text_size=24, hit_size=(day_btn_w, day_btn_h)
+        )
+
+        return [self.load_button, self.run_button, self.reset_button, self.run_export_button, self.sweep_button,
+                self.calibrate_button, self.overload_button, self.day_button]
 
     def _create_spawn_counters(self):
         """
@@ -430,6 +515,30 @@ class SimulationUIController:
             screen.blit(text_surface, (text_x, text_y))
             text_y += config.FONT_SIZE_UI + 2 
 
+    def _draw_task_progress(self, screen):
+        """Draws the progress bar of the running background task."""
+        bar = self.progress_bar_rect
+        pygame.draw.rect(screen, config.LIGHT_GRAY, bar)
+
+        filled = bar.copy()
+        filled.width = int(bar.width * self.task_progress)
+        pygame.draw.rect(screen, config.HIGHLIGHT_COLOR, filled)
+        pygame.draw.rect(screen, config.DARK_GRAY, bar, 2)
+
+        text = f"{self.task_label} {int(self.task_progress * 100)}%"
+        text_surface = self.progress_font.render(text, True, config.BLACK)
+        screen.blit(text_surface, text_surface.get_rect(center=bar.center))
+
+    def show_progress(self, label, fraction):
+        """Shows (or updates) the progress bar and Cancel button for a running task."""
+        self.task_label = label
+        self.task_progress = fraction
+
+    def hide_progress(self):
+        """Hides the progress bar once the task has finished."""
+        self.task_progress = None
+        self.task_label = ""
+
     def get_iteration_count(self):
         """Safely retrieves and validates the iteration count from the text box."""
         try:
@@ -446,6 +555,35 @@ class SimulationUIController:
         """Returns the initial spawn data dictionary."""
         return self.initial_spawn_data
 
+    def set_parameters_changed_callback(self, parameters_changed_cb):
+        """Registers the callback invoked when the queue ratio or rationality slider changes."""
+        self.parameters_changed_cb = parameters_changed_cb
+
+    def set_cancel_task_callback(self, cancel_task_cb):
+        """Registers the callback invoked when the Cancel button is pressed."""
+        self.cancel_task_cb = cancel_task_cb
+
+    def set_sweep_callback(self, sweep_cb):
+        """Registers the callback of the Sweep button."""
+        self.sweep_button.callback = sweep_cb
+
+    def set_calibrate_callback(self, calibrate_cb):
+        """Registers the callback of the Calibrate button."""
+        self.calibrate_button.callback = calibrate_cb
+
+    def set_overload_callback(self, overload_cb):
+        """Registers the callback of the Overload button."""
+        self.overload_button.callback = overload_cb
+
+    def set_day_callback(self, day_cb):
+        """Registers the callback of the Day button."""
+        self.day_button.callback = day_cb
+
+    def set_model_parameters(self, k_length_ratio, rationality_factor):
+        """Moves both model sliders (e.g. to calibrated defaults); the slider callbacks update the state."""
+        self.queue_ratio_slider.set_value(k_length_ratio)
+        self.rationality_slider.set_value(rationality_factor)
+
     def set_run_reset_export_callbacks(self, run_cb, reset_cb, export_cb):
         """Updates the callbacks for the action buttons."""
         # Find the specific buttons and update their callback function references
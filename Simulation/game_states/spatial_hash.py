@@ -0,0 +1,196 @@
+# game_states/spatial_hash.py
+import math
+
+import numpy as np
+
+# --- Spatial Hash Constants ---
+# Cell keys fit in 16 bits on any station up to 65536 cells, where NumPy's stable argsort is a
+# radix (counting) sort: the per-tick rebuild is then linear in the number of agents.
+RADIX_SORT_CELLS = 1 << 16
+
+# Half of the 3 x 3 neighbourhood (same cell, right, and the three cells below): every pair of
+# neighbouring cells is visited exactly once by close_pairs(). The same cell must come first.
+HALF_STENCIL = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def radix_cell_size(height, width, min_size):
+    """Returns the smallest cell size of at least min_size whose grid keeps the radix sort (RADIX_SORT_CELLS cells)."""
+    cell_size = max(min_size, math.sqrt(height * width / RADIX_SORT_CELLS))
+    while math.ceil(height / cell_size) * math.ceil(width / cell_size) > RADIX_SORT_CELLS:
+        cell_size *= 1.01
+    return cell_size
+
+
+class SpatialHash:
+    """
+    Uniform grid over the station for neighbour and density queries on moving agents.
+
+    Positions are (row, col) in tile units, so with cell_size=1 every hash cell is exactly one
+    config.TILE_SIZE tile. rebuild() buckets the agents with a counting sort (bincount for the
+    bucket sizes, prefix sums for the bucket starts, radix argsort for the order); afterwards
+    the agents of cell k are order[starts[k]:starts[k + 1]].
+    """
+    def __init__(self, height, width, cell_size=1.0):
+        """
+        :param height: Grid height in tiles.
+        :param width: Grid width in tiles.
+        :param cell_size: Hash cell edge in tiles.
+        """
+        self.cell_size = float(cell_size)
+        self.rows = max(1, math.ceil(height / self.cell_size))
+        self.cols = max(1, math.ceil(width / self.cell_size))
+        self.num_cells = self.rows * self.cols
+
+        self.positions = np.zeros((0, 2), dtype=np.float32)
+        self.counts = np.zeros(self.num_cells, dtype=np.int64)
+        self.starts = np.zeros(self.num_cells + 1, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64) # Agent indices sorted by cell
+        self._stencils = {} # span -> (row, col) offsets of a span x span block of cells
+
+    def cells_of(self, points):
+        """Returns the flat hash cell of every (row, col) point (points off the grid go to the nearest edge cell)."""
+        rows = np.clip((points[:, 0] / self.cell_size).astype(np.int64), 0, self.rows - 1)
+        cols = np.clip((points[:, 1] / self.cell_size).astype(np.int64), 0, self.cols - 1)
+        return rows * self.cols + cols
+
+    def rebuild(self, positions, agents=None):
+        """
+        Re-buckets the agents; call once per tick after they moved.
+
+        :param positions: (N, 2) array of (row, col) positions in tiles (kept by reference for queries).
+        :param agents: Optional indices of the agents to include (default: all N).
+        """
+        self.positions = positions
+        if agents is None:
+            agents = np.arange(len(positions))
+        cells = self.cells_of(positions[agents])
+
+        self.counts = np.bincount(cells, minlength=self.num_cells)
+        np.cumsum(self.counts, out=self.starts[1:])
+        keys = cells.astype(np.uint16) if self.num_cells <= RADIX_SORT_CELLS else cells
+        self.order = np.asarray(agents, dtype=np.int64)[np.argsort(keys, kind='stable')]
+
+    def density(self):
+        """Returns the (rows, cols) number of agents per cell (agents per tile with cell_size=1)."""
+        return self.counts.reshape(self.rows, self.cols)
+
+    def query_radius(self, points, radius, max_per_cell=None):
+        """
+        Finds the hashed agents within `radius` of every query point.
+
+        Only the cells overlapping the radius are scanned, so the cost is linear in the number
+        of candidates rather than in N x Q.
+
+        :param points: (Q, 2) query positions in tiles.
+        :param radius: Search radius in tiles.
+        :param max_per_cell: Optional cap on the candidates taken from one cell, which bounds the
+            cost in extreme crowds (the first agents of the bucket are used).
+        :return: Tuple (query_indices, agent_indices) of every matching pair.
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+
+        # Cells overlapped by each query's bounding square: rows/cols lo .. hi, at most `span` per axis
+        low = np.floor((points - radius) / self.cell_size).astype(np.int64)
+        high = np.floor((points + radius) / self.cell_size).astype(np.int64)
+        span = math.ceil(2 * radius / self.cell_size) + 1
+        stencil_rows, stencil_cols = self._stencil(span)
+        neighbour_rows = low[:, 0:1] + stencil_rows
+        neighbour_cols = low[:, 1:2] + stencil_cols
+        inside = (neighbour_rows <= high[:, 0:1]) & (neighbour_cols <= high[:, 1:2]) & \
+                 (neighbour_rows >= 0) & (neighbour_rows < self.rows) & \
+                 (neighbour_cols >= 0) & (neighbour_cols < self.cols)
+        candidate_cells = (neighbour_rows * self.cols + neighbour_cols)[inside]
+        candidate_queries = np.nonzero(inside)[0]
+
+        # Expand every (query, cell) pair into the agents of the cell without a Python loop
+        sizes = self.counts[candidate_cells]
+        if max_per_cell is not None:
+            sizes = np.minimum(sizes, max_per_cell)
+        total = int(sizes.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        first = np.cumsum(sizes) - sizes
+        pair_queries = np.repeat(candidate_queries, sizes)
+        slots = np.repeat(self.starts[candidate_cells] - first, sizes) + np.arange(total)
+        pair_agents = self.order[slots]
+
+        # np.take is much faster than fancy indexing for gathering (row, col) rows
+        offsets = np.take(self.positions, pair_agents, axis=0) - np.take(points, pair_queries, axis=0)
+        close = offsets[:, 0] * offsets[:, 0] + offsets[:, 1] * offsets[:, 1] <= radius * radius
+        return pair_queries[close], pair_agents[close]
+
+    def close_pairs(self, radius, max_per_cell=None):
+        """
+        Finds every unordered pair of hashed agents closer than `radius` (at most one cell size).
+
+        Instead of one query per agent, every occupied cell is paired with itself and with the
+        half-stencil of neighbouring cells (HALF_STENCIL), and all agent pairs of two buckets
+        are expanded at once. Each pair is found once, and with cells about one radius wide a
+        dense crowd costs a few candidate pairs per agent (see query_radius() for larger radii).
+
+        :param radius: Pair distance in tiles; must not exceed the cell size.
+        :param max_per_cell: Optional cap on the agents taken from one cell (the first of the bucket).
+        :return: Tuple (first, second) of agent indices, one entry per close pair.
+        """
+        if radius > self.cell_size:
+            raise ValueError(f"close_pairs needs radius <= cell_size ({self.cell_size}), got {radius}")
+
+        # Bucket sizes and starts on a grid padded with one empty column on either side and one
+        # empty row below, so the stencil neighbours of any cell need no bounds checks
+        width = self.cols + 2
+        sizes = np.zeros((self.rows + 1, width), dtype=np.int64)
+        starts = np.zeros((self.rows + 1, width), dtype=np.int64)
+        counts = self.counts if max_per_cell is None else np.minimum(self.counts, max_per_cell)
+        sizes[:self.rows, 1:-1] = counts.reshape(self.rows, self.cols)
+        starts[:self.rows, 1:-1] = self.starts[:-1].reshape(self.rows, self.cols)
+        sizes, starts = sizes.reshape(-1), starts.reshape(-1)
+
+        # Every (cell, stencil neighbour) pair with agents on both sides, found with shifted
+        # comparisons of the whole padded grid (contiguous, no gathers); a cell paired with
+        # itself needs two agents
+        occupied = sizes > 0
+        first_cells = [np.flatnonzero(sizes > 1)]
+        second_cells = [first_cells[0]]
+        for row_step, col_step in HALF_STENCIL[1:]:
+            step = row_step * width + col_step
+            cells = np.flatnonzero(occupied[:-step] & occupied[step:])
+            first_cells.append(cells)
+            second_cells.append(cells + step)
+        num_same = len(first_cells[0]) # The same-cell pairs come first
+        first_cells, second_cells = np.concatenate(first_cells), np.concatenate(second_cells)
+        first_sizes, second_sizes = sizes[first_cells], sizes[second_cells]
+
+        # Most cell pairs hold one agent on either side (cells are about one body wide): their
+        # agent pair is read off directly
+        single = (first_sizes == 1) & (second_sizes == 1)
+        first_slots = [starts[first_cells[single]]]
+        second_slots = [starts[second_cells[single]]]
+
+        # Expand every other cell pair into the a x b agent pairs of its two buckets
+        multiple = np.flatnonzero(~single)
+        pair_counts = first_sizes[multiple] * second_sizes[multiple]
+        total = int(pair_counts.sum())
+        if total:
+            owner = np.repeat(multiple, pair_counts)
+            local = np.arange(total) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+            widths = second_sizes[owner]
+            slots = starts[first_cells[owner]] + local // widths
+            other_slots = starts[second_cells[owner]] + local % widths
+            # Within one cell keep each pair once (and no agent with itself)
+            keep = (owner >= num_same) | (slots < other_slots)
+            first_slots.append(slots[keep])
+            second_slots.append(other_slots[keep])
+        first = self.order[np.concatenate(first_slots)]
+        second = self.order[np.concatenate(second_slots)]
+
+        offsets = np.take(self.positions, first, axis=0) - np.take(self.positions, second, axis=0)
+        close = offsets[:, 0] * offsets[:, 0] + offsets[:, 1] * offsets[:, 1] <= radius * radius
+        return first[close], second[close]
+
+    def _stencil(self, span):
+        """Returns the (1, span * span) row and column offsets of a span x span block of cells (cached)."""
+        stencil = self._stencils.get(span)
+        if stencil is None:
+            steps = np.arange(span)
+            stencil = self._stencils[span] = (np.repeat(steps, span)[None, :], np.tile(steps, span)[None, :])
+        return stencil
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# The game modules import config and each other from the Simulation directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
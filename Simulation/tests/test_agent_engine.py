@@ -0,0 +1,116 @@
+# tests/test_agent_engine.py
+import numpy as np
+import pytest
+
+import config
+from game_states.queue_manager import QueueManager
+from game_states.simulation.agent_engine import AgentEngine, AGENT_QUEUED, INITIAL_CAPACITY
+
+RATIONALITY = 10.0
+K_RATIO = 50.0
+DT = 0.1
+
+
+def make_station(height=12, width=16, wall=True):
+    """Platform with two doors on the top row, two stairs on the bottom row and (optionally) a wall in between."""
+    grid = [[1] * width for _ in range(height)]
+    if wall:
+        for r in range(3, 9):
+            grid[r][7] = 0
+    entries = [(0, 2), (0, width - 4)]
+    stairs = [(height - 1, 4), (height - 1, width - 6)]
+    for r, c in entries:
+        grid[r][c] = 4
+    for r, c in stairs:
+        grid[r][c] = 5
+    return grid, entries, stairs
+
+
+def make_engine(spawn_counts, seed=1, **station):
+    grid, entries, stairs = make_station(**station)
+    spawn_data = dict(zip(stairs, spawn_counts))
+    queue_manager = QueueManager(entries, spawn_data, seed=seed, grid_data=grid)
+    return AgentEngine(queue_manager, grid, spawn_counts, RATIONALITY, K_RATIO, seed=seed)
+
+
+def run(engine, max_ticks):
+    for _ in range(max_ticks):
+        engine.step(DT)
+        if engine.is_finished():
+            return True
+    return False
+
+
+@pytest.fixture
+def no_boarding(monkeypatch):
+    monkeypatch.setattr(config, "AGENT_BOARDING_RATE", 0.0)
+
+
+def test_every_agent_walks_around_the_wall_and_queues_at_its_door(no_boarding):
+    engine = make_engine([40, 30])
+    assert run(engine, 2000)
+
+    queued = np.flatnonzero(engine.state == AGENT_QUEUED)
+    assert len(queued) == 70 and engine.num_walking() == 0
+    assert engine.queue_lengths().sum() == 70
+    np.testing.assert_array_equal(engine.cell[queued], engine.entry_cells[engine.target[queued]])
+    walkable = engine.flow_fields.walkable
+    rows, cols = engine.position[queued].astype(np.int64).T
+    assert np.all(walkable[rows, cols])
+
+
+def test_spawns_follow_the_spawn_rate(no_boarding, monkeypatch):
+    monkeypatch.setattr(config, "AGENT_DENSITY_SPEED", False)
+    engine = make_engine([40, 30])
+    for _ in range(10):
+        engine.step(DT)
+    expected = int(config.AGENT_SPAWN_RATE * 10 * DT + 1e-9)
+    np.testing.assert_array_equal(engine.remaining, [40 - expected, 30 - expected])
+    assert np.count_nonzero(engine.state != 0) == 2 * expected
+
+
+def test_buffers_grow_past_the_initial_capacity(no_boarding, monkeypatch):
+    monkeypatch.setattr(config, "AGENT_SPAWN_RATE", 1e5)
+    engine = make_engine([INITIAL_CAPACITY, INITIAL_CAPACITY // 2])
+    engine.step(DT)
+    assert engine.capacity >= INITIAL_CAPACITY + INITIAL_CAPACITY // 2
+    assert engine.num_walking() + engine.queue_lengths().sum() == INITIAL_CAPACITY + INITIAL_CAPACITY // 2
+    assert not engine.remaining.any()
+
+
+def test_doors_board_first_come_first_served_while_a_train_is_in(monkeypatch):
+    monkeypatch.setattr(config, "AGENT_TRAIN_INTERVAL", None)
+    monkeypatch.setattr(config, "AGENT_BOARDING_RATE", 2.0)
+    engine = make_engine([20, 20], wall=False)
+    for _ in range(3000):
+        queued_before = engine.state == AGENT_QUEUED
+        engine.step(DT)
+        boarded = queued_before & (engine.state != AGENT_QUEUED)
+        waiting = engine.state == AGENT_QUEUED
+        for door in range(engine.num_entries):
+            left = engine.queue_time[boarded & (engine.target == door)]
+            stayed = engine.queue_time[waiting & (engine.target == door)]
+            if len(left) and len(stayed):
+                assert left.max() <= stayed.min() # Nobody boards ahead of an earlier arrival
+        if engine.is_finished():
+            break
+    assert engine.is_finished()
+    assert engine.boarded.sum() == 40
+
+
+def test_no_boarding_between_trains(monkeypatch):
+    monkeypatch.setattr(config, "AGENT_TRAIN_INTERVAL", 1e6)
+    engine = make_engine([10, 10], wall=False)
+    run(engine, 500)
+    assert not engine.train_at_platform()
+    assert engine.boarded.sum() == 0 and engine.queue_lengths().sum() == 20
+
+
+def test_same_seed_same_run(no_boarding):
+    first, second = make_engine([25, 25], seed=7), make_engine([25, 25], seed=7)
+    for _ in range(60):
+        first.step(DT)
+        second.step(DT)
+    np.testing.assert_array_equal(first.position, second.position)
+    np.testing.assert_array_equal(first.target, second.target)
+    assert first.num_walking() == second.num_walking() > 0
@@ -0,0 +1,54 @@
+# tests/test_background_task.py
+import threading
+
+from game_states.simulation.background_task import BackgroundTask
+
+
+def wait_for(task):
+    task._thread.join(5)
+    return task.poll()
+
+
+def test_result_progress_and_one_completion_callback():
+    finished = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def body(task):
+        task.report_progress(0.5)
+        started.set()
+        release.wait(5)
+        return threading.current_thread().name
+
+    task = BackgroundTask("Export", body, on_done=finished.append).start()
+    started.wait(5)
+    assert task.running and not task.poll()
+    assert task.progress == 0.5 and finished == []
+
+    release.set()
+    assert wait_for(task)
+    assert task.poll() # A second poll does not call on_done again
+    assert finished == [task]
+    assert task.result == "Export" and task.error is None and task.progress == 1.0
+
+
+def test_cancel_is_seen_by_the_task_body():
+    def body(task):
+        while not task.cancelled:
+            task.report_progress(2.0) # Clamped to the bar
+        return "stopped"
+
+    task = BackgroundTask("RUN", body).start()
+    task.cancel()
+    assert wait_for(task)
+    assert task.cancelled and task.result == "stopped"
+
+
+def test_errors_are_kept_instead_of_raised(capsys):
+    def body(task):
+        raise ValueError("bad layout")
+
+    task = BackgroundTask("RUN", body).start(background=False)
+    assert not task.running and task.poll()
+    assert isinstance(task.error, ValueError) and task.result is None
+    assert "RUN failed" in capsys.readouterr().out
@@ -0,0 +1,81 @@
+# tests/test_calibration.py
+import csv
+
+import numpy as np
+import pytest
+
+from game_states.calibration import (
+    calibrate_parameters, load_observed_counts, load_calibration, save_calibration, nelder_mead, METHOD_MOMENTS
+)
+from game_states.queue_manager import QueueManager
+
+ENTRIES = [(0, 0), (0, 3), (0, 6), (0, 9)]
+SPAWN_DATA = {(6, 2): 30, (6, 8): 20}
+TRUE_RATIONALITY = 10.0
+K_RATIO = 50.0
+
+
+@pytest.fixture(scope="module")
+def observed_path(tmp_path_factory):
+    """2000 rounds of the stale model at a known rationality, saved like a Run & Export CSV."""
+    counts = QueueManager(ENTRIES, SPAWN_DATA, seed=2).simulate_rounds(2000, TRUE_RATIONALITY, K_RATIO)
+    path = tmp_path_factory.mktemp("observed") / "simulation_results.csv"
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Round', 'Spawn [6,2]', 'Spawn [6,8]'] + [f"Entry [{r},{c}]" for r, c in reversed(ENTRIES)])
+        for i, row in enumerate(counts.tolist()):
+            writer.writerow([f"round {i + 1}", 30, 20] + row[::-1])
+    return path
+
+
+def test_observed_counts_load_in_column_order(observed_path):
+    observed = load_observed_counts(observed_path)
+    assert observed["entry_positions"] == ENTRIES[::-1]
+    assert observed["stair_positions"] == [(6, 2), (6, 8)]
+    assert observed["counts"].shape == (2000, 4) and np.all(observed["counts"].sum(axis=1) == 50)
+    np.testing.assert_array_equal(np.unique(observed["spawn_counts"], axis=0), [[30, 20]])
+
+
+@pytest.mark.parametrize("method", ["likelihood", METHOD_MOMENTS])
+def test_fit_recovers_a_known_rationality(observed_path, method):
+    calibration = calibrate_parameters(ENTRIES, load_observed_counts(observed_path), SPAWN_DATA, None,
+                                       method=method, start={"k_length_ratio": K_RATIO}, num_rounds=500,
+                                       master_seed=3, max_workers=1)
+    assert calibration["fitted"] == ["rationality_factor"]
+    assert calibration["converged"] and calibration["warnings"] == []
+    assert calibration["parameters"]["rationality_factor"] == pytest.approx(TRUE_RATIONALITY, abs=0.5)
+    assert calibration["parameters"]["k_length_ratio"] == K_RATIO
+    assert calibration["slider_defaults"] == {"k_length_ratio": 50, "rationality_factor": 10}
+    for entrance in calibration["entrances"].values():
+        assert entrance["fitted_mean"] == pytest.approx(entrance["observed_mean"], abs=0.3)
+
+
+def test_fitting_k_and_rationality_together_flags_the_ridge(observed_path):
+    calibration = calibrate_parameters(ENTRIES, load_observed_counts(observed_path), SPAWN_DATA, None,
+                                       fit=("k_length_ratio", "rationality_factor"), max_workers=1)
+    assert "identification" in calibration
+    assert any("poorly identified" in warning for warning in calibration["warnings"])
+
+
+def test_mismatched_entrances_are_rejected(observed_path):
+    with pytest.raises(ValueError):
+        calibrate_parameters(ENTRIES[:3], load_observed_counts(observed_path), SPAWN_DATA, None, max_workers=1)
+
+
+def test_nelder_mead_finds_a_quadratic_minimum():
+    target = np.array([0.3, -1.2])
+    best, value, _, converged = nelder_mead(
+        lambda points: [float(((point - target) ** 2 * [1.0, 4.0]).sum()) for point in points], np.zeros(2)
+    )
+    assert converged and value < 1e-6
+    np.testing.assert_allclose(best, target, atol=1e-3)
+
+
+def test_calibration_file_round_trip(tmp_path):
+    path = tmp_path / "calibration.json"
+    assert load_calibration(str(path)) is None
+    save_calibration(str(path), {"parameters": {"rationality_factor": 9.9}, "slider_defaults": {"k_length_ratio": 50}})
+    assert load_calibration(str(path))["parameters"] == {"rationality_factor": 9.9}
+
+    path.write_text('{"parameters": {}}')
+    assert load_calibration(str(path)) is None # Missing slider_defaults
@@ -0,0 +1,123 @@
+# tests/test_congestion.py
+import numpy as np
+import pytest
+
+from game_states.congestion import (
+    CongestionFields, smoothed_density, speed_factor, congestion_costs, MIN_SPEED_FACTOR, WEIDMANN_MAX_DENSITY
+)
+from game_states.distance_fields import UNREACHABLE
+from game_states.flow_fields import get_flow_fields, clear_flow_field_cache
+
+
+def make_layout():
+    """A 12 x 16 platform with a wall segment, two entrances and two stairs."""
+    grid = np.ones((12, 16), dtype=np.int16)
+    grid[3:9, 7] = 0
+    grid[0, 2] = grid[0, 12] = 4
+    grid[11, 4] = grid[11, 10] = 5
+    return grid
+
+
+@pytest.fixture
+def layout():
+    clear_flow_field_cache()
+    grid = make_layout()
+    targets = [(0, 2), (0, 12), (11, 4)]
+    yield get_flow_fields(grid), targets
+    clear_flow_field_cache()
+
+
+def random_costs(flow_fields, rng, low=1.0, high=4.0):
+    return rng.uniform(low, high, flow_fields.num_cells)
+
+
+def full_solve(congestion, costs):
+    """Solves every target field from scratch for the given (t, H*W) costs."""
+    field = np.full(congestion.field.shape, np.inf)
+    flat = field.reshape(-1)
+    target_labels = congestion.target_cells + np.arange(congestion.num_targets) * congestion.num_cells
+    flat[target_labels] = 0.0
+    for _ in congestion._relax(flat, costs, target_labels):
+        pass
+    return field
+
+
+def assert_directions_follow_field(congestion):
+    """Every reachable tile points to a neighbour its value is reached through."""
+    flat_costs = congestion.costs
+    for t in range(congestion.num_targets):
+        field, next_cell = congestion.field[t], congestion.next_cell[t]
+        cells = np.flatnonzero(np.isfinite(field) & (field > 0))
+        steps = next_cell[cells]
+        assert np.all(steps != UNREACHABLE)
+        expected = field[steps] + 0.5 * (flat_costs[t, cells] + flat_costs[t, steps])
+        np.testing.assert_allclose(field[cells], expected)
+
+
+def test_incremental_repair_matches_full_solve(layout):
+    flow_fields, targets = layout
+    congestion = CongestionFields(flow_fields, targets)
+    rng = np.random.default_rng(3)
+    for _ in range(4): # Dearer and cheaper tiles, repaired on top of earlier repairs
+        congestion.update_costs(random_costs(flow_fields, rng))
+        np.testing.assert_allclose(congestion.field, full_solve(congestion, congestion.costs))
+        assert_directions_follow_field(congestion)
+
+
+def test_partial_target_updates_keep_their_own_costs(layout):
+    flow_fields, targets = layout
+    congestion = CongestionFields(flow_fields, targets)
+    untouched = congestion.field[1].copy()
+    congestion.update_costs(random_costs(flow_fields, np.random.default_rng(4)), targets=[0, 2])
+    np.testing.assert_array_equal(congestion.field[1], untouched)
+    np.testing.assert_allclose(congestion.field, full_solve(congestion, congestion.costs))
+
+
+def test_time_sliced_update_matches_update_costs(layout):
+    flow_fields, targets = layout
+    whole = CongestionFields(flow_fields, targets)
+    sliced = CongestionFields(flow_fields, targets)
+    costs = random_costs(flow_fields, np.random.default_rng(5))
+
+    whole.update_costs(costs)
+    before = sliced.field.copy()
+    assert sliced.start_update(costs, chunk_labels=16) > 0
+    calls = 0
+    while not sliced.advance(max_labels=64):
+        assert sliced.updating
+        np.testing.assert_array_equal(sliced.field, before) # Nothing is published mid-repair
+        calls += 1
+    assert calls > 1 and not sliced.updating
+    np.testing.assert_allclose(sliced.field, whole.field)
+    assert_directions_follow_field(sliced)
+
+
+def test_small_changes_within_tolerance_are_ignored(layout):
+    flow_fields, targets = layout
+    congestion = CongestionFields(flow_fields, targets)
+    before = congestion.field.copy()
+    assert congestion.update_costs(np.full(flow_fields.num_cells, 1.05), tolerance=0.1) == 0
+    np.testing.assert_array_equal(congestion.field, before)
+
+
+def test_smoothed_density_ignores_blocked_tiles():
+    walkable = np.ones((5, 5), dtype=bool)
+    walkable[:, 3] = False
+    counts = np.zeros((5, 5))
+    counts[2, 2] = 4.0
+    density = smoothed_density(counts, walkable, tile_area=2.0)
+    assert np.all(density[:, 3] == 0.0)
+    assert density[2, 2] == density.max() and density[2, 0] == 0.0
+    # A uniform crowd stays uniform up to the walls (blocked tiles do not dilute it)
+    np.testing.assert_allclose(smoothed_density(np.where(walkable, 3.0, 0.0), walkable)[walkable], 3.0)
+
+
+def test_fundamental_diagram_slows_crowds_down():
+    densities = np.array([0.0, 0.5, 2.0, 4.0, WEIDMANN_MAX_DENSITY, 10.0])
+    factors = speed_factor(densities)
+    assert factors[0] == 1.0 and factors[1] > 0.9
+    assert 0.4 < factors[2] < 0.6 # About half speed at 2 persons per m2
+    assert np.all(np.diff(factors) <= 0)
+    assert factors[-1] == MIN_SPEED_FACTOR
+    np.testing.assert_allclose(congestion_costs(densities, weight=0.0), 1.0)
+    np.testing.assert_allclose(congestion_costs(densities), 1.0 / factors)
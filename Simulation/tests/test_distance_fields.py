@@ -0,0 +1,109 @@
+# tests/test_distance_fields.py
+import random
+import threading
+
+import numpy as np
+import pytest
+
+from game_states import queue_manager as qm
+from game_states.distance_fields import distance_fields, walking_distance_matrix, walkable_mask
+
+
+def random_layout(rng, kind):
+    """Small grids with scattered obstacles, rectangular blocks or tracks with crossings."""
+    height, width = rng.integers(1, 24, 2)
+    if kind == 0:
+        return rng.choice([0, 1, 3], size=(height, width), p=[0.15, 0.7, 0.15])
+    grid = np.ones((height, width), dtype=int)
+    if kind == 1:
+        for _ in range(rng.integers(0, 5)):
+            r, c = rng.integers(0, height), rng.integers(0, width)
+            grid[r:r + rng.integers(1, 6), c:c + rng.integers(1, 6)] = 3
+    else:
+        grid[::4, :] = 3
+        grid[::4, ::rng.integers(2, 6)] = 1
+    return grid
+
+
+def bfs_matrix(grid, stairs, entries):
+    fields = distance_fields(grid, stairs)
+    return np.array([[fields[i, r, c] for r, c in entries] for i in range(len(stairs))])
+
+
+@pytest.mark.parametrize("kind", [0, 1, 2])
+def test_matrix_matches_a_bfs_from_every_stairs_tile(kind):
+    rng = np.random.default_rng(kind)
+    for _ in range(60):
+        grid = random_layout(rng, kind)
+        walkable = np.argwhere(walkable_mask(grid))
+        if len(walkable) == 0:
+            continue
+        stairs = [tuple(p) for p in walkable[rng.choice(len(walkable), min(len(walkable), 5), replace=False)]]
+        entries = [tuple(p) for p in walkable[rng.choice(len(walkable), rng.integers(1, len(stairs) + 1), replace=False)]]
+        np.testing.assert_array_equal(
+            walking_distance_matrix(grid.tolist(), stairs, entries), bfs_matrix(grid.tolist(), stairs, entries)
+        )
+
+
+def test_separated_platforms_are_unreachable():
+    grid = np.ones((7, 6), dtype=int)
+    grid[3, :] = 3 # A track between two platforms
+    matrix = walking_distance_matrix(grid.tolist(), [(0, 0), (6, 5)], [(1, 4), (5, 1)])
+    np.testing.assert_array_equal(matrix, [[5, np.inf], [np.inf, 5]])
+
+
+def test_concurrent_requests_build_a_layout_once(monkeypatch):
+    qm.clear_distance_cache()
+    builds = []
+    release = threading.Event()
+    original = qm.QueueManager._build_distance_matrix
+
+    def slow_build(self):
+        builds.append(threading.get_ident())
+        release.wait(5)
+        return original(self)
+
+    monkeypatch.setattr(qm.QueueManager, "_build_distance_matrix", slow_build)
+    grid = np.ones((5, 8), dtype=int).tolist()
+    managers = [qm.QueueManager([(0, 1), (0, 6)], {(4, 3): 10}, grid_data=grid, distance_metric=qm.DISTANCE_WALKING)
+                for _ in range(4)]
+    results = [None] * len(managers)
+
+    def fetch(index):
+        results[index] = managers[index].get_distance_matrix()
+
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(len(managers))]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert all(result is results[0] for result in results)
+    np.testing.assert_array_equal(results[0], [[6, 7]])
+    qm.clear_distance_cache()
+
+
+def test_reference_and_batch_agree_around_a_wall():
+    grid = np.ones((8, 10), dtype=int)
+    grid[4, 1:] = 3 # A wall with a gap on the left
+    grid[5:, 7] = 3 # The last entrance is walled off from both stairs
+    grid[6:, 8] = 3
+    entries, spawn_data = [(2, 0), (2, 5), (2, 9), (7, 9)], {(7, 2): 30, (6, 6): 20}
+    counts = {}
+    for mode, seed in ((qm.MODE_REFERENCE, None), (qm.MODE_BATCH, 2)):
+        random.seed(2)
+        np.random.seed(2)
+        queue_manager = qm.QueueManager(entries, spawn_data, mode=mode, seed=seed, grid_data=grid.tolist(),
+                                        distance_metric=qm.DISTANCE_WALKING)
+        rounds = []
+        for _ in range(300 if mode == qm.MODE_REFERENCE else 2000):
+            queue_manager.distribute_passengers_utility_based(10.0, 50.0)
+            rounds.append([queue_manager.queues[pos] for pos in entries])
+        counts[mode] = np.array(rounds)
+
+    reference, batch = counts[qm.MODE_REFERENCE], counts[qm.MODE_BATCH]
+    assert np.all(reference[:, 3] == 0) and np.all(batch[:, 3] == 0)
+    std_error = np.sqrt(reference.var(axis=0, ddof=1) / len(reference) + batch.var(axis=0, ddof=1) / len(batch))
+    assert np.all(np.abs(reference.mean(axis=0) - batch.mean(axis=0)) <= 5.0 * std_error + 1e-9)
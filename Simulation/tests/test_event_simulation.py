@@ -0,0 +1,132 @@
+# tests/test_event_simulation.py
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from game_states.event_simulation import (
+    DayEventSimulation, EventScheduler, arrival_times, platform_groups, save_day_report,
+    ARRIVALS_PROFILE, EVENT_ARRIVAL, EVENT_JOIN
+)
+from game_states.queue_manager import QueueManager
+
+RATIONALITY = 10.0
+K_RATIO = 50.0
+
+
+def make_station():
+    """Two platforms (track rows 0 and 9), two doors on each and one stairs tile per platform."""
+    grid = [[1] * 12 for _ in range(10)]
+    grid[0] = [3] * 12
+    grid[9] = [3] * 12
+    entries = [(1, 2), (1, 8), (8, 3), (8, 9)]
+    stairs = [(4, 5), (6, 5)]
+    for r, c in entries:
+        grid[r][c] = 4
+    for r, c in stairs:
+        grid[r][c] = 5
+    return grid, entries, stairs
+
+
+def make_day(spawn_counts=(300, 200), seed=3, **kwargs):
+    grid, entries, stairs = make_station()
+    queue_manager = QueueManager(entries, dict(zip(stairs, spawn_counts)), seed=seed, grid_data=grid)
+    options = dict(day_length=3600.0, headway=120.0, dwell=40.0, door_rate=2.0, walk_speed=1.5, seed=seed)
+    options.update(kwargs)
+    return DayEventSimulation(queue_manager, RATIONALITY, K_RATIO, **options)
+
+
+def test_scheduler_pops_in_time_then_schedule_order():
+    scheduler = EventScheduler()
+    scheduler.schedule(5.0, EVENT_JOIN, "late")
+    scheduler.schedule(1.0, EVENT_ARRIVAL, "first")
+    scheduler.schedule(1.0, EVENT_JOIN, "second") # Same time: scheduled later, popped later
+    scheduler.schedule(0.5, EVENT_ARRIVAL, "earliest")
+    popped = [scheduler.pop() for _ in range(len(scheduler))]
+    assert [data for _, _, data in popped] == ["earliest", "first", "second", "late"]
+    assert scheduler.now == 5.0 and scheduler.processed == 4
+
+
+def test_flat_arrivals_spread_over_the_day():
+    times = arrival_times(np.random.default_rng(0), [4000, 1000], 100.0)
+    assert [len(t) for t in times] == [4000, 1000]
+    assert all(np.all(np.diff(t) >= 0) for t in times)
+    counts = np.histogram(np.concatenate(times), bins=10, range=(0.0, 100.0))[0]
+    assert np.all(np.abs(counts - 500) < 5 * np.sqrt(500))
+
+
+def test_profile_arrivals_follow_the_rates():
+    profile = [1.0, 0.0, 3.0, 0.0]
+    times = np.concatenate(arrival_times(np.random.default_rng(1), [8000], 40.0, profile))
+    counts = np.histogram(times, bins=4, range=(0.0, 40.0))[0]
+    assert counts[1] == 0 and counts[3] == 0 # Slices without a rate never get arrivals
+    assert abs(counts[2] / counts[0] - 3.0) < 0.3
+    with pytest.raises(ValueError):
+        arrival_times(np.random.default_rng(1), [10], 40.0, [0.0, 0.0])
+
+
+def test_doors_along_one_track_share_a_platform():
+    grid, entries, _ = make_station()
+    platforms, num_platforms = platform_groups(grid, entries + [(5, 0)])
+    assert num_platforms == 3 # Two tracks and a door without a track
+    assert platforms[0] == platforms[1] != platforms[2] == platforms[3] != platforms[4]
+
+
+def test_a_day_boards_every_passenger():
+    simulation = make_day()
+    report = simulation.run()
+    assert report["passengers"] == report["arrived"] == 500
+    assert report["boarded"] + report["left_waiting"] == 500
+    assert report["boarded"] > 450 and not report["cancelled"]
+    assert sum(values["boarded"] for values in report["entrances"].values()) == report["boarded"]
+    assert sum(report["hourly"]["arrivals"]) == 500
+    assert report["trains"] == 2 * 30 # Every 120 s on both platforms for an hour
+    assert 0.0 <= report["mean_wait"] <= report["p95_wait"] <= report["max_wait"]
+
+
+def test_door_capacity_limits_each_train():
+    simulation = make_day(spawn_counts=(400, 400), door_capacity=2)
+    report = simulation.run()
+    assert report["boarded"] <= 2 * 4 * 30 # Two per door on every train
+    assert report["left_waiting"] > 0
+
+
+def test_same_seed_same_day_and_the_report_is_saved(tmp_path):
+    first = make_day(arrivals=ARRIVALS_PROFILE, profile=[1.0, 3.0, 1.0]).run()
+    second = make_day(arrivals=ARRIVALS_PROFILE, profile=[1.0, 3.0, 1.0]).run()
+    assert first == second
+
+    json_path, csv_path = tmp_path / "day.json", tmp_path / "day.csv"
+    save_day_report(json_path, csv_path, first)
+    assert json.loads(json_path.read_text()) == first
+    with open(csv_path, newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0][0] == "Entrance" and len(rows) == 1 + len(first["entrances"])
+
+
+def test_cancel_stops_the_day():
+    simulation = make_day(spawn_counts=(30000, 30000), day_length=36000.0)
+    fractions = []
+    report = simulation.run(progress_cb=fractions.append, cancel_cb=lambda: True)
+    assert report["cancelled"] and report["arrived"] < 60000
+    assert fractions[-1] == 1.0
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        make_day(arrivals="bursty")
+    with pytest.raises(ValueError):
+        make_day(headway=0.0)
+
+
+def test_doors_without_probability_are_never_chosen():
+    simulation = make_day()
+    stair = 1 # (6, 5): nearest door is (8, 3), the others get probability 0 with this distance taste
+    n = simulation.stair_offsets[stair]
+    simulation.beta_distance[n] = -1e4
+    simulation.beta_length[n] = 0.0
+    simulation.uniforms[n] = 0.0
+    simulation._arrival(0.0, stair)
+    joins = [data for _, _, event_type, data in simulation.scheduler.heap if event_type == EVENT_JOIN]
+    assert joins == [2]
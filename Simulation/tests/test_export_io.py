@@ -0,0 +1,109 @@
+# tests/test_export_io.py
+import csv
+import gzip
+import zlib
+
+import numpy as np
+
+from game_states.export_io import (
+    StreamingCsvWriter, ColumnarCountWriter, load_columnar_export, CSV_BUFFER_ROWS, NPY_HEADER_BYTES
+)
+
+HEADER = ['Round', 'Entry [0,0]', 'Entry [0,3]']
+SPAWN_DATA = {(6, 2): 30, (6, 8): 20}
+ENTRIES = [(0, 0), (0, 3), (0, 6)]
+
+
+def make_rows(num_rows):
+    return [[f"round {i + 1}", i, 2 * i] for i in range(num_rows)]
+
+
+def as_text(rows):
+    return [[str(value) for value in row] for row in rows]
+
+
+def read_partial_gzip(path):
+    """Decompresses whatever a still-open gzip export has flushed so far."""
+    data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(path.read_bytes())
+    return list(csv.reader(data.decode().splitlines()))
+
+
+def test_rows_round_trip(tmp_path):
+    rows = make_rows(2 * CSV_BUFFER_ROWS + 5)
+    with StreamingCsvWriter(tmp_path / "results.csv", HEADER) as writer:
+        writer.write_rows(rows)
+    assert writer.rows_written == len(rows)
+
+    with open(tmp_path / "results.csv", newline='') as f:
+        assert list(csv.reader(f)) == [HEADER] + as_text(rows)
+
+
+def test_gzip_export_gets_its_suffix_and_round_trips(tmp_path):
+    rows = make_rows(100)
+    with StreamingCsvWriter(tmp_path / "results.csv", HEADER, compress=True) as writer:
+        writer.write_rows(rows)
+    assert writer.path.name == "results.csv.gz"
+
+    with gzip.open(writer.path, 'rt', newline='') as f:
+        assert list(csv.reader(f)) == [HEADER] + as_text(rows)
+
+
+def test_checkpoints_leave_a_readable_partial_export(tmp_path):
+    writer = StreamingCsvWriter(tmp_path / "results.csv", HEADER, compress=True, checkpoint_rows=10)
+    rows = make_rows(CSV_BUFFER_ROWS + 3)
+    writer.write_rows(rows)
+    # The full buffer was drained past checkpoint_rows: that part is on disk, the last 3 rows are not yet
+    assert read_partial_gzip(writer.path) == [HEADER] + as_text(rows[:CSV_BUFFER_ROWS])
+
+    writer.checkpoint()
+    assert read_partial_gzip(writer.path) == [HEADER] + as_text(rows)
+    writer.close()
+    writer.close() # Closing twice is harmless
+
+
+def make_block(rows, offset=0):
+    return (np.arange(rows * len(ENTRIES)).reshape(rows, len(ENTRIES)) + offset).astype(np.int32)
+
+
+def test_header_is_rewritten_at_every_checkpoint(tmp_path):
+    path = tmp_path / "counts.npy"
+    writer = ColumnarCountWriter(path, SPAWN_DATA, ENTRIES, {"k": 50}, checkpoint_rows=10)
+    writer.write_block(make_block(6))
+    writer.write_block(make_block(6, offset=100))
+    # The second block crossed the checkpoint, so the open file already loads with both blocks
+    np.testing.assert_array_equal(np.load(path), np.vstack([make_block(6), make_block(6, offset=100)]))
+    writer.write_block(make_block(3, offset=200))
+    writer.close()
+
+    counts = np.load(path, mmap_mode='r')
+    assert counts.shape == (15, len(ENTRIES))
+    assert counts.offset == NPY_HEADER_BYTES
+    np.testing.assert_array_equal(counts[12:], make_block(3, offset=200))
+
+
+def test_append_resumes_after_the_recorded_rounds(tmp_path):
+    path = tmp_path / "counts.npy"
+    with ColumnarCountWriter(path, SPAWN_DATA, ENTRIES, {"seed": 1}) as writer:
+        writer.write_block(make_block(4))
+    # Bytes past the recorded rounds (an interrupted write) are dropped on resume
+    with open(path, 'ab') as f:
+        f.write(b'\xff' * 7)
+    with ColumnarCountWriter(path, SPAWN_DATA, ENTRIES, {"seed": 2}, append=True) as writer:
+        writer.write_block(make_block(5, offset=50))
+
+    counts, metadata = load_columnar_export(path)
+    np.testing.assert_array_equal(counts, np.vstack([make_block(4), make_block(5, offset=50)]))
+    assert [(run["seed"], run["first_round"], run["rounds"]) for run in metadata["runs"]] == [(1, 0, 4), (2, 4, 5)]
+    assert metadata["entry_positions"] == [list(pos) for pos in ENTRIES]
+
+
+def test_append_with_other_positions_starts_a_new_file(tmp_path):
+    path = tmp_path / "counts.npy"
+    with ColumnarCountWriter(path, SPAWN_DATA, ENTRIES, {"seed": 1}) as writer:
+        writer.write_block(make_block(4))
+    with ColumnarCountWriter(path, SPAWN_DATA, ENTRIES[:2], {"seed": 2}, append=True) as writer:
+        writer.write_block(make_block(3)[:, :2])
+
+    counts, metadata = load_columnar_export(path)
+    assert counts.shape == (3, 2)
+    assert len(metadata["runs"]) == 1
@@ -0,0 +1,102 @@
+# tests/test_export_stats.py
+import numpy as np
+import pytest
+
+import config
+from game_states.export_stats import RunningMoments, ExportSummary, gini_index, max_mean_ratio, Z_95
+from game_states.queue_manager import QueueManager
+from game_states.simulation.simulation_state import SimulationState
+
+ENTRIES = [(0, 0), (0, 3), (0, 6), (0, 9)]
+SPAWN_DATA = {(6, 2): 30, (6, 8): 20}
+
+
+def test_running_moments_match_numpy_over_uneven_blocks():
+    data = np.random.default_rng(0).poisson(7.0, size=(1000, 3)).astype(float)
+    moments = RunningMoments(3)
+    for start, stop in ((0, 1), (1, 250), (250, 251), (251, 251), (251, 1000)):
+        moments.update(data[start:stop])
+
+    assert moments.count == 1000
+    np.testing.assert_allclose(moments.mean, data.mean(axis=0))
+    np.testing.assert_allclose(moments.variance(), data.var(axis=0, ddof=1))
+    np.testing.assert_allclose(moments.ci_half_widths(), Z_95 * data.std(axis=0, ddof=1) / np.sqrt(1000))
+
+
+def test_running_moments_before_any_spread():
+    moments = RunningMoments(2)
+    assert np.all(np.isinf(moments.ci_half_widths()))
+    moments.update([[1.0, 2.0]])
+    np.testing.assert_array_equal(moments.variance(), [0.0, 0.0])
+
+
+def per_round_state():
+    """A SimulationState shell with just what the per-round export loop touches."""
+    state = SimulationState.__new__(SimulationState)
+    state.queue_manager = QueueManager(ENTRIES, SPAWN_DATA, seed=5)
+    state._distribute_round = lambda: state.queue_manager.distribute_passengers_utility_based(10.0, 50.0)
+    return state
+
+
+@pytest.mark.parametrize("tolerance, stops_early", [(1.0, True), (1e-6, False)])
+def test_per_round_export_stops_at_the_precision_target(monkeypatch, tolerance, stops_early):
+    monkeypatch.setattr(config, "EXPORT_CI_TOLERANCE", tolerance)
+    monkeypatch.setattr(config, "EXPORT_CI_CHECK_ROUNDS", 20)
+    state = per_round_state()
+    rounds = np.vstack(list(state._iter_export_counts_per_round(200)))
+
+    precision = state.export_precision
+    assert precision["rounds_used"] == len(rounds) and precision["converged"] == stops_early
+    assert (len(rounds) < 200) == stops_early
+    if stops_early:
+        assert len(rounds) % 20 == 0 and len(rounds) >= config.EXPORT_CI_MIN_ROUNDS
+        assert precision["max_ci_half_width"] < tolerance
+    half_widths = Z_95 * rounds.std(axis=0, ddof=1) / np.sqrt(len(rounds))
+    np.testing.assert_allclose(list(precision["ci_half_widths"].values()), half_widths)
+
+
+def test_per_round_export_without_a_target_runs_every_round(monkeypatch):
+    monkeypatch.setattr(config, "EXPORT_CI_TOLERANCE", None)
+    state = per_round_state()
+    assert len(list(state._iter_export_counts_per_round(35))) == 35
+    assert state.export_precision is None
+
+
+def test_imbalance_measures_of_extreme_rows():
+    rows = np.array([[5, 5, 5, 5], [20, 0, 0, 0], [0, 0, 0, 0], [1, 2, 3, 4]])
+    np.testing.assert_allclose(gini_index(rows), [0.0, 0.75, 0.0, 0.25])
+    np.testing.assert_allclose(max_mean_ratio(rows), [1.0, 4.0, 0.0, 1.6])
+
+
+def test_summary_matches_whole_array_statistics():
+    counts = np.random.default_rng(1).multinomial(50, [0.4, 0.3, 0.2, 0.1], size=999)
+    summary = ExportSummary(["a", "b", "c", "d"], max_value=50)
+    for block in np.array_split(counts, 7):
+        summary.update(block)
+    summary.update(counts[:0])
+    data = summary.to_dict()
+
+    assert data["rounds"] == 999 and data["histogram_bin_width"] == 1
+    for j, name in enumerate("abcd"):
+        entrance = data["entrances"][name]
+        assert entrance["mean"] == pytest.approx(counts[:, j].mean())
+        assert entrance["variance"] == pytest.approx(counts[:, j].var(ddof=1))
+        assert (entrance["min"], entrance["max"]) == (counts[:, j].min(), counts[:, j].max())
+        # One value per bin: the histogram quantiles are the exact order statistics
+        expected = np.quantile(counts[:, j], [0.05, 0.25, 0.5, 0.75, 0.95], method='inverted_cdf')
+        np.testing.assert_array_equal(list(entrance["quantiles"].values()), expected)
+
+    gini = data["imbalance"]["gini"]
+    assert gini["mean"] == pytest.approx(gini_index(counts).mean())
+    assert gini["worst"] == pytest.approx(gini_index(counts).max())
+    assert data["imbalance"]["max_mean_ratio"]["of_mean_queues"] == pytest.approx(
+        counts.mean(axis=0).max() / counts.mean())
+
+
+def test_wide_pools_fall_back_to_wider_bins():
+    counts = np.array([[0, 5000], [2500, 2500], [5000, 0]])
+    summary = ExportSummary(["a", "b"], max_value=5000, num_bins=100)
+    summary.update(counts)
+    assert summary.bin_width == 51
+    quantiles = summary.quantiles((0.5,))[0]
+    assert np.all(np.abs(quantiles - 2500) <= summary.bin_width)
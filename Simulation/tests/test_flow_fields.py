@@ -0,0 +1,98 @@
+# tests/test_flow_fields.py
+from collections import deque
+
+import numpy as np
+import pytest
+
+from game_states.distance_fields import UNREACHABLE, walkable_mask
+from game_states.flow_fields import FlowFieldSet, get_flow_fields, clear_flow_field_cache
+
+
+def make_layout():
+    """12x16 grid split by a full-height wall at column 10; the left part has an inner wall."""
+    grid = np.ones((12, 16), dtype=int)
+    grid[:, 10] = 0
+    grid[3:9, 5] = 0
+    grid[0, 2] = grid[0, 8] = 4 # Entrances left of the wall
+    grid[11, 3] = 5
+    grid[0, 13] = 4 # Entrance in the closed-off right part
+    grid[11, 14] = 5
+    return grid.tolist()
+
+
+def bfs_steps(walkable, target):
+    """Plain 4-connected BFS step counts to target (UNREACHABLE where cut off)."""
+    height, width = walkable.shape
+    steps = np.full((height, width), UNREACHABLE, dtype=np.int64)
+    steps[target] = 0
+    frontier = deque([target])
+    while frontier:
+        r, c = frontier.popleft()
+        for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < height and 0 <= nc < width and walkable[nr, nc] and steps[nr, nc] == UNREACHABLE:
+                steps[nr, nc] = steps[r, c] + 1
+                frontier.append((nr, nc))
+    return steps.reshape(-1)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_flow_field_cache()
+    yield
+    clear_flow_field_cache()
+
+
+def test_integration_fields_match_a_plain_bfs():
+    grid = make_layout()
+    flow_fields = get_flow_fields(grid)
+    targets = [(0, 2), (0, 8), (11, 3), (0, 13), (11, 14)]
+    table = flow_fields.integration_fields(targets)
+    for row, target in enumerate(targets):
+        np.testing.assert_array_equal(table[row], bfs_steps(flow_fields.walkable, target))
+
+
+def test_direction_fields_step_one_tile_closer():
+    flow_fields = get_flow_fields(make_layout())
+    for target in [(0, 2), (11, 14)]:
+        steps = flow_fields.integration[target]
+        next_cell = flow_fields.next_cell[target]
+        cells = np.flatnonzero(steps != UNREACHABLE)
+        np.testing.assert_array_equal(next_cell[steps == UNREACHABLE], UNREACHABLE)
+        target_cell = target[0] * flow_fields.width + target[1]
+        assert next_cell[target_cell] == target_cell
+
+        moving = cells[cells != target_cell]
+        np.testing.assert_array_equal(steps[next_cell[moving]], steps[moving] - 1)
+        rows, cols = np.divmod(moving, flow_fields.width)
+        next_rows, next_cols = np.divmod(next_cell[moving], flow_fields.width)
+        assert np.all(np.abs(next_rows - rows) + np.abs(next_cols - cols) == 1)
+
+        directions = flow_fields.directions(target).reshape(-1, 2)
+        np.testing.assert_array_equal(directions[moving, 0], next_rows - rows)
+        np.testing.assert_array_equal(directions[moving, 1], next_cols - cols)
+
+
+def test_fields_are_cached_per_walkable_mask():
+    grid = make_layout()
+    first = get_flow_fields(grid)
+    grid[0][2] = 1 # Retyping a walkable tile keeps the walkable mask
+    assert get_flow_fields(grid) is first
+    clear_flow_field_cache()
+    assert get_flow_fields(grid) is not first
+
+
+def test_an_edit_rebuilds_only_the_targets_it_can_reach():
+    grid = make_layout()
+    before = get_flow_fields(grid)
+    grid[5][12] = 0 # Wall tile in the right part only
+    after = get_flow_fields(grid)
+
+    assert after is not before
+    assert after.reused_targets == 3 and after.built_targets == 2
+    fresh = FlowFieldSet(walkable_mask(grid))
+    for target in [(0, 2), (0, 8), (11, 3), (0, 13), (11, 14)]:
+        fresh.ensure([target])
+        np.testing.assert_array_equal(after.integration[target], fresh.integration[target])
+        np.testing.assert_array_equal(after.next_cell[target], fresh.next_cell[target])
+    assert after.integration[(0, 2)] is before.integration[(0, 2)]
@@ -0,0 +1,70 @@
+# tests/test_overload_estimation.py
+import numpy as np
+import pytest
+
+from game_states.overload_estimation import estimate_overload, _choice_model, _simulate_tilted_rounds
+from game_states.parallel_export import simulate_point_rounds
+from game_states.queue_manager import QueueManager, MODE_BATCH, MODE_SEQUENTIAL, DISTANCE_WALKING
+
+ENTRIES = [(0, 0), (0, 3), (0, 6), (0, 9)]
+SPAWN_DATA = {(6, 2): 30, (6, 8): 20}
+RATIONALITY = 10.0
+K_RATIO = 50.0
+
+
+@pytest.mark.parametrize("mode, num_rounds", [(MODE_BATCH, 20000), (MODE_SEQUENTIAL, 3000)])
+def test_likelihood_ratios_undo_the_tilt(mode, num_rounds):
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, mode=mode, seed=1)
+    model = _choice_model(queue_manager, RATIONALITY, K_RATIO, mode)
+    thetas = np.array([0.0, 1.5, 0.0, 0.0])
+    tilted, log_normalisers = _simulate_tilted_rounds(model, np.ones(num_rounds, dtype=np.int64), thetas,
+                                                      np.random.default_rng(2))
+    plain = simulate_point_rounds(queue_manager, num_rounds, RATIONALITY, K_RATIO)
+    assert np.all(tilted.sum(axis=1) == 50)
+    assert tilted[:, 1].mean() > plain[:, 1].mean() + 0.2
+
+    # Rounds drawn towards entrance 1 and re-weighted by p / q average like untilted rounds
+    weighted = np.exp(log_normalisers[:, 1] - thetas[1] * tilted[:, 1])[:, None] * tilted
+    std_error = np.sqrt(weighted.var(axis=0) / num_rounds + plain.var(axis=0) / num_rounds)
+    assert np.all(np.abs(weighted.mean(axis=0) - plain.mean(axis=0)) <= 5.0 * std_error)
+
+
+def test_unreachable_entrances_are_never_drawn():
+    grid = np.ones((8, 10), dtype=int)
+    grid[5:, 7] = 3 # Walls off the bottom-right corner entrance
+    grid[4, 8:] = 3
+    queue_manager = QueueManager([(0, 0), (0, 9), (7, 9)], {(7, 2): 30}, grid_data=grid.tolist(),
+                                 distance_metric=DISTANCE_WALKING)
+    model = _choice_model(queue_manager, RATIONALITY, K_RATIO, MODE_BATCH)
+    assert model["unreachable"][0].tolist() == [False, False, True]
+
+    components = np.array([-1, 0, 1, 2] * 50)
+    counts, _ = _simulate_tilted_rounds(model, components, np.array([1.0, 1.0, 5.0]), np.random.default_rng(3))
+    assert np.all(counts[:, 2] == 0) and np.all(counts.sum(axis=1) == 30)
+
+
+def test_importance_sampling_agrees_with_plain_monte_carlo():
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_BATCH, seed=5)
+    rounds = queue_manager.simulate_rounds(40000, RATIONALITY, K_RATIO)
+
+    # A threshold plain Monte Carlo still sees often enough to check the estimator against
+    threshold = int(np.quantile(rounds.max(axis=1), 0.9))
+    overloaded = rounds > threshold
+    estimate = estimate_overload(queue_manager, RATIONALITY, K_RATIO, threshold, num_rounds=20000, seed=6)
+
+    checks = [(overloaded.any(axis=1), estimate["any_entrance"])]
+    checks += [(overloaded[:, e], estimate["entrances"][f"Entry [{r},{c}]"]) for e, (r, c) in enumerate(ENTRIES)]
+    for hits, result in checks:
+        plain = hits.mean()
+        plain_error = np.sqrt(plain * (1.0 - plain) / len(hits))
+        assert abs(result["probability"] - plain) <= 5.0 * np.hypot(result["std_error"], plain_error) + 1e-9
+    assert 0.0 < estimate["any_entrance"]["probability"] < 1.0
+
+
+def test_rare_overloads_get_a_tight_interval():
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, seed=7)
+    estimate = estimate_overload(queue_manager, RATIONALITY, K_RATIO, threshold=35, num_rounds=4000, seed=8)
+    any_entrance = estimate["any_entrance"]
+    # Far beyond what 4000 plain rounds could see, yet resolved to a few tens of percent
+    assert 0.0 < any_entrance["probability"] < 1e-4
+    assert any_entrance["relative_error"] < 0.3 and any_entrance["hits"] > 100
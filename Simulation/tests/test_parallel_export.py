@@ -0,0 +1,54 @@
+# tests/test_parallel_export.py
+import numpy as np
+import pytest
+
+from game_states.parallel_export import run_parallel_rounds, shutdown_export_executor, split_round_blocks, BLOCK_ROUNDS
+from game_states.queue_manager import MODE_REFRESH, MODE_REFERENCE
+
+ENTRIES = [(0, 0), (0, 3), (0, 6), (0, 9)]
+SPAWN_DATA = {(6, 2): 30, (6, 8): 20}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def export_pool():
+    yield
+    shutdown_export_executor()
+
+
+def parallel_rounds(num_rounds, **kwargs):
+    return run_parallel_rounds(ENTRIES, SPAWN_DATA, None, num_rounds, 10.0, 50.0, **kwargs)
+
+
+def test_rounds_do_not_depend_on_the_worker_count():
+    num_rounds = 3 * BLOCK_ROUNDS + 7 # Several blocks, the last one partial
+    results = [parallel_rounds(num_rounds, master_seed=1234, max_workers=workers) for workers in (1, 2, 3)]
+    assert results[0].shape == (num_rounds, len(ENTRIES))
+    assert np.all(results[0].sum(axis=1) == 50)
+    for result in results[1:]:
+        np.testing.assert_array_equal(results[0], result)
+
+
+def test_split_export_matches_single_call():
+    whole = parallel_rounds(2 * BLOCK_ROUNDS, master_seed=99, max_workers=1)
+    second = parallel_rounds(BLOCK_ROUNDS, master_seed=99, max_workers=1, first_round=BLOCK_ROUNDS)
+    np.testing.assert_array_equal(whole[BLOCK_ROUNDS:], second)
+    assert not np.array_equal(whole[:BLOCK_ROUNDS], second) # Every block has its own stream
+
+
+def test_blocks_must_start_on_a_block_boundary():
+    assert [rounds for rounds, _ in split_round_blocks(2 * BLOCK_ROUNDS + 1, 5)] == [BLOCK_ROUNDS, BLOCK_ROUNDS, 1]
+    with pytest.raises(ValueError):
+        split_round_blocks(10, 5, first_round=1)
+
+
+def test_refresh_mode_does_not_depend_on_the_worker_count():
+    num_rounds = BLOCK_ROUNDS + 3
+    results = [parallel_rounds(num_rounds, master_seed=5, max_workers=workers, mode=MODE_REFRESH, refresh_interval=5)
+               for workers in (1, 2)]
+    assert np.all(results[0].sum(axis=1) == 50)
+    np.testing.assert_array_equal(results[0], results[1])
+
+
+def test_reference_mode_is_rejected():
+    with pytest.raises(ValueError):
+        parallel_rounds(10, master_seed=1, mode=MODE_REFERENCE)
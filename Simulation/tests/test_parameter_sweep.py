@@ -0,0 +1,103 @@
+# tests/test_parameter_sweep.py
+import numpy as np
+import pytest
+
+from game_states.parallel_export import shutdown_export_executor, simulate_point_rounds
+from game_states.parameter_sweep import run_parameter_sweep, scale_spawn_data, sweep_values
+from game_states.queue_manager import (
+    QueueManager, MODE_BATCH, MODE_REFERENCE, MODE_REFRESH, MODE_SEQUENTIAL, SAMPLER_HALTON, SAMPLER_PSEUDO
+)
+
+ENTRIES = [(0, 0), (0, 3), (0, 6), (0, 9)]
+SPAWN_DATA = {(6, 2): 30, (6, 8): 20}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def export_pool():
+    yield
+    shutdown_export_executor()
+
+
+def sweep(**kwargs):
+    return run_parameter_sweep(ENTRIES, SPAWN_DATA, None, [20.0, 80.0], [5.0, 30.0], **kwargs)
+
+
+def test_sweep_values_and_spawn_scaling():
+    np.testing.assert_allclose(sweep_values((0.0, 100.0, 5)), [0, 25, 50, 75, 100])
+    np.testing.assert_allclose(sweep_values([3, 1.5]), [3.0, 1.5])
+    assert scale_spawn_data(SPAWN_DATA, 0.5) == {(6, 2): 15, (6, 8): 10}
+
+
+def test_cube_does_not_depend_on_the_worker_count():
+    inline = sweep(spawn_scales=(0.5, 1.0), num_rounds=50, master_seed=3, max_workers=1)
+    pooled = sweep(spawn_scales=(0.5, 1.0), num_rounds=50, master_seed=3, max_workers=2)
+
+    assert inline["mean"].shape == (2, 2, 2, len(ENTRIES)) and inline["gini"].shape == (2, 2, 2)
+    for name in ("mean", "variance", "gini", "max_mean_ratio"):
+        np.testing.assert_array_equal(inline[name], pooled[name])
+    np.testing.assert_allclose(inline["mean"].sum(axis=3)[0], 25.0)
+    np.testing.assert_allclose(inline["mean"].sum(axis=3)[1], 50.0)
+
+
+def test_every_point_matches_its_expected_distribution():
+    results = sweep(num_rounds=2000, master_seed=5, max_workers=1)
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA)
+    for k, k_length_ratio in enumerate(results["k_values"]):
+        for q, rationality in enumerate(results["rationality_values"]):
+            expected, variances = queue_manager.expected_distribution(rationality, k_length_ratio)
+            std_error = np.sqrt(variances / 2000)
+            assert np.all(np.abs(results["mean"][0, k, q] - expected) <= 5.0 * std_error + 1e-9)
+            np.testing.assert_allclose(results["variance"][0, k, q], variances, rtol=0.15, atol=0.05)
+
+
+def test_sequential_sweeps_run_and_the_reference_loop_is_rejected():
+    results = sweep(num_rounds=5, master_seed=1, max_workers=1, mode=MODE_SEQUENTIAL)
+    assert not np.isnan(results["mean"]).any()
+    with pytest.raises(ValueError):
+        sweep(num_rounds=5, mode=MODE_REFERENCE)
+
+
+def test_cancel_leaves_the_remaining_points_empty():
+    progress = []
+    results = sweep(num_rounds=5, master_seed=1, max_workers=1, progress_cb=progress.append,
+                    cancel_cb=lambda: len(progress) >= 1)
+    assert progress == [0.5] # One (scale, k) row of two done before the cancel
+    assert not np.isnan(results["mean"][0, 0]).any() and np.isnan(results["mean"][0, 1]).all()
+
+
+@pytest.mark.parametrize("mode, sampler", [(MODE_BATCH, SAMPLER_PSEUDO), (MODE_SEQUENTIAL, SAMPLER_PSEUDO),
+                                           (MODE_REFRESH, SAMPLER_PSEUDO), (MODE_BATCH, SAMPLER_HALTON)])
+def test_reseeding_replays_the_same_draws_for_any_parameters(mode, sampler):
+    # The number of draws only depends on the passenger counts, so the stream ends in the same place
+    states = []
+    for k_length_ratio, rationality in ((20.0, 5.0), (80.0, 30.0)):
+        queue_manager = QueueManager(ENTRIES, SPAWN_DATA, mode=mode, sampler=sampler, refresh_interval=7)
+        queue_manager.reseed(np.random.SeedSequence(9))
+        simulate_point_rounds(queue_manager, 3, rationality, k_length_ratio)
+        states.append(queue_manager.rng.bit_generator.state)
+    assert states[0] == states[1]
+
+
+@pytest.mark.parametrize("common_random_numbers", [True, False])
+def test_points_use_the_stream_of_their_scale_or_their_own(common_random_numbers):
+    results = sweep(num_rounds=20, master_seed=4, max_workers=1, common_random_numbers=common_random_numbers)
+    assert results["common_random_numbers"] == common_random_numbers
+    for flat_index, (k, q) in enumerate(np.ndindex(2, 2)):
+        stream_index = 0 if common_random_numbers else flat_index
+        queue_manager = QueueManager(ENTRIES, SPAWN_DATA, seed=np.random.SeedSequence(4, spawn_key=(stream_index,)))
+        counts = simulate_point_rounds(queue_manager, 20, results["rationality_values"][q], results["k_values"][k])
+        np.testing.assert_allclose(results["mean"][0, k, q], counts.mean(axis=0))
+
+
+def test_common_random_numbers_sharpen_parameter_differences():
+    # Two nearby k values: with shared draws the per-entrance difference of the means is far less noisy
+    def differences(common_random_numbers):
+        spread = []
+        for seed in range(8):
+            results = run_parameter_sweep(ENTRIES, SPAWN_DATA, None, [50.0, 55.0], [10.0], num_rounds=200,
+                                          master_seed=seed, max_workers=1,
+                                          common_random_numbers=common_random_numbers)
+            spread.append(results["mean"][0, 1, 0] - results["mean"][0, 0, 0])
+        return np.var(spread, axis=0).sum()
+
+    assert differences(True) < 0.5 * differences(False)
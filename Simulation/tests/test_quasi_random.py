@@ -0,0 +1,47 @@
+# tests/test_quasi_random.py
+from statistics import NormalDist
+
+import numpy as np
+
+from game_states.quasi_random import ScrambledHalton, norm_ppf
+from game_states.queue_manager import QueueManager, SAMPLER_HALTON, SAMPLER_PSEUDO
+
+ENTRIES = [(0, 0), (0, 3), (0, 6), (0, 9)]
+SPAWN_DATA = {(6, 2): 30, (6, 8): 20}
+
+
+def test_norm_ppf_matches_the_exact_inverse():
+    u = np.concatenate(([1e-12, 1e-6, 0.02425, 0.5, 0.97575, 1 - 1e-6], np.linspace(0.001, 0.999, 999)))
+    exact = np.array([NormalDist().inv_cdf(p) for p in u])
+    np.testing.assert_allclose(norm_ppf(u), exact, rtol=2e-9, atol=1e-12)
+
+
+def test_scrambled_points_stay_stratified():
+    points = ScrambledHalton(3, np.random.default_rng(0)).draw(30)
+    assert np.all((points > 0) & (points < 1))
+    # 30 consecutive points put the same number of points in every 1/base slice of each axis
+    for d, base in enumerate((2, 3, 5)):
+        np.testing.assert_array_equal(np.bincount((points[:, d] * base).astype(int), minlength=base),
+                                      [30 // base] * base)
+
+
+def test_draws_continue_the_sequence():
+    whole = ScrambledHalton(3, np.random.default_rng(4)).draw(12)
+    stream = ScrambledHalton(3, np.random.default_rng(4))
+    np.testing.assert_array_equal(np.vstack([stream.draw(5), stream.draw(7)]), whole)
+
+
+def test_halton_rounds_are_independent_replicates_with_the_right_mean():
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, seed=3, sampler=SAMPLER_HALTON)
+    expected, _ = queue_manager.expected_distribution(10.0, 50.0)
+    halton = queue_manager.simulate_rounds(4000, 10.0, 50.0)
+    pseudo = QueueManager(ENTRIES, SPAWN_DATA, seed=3, sampler=SAMPLER_PSEUDO).simulate_rounds(4000, 10.0, 50.0)
+
+    assert np.all(halton.sum(axis=1) == 50)
+    std_error = np.sqrt(halton.var(axis=0, ddof=1) / len(halton))
+    assert np.all(np.abs(halton.mean(axis=0) - expected) <= 5.0 * std_error)
+    # New permutations every round: consecutive rounds are uncorrelated, not one long sequence
+    lagged = [np.corrcoef(halton[:-1, e], halton[1:, e])[0, 1] for e in range(len(ENTRIES))]
+    assert np.all(np.abs(lagged) < 5.0 / np.sqrt(len(halton)))
+    # Each round fills the unit cube evenly, so a round scatters less than a pseudo-random one
+    assert halton.var(axis=0).sum() < pseudo.var(axis=0).sum()
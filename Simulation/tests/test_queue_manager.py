@@ -0,0 +1,215 @@
+# tests/test_queue_manager.py
+import random
+
+import numpy as np
+import pytest
+
+from game_states.queue_manager import (
+    QueueManager, sample_logit_choices, layout_hash, clear_distance_cache, build_population_theta,
+    compute_scale_parameter, MODE_BATCH, MODE_REFERENCE, MODE_SEQUENTIAL, MODE_REFRESH, EQUILIBRIUM_MSA,
+    EQUILIBRIUM_NODES
+)
+
+ENTRIES = [(0, 0), (0, 3), (0, 6), (0, 9)]
+SPAWN_DATA = {(6, 2): 30, (6, 8): 20}
+RATIONALITY = 10.0
+K_RATIO = 50.0
+
+
+def round_counts(queue_manager, num_rounds):
+    """(R, E) counts of num_rounds full distributions, one per round like a per-round export."""
+    counts = np.zeros((num_rounds, len(queue_manager.entry_tile_positions)), dtype=np.int64)
+    for i in range(num_rounds):
+        queue_manager.distribute_passengers_utility_based(RATIONALITY, K_RATIO, verbose=False)
+        counts[i] = [queue_manager.queues[pos] for pos in queue_manager.entry_tile_positions]
+    return counts
+
+
+def assert_same_means(first, second, num_std_errors=5.0):
+    """Per-entrance means of two independent samples agree within num_std_errors standard errors."""
+    std_error = np.sqrt(first.var(axis=0, ddof=1) / len(first) + second.var(axis=0, ddof=1) / len(second))
+    assert np.all(np.abs(first.mean(axis=0) - second.mean(axis=0)) <= num_std_errors * std_error + 1e-9)
+
+
+def test_batch_matches_reference_loop():
+    random.seed(1)
+    np.random.seed(1)
+    reference = round_counts(QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_REFERENCE), 300)
+    batch = round_counts(QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_BATCH, seed=1), 2000)
+
+    assert np.all(reference.sum(axis=1) == 50) and np.all(batch.sum(axis=1) == 50)
+    assert batch.var(axis=0).sum() > 0 # The comparison below would be vacuous without any spread
+    assert_same_means(reference, batch)
+
+
+def test_zero_probability_entrances_are_never_chosen():
+    utilities = np.zeros((4, 3))
+    unavailable = np.array([[True, False, False]] * 4)
+    uniforms = np.array([0.0, 1e-300, 0.25, np.nextafter(1.0, 0.0)])
+    choices = sample_logit_choices(utilities, 1.0, uniforms, unavailable)
+    np.testing.assert_array_equal(choices, [1, 1, 1, 2])
+
+
+def test_reference_mode_is_quiet_unless_verbose(capsys):
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_REFERENCE)
+    queue_manager.distribute_passengers_utility_based(RATIONALITY, K_RATIO, verbose=False)
+    assert capsys.readouterr().out == ""
+    queue_manager.distribute_passengers_utility_based(RATIONALITY, K_RATIO, verbose=True)
+    assert "DEBUG" in capsys.readouterr().out
+
+
+def test_distance_matrix_is_built_once_per_layout():
+    clear_distance_cache()
+    first = QueueManager(ENTRIES, SPAWN_DATA).get_distance_matrix()
+    second = QueueManager(list(ENTRIES), dict(SPAWN_DATA)).get_distance_matrix()
+    assert first is second
+    assert not first.flags.writeable
+    np.testing.assert_allclose(first[0], [np.hypot(6, 2), np.hypot(6, 1), np.hypot(6, 4), np.hypot(6, 7)])
+
+    # New stairs change the row order of the matrix, so the manager looks up another entry
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA)
+    key = queue_manager.layout_key()
+    queue_manager.update_total_passengers({(6, 8): 20, (6, 2): 30})
+    assert queue_manager.layout_key() != key
+    np.testing.assert_array_equal(queue_manager.get_distance_matrix(), first[::-1])
+    clear_distance_cache()
+
+
+def test_layout_hash_covers_grid_and_positions():
+    grid = np.ones((7, 10), dtype=int).tolist()
+    stairs = list(SPAWN_DATA)
+    key = layout_hash(grid, stairs, ENTRIES)
+    assert key == layout_hash([row[:] for row in grid], stairs, ENTRIES)
+    grid[3][4] = 3
+    assert key != layout_hash(grid, stairs, ENTRIES)
+    assert key != layout_hash(np.ones((7, 10), dtype=int).tolist(), stairs[::-1], ENTRIES)
+
+
+def test_tensor_rounds_match_per_round_export():
+    tensor = QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_BATCH, seed=3).simulate_rounds(2000, RATIONALITY, K_RATIO)
+    again = QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_BATCH, seed=3).simulate_rounds(2000, RATIONALITY, K_RATIO)
+    per_round = round_counts(QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_BATCH, seed=3), 2000)
+
+    np.testing.assert_array_equal(tensor, again) # Same seed, same tensor
+    assert np.all(tensor.sum(axis=1) == 50) and np.all(per_round.sum(axis=1) == 50)
+    assert_same_means(tensor, per_round)
+    # Rounds are independent draws of the same stale model, so the spread agrees as well
+    np.testing.assert_allclose(tensor.var(axis=0), per_round.var(axis=0), rtol=0.2, atol=0.05)
+
+
+def test_tensor_rounds_leave_the_last_round_in_the_queues():
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, seed=4)
+    counts = queue_manager.simulate_rounds(7, RATIONALITY, K_RATIO)
+    assert counts.shape == (7, len(ENTRIES))
+    assert [queue_manager.queues[pos] for pos in ENTRIES] == counts[-1].tolist()
+
+
+def test_sequential_mode_matches_a_per_agent_recomputation():
+    # Replays the sequential mode's draws (arrival shuffle, betas, uniforms) with utilities rebuilt from scratch
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_SEQUENTIAL, seed=21)
+    queue_manager.distribute_passengers_utility_based(RATIONALITY, K_RATIO)
+
+    rng = np.random.default_rng(21)
+    stairs = np.repeat([0, 1], [30, 20])
+    rng.shuffle(stairs)
+    theta = build_population_theta(K_RATIO)
+    normals = rng.standard_normal((len(stairs), 2))
+    uniforms = rng.random(len(stairs))
+    betas = [theta['distance']['mean'], theta['length']['mean']] + 0.5 * normals
+    mu = compute_scale_parameter(RATIONALITY)
+    distances = queue_manager.get_distance_matrix()
+
+    lengths = np.zeros(len(ENTRIES))
+    for stair, (beta_distance, beta_length), uniform in zip(stairs, betas, uniforms):
+        utilities = mu * (beta_distance * distances[stair] + beta_length * lengths)
+        probabilities = np.exp(utilities - utilities.max())
+        probabilities /= probabilities.sum()
+        lengths[np.searchsorted(np.cumsum(probabilities), uniform, side='right')] += 1
+
+    assert [queue_manager.queues[pos] for pos in ENTRIES] == lengths.tolist()
+
+
+def test_sequential_mode_is_reproducible_and_evens_the_queues_out():
+    first = round_counts(QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_SEQUENTIAL, seed=11), 400)
+    second = round_counts(QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_SEQUENTIAL, seed=11), 400)
+    stale = QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_BATCH, seed=12).simulate_rounds(400, RATIONALITY, K_RATIO)
+
+    np.testing.assert_array_equal(first, second)
+    assert np.all(first.sum(axis=1) == 50)
+    # Everyone sees the queues left before them, so no door gets the stale model's pile-ups
+    assert first.max(axis=1).mean() < stale.max(axis=1).mean()
+    assert first.var(axis=0).sum() < 0.5 * stale.var(axis=0).sum()
+
+
+def test_library_calls_are_quiet(capsys):
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_SEQUENTIAL, seed=1)
+    queue_manager.distribute_passengers_utility_based(RATIONALITY, K_RATIO)
+    queue_manager.simulate_rounds(3, RATIONALITY, K_RATIO)
+    assert capsys.readouterr().out == ""
+
+
+def test_refresh_interval_spans_sequential_to_stale():
+    sequential = round_counts(QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_SEQUENTIAL, seed=7), 20)
+    every_arrival = round_counts(QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_REFRESH, seed=7, refresh_interval=1), 20)
+    np.testing.assert_array_equal(sequential, every_arrival) # K = 1 runs the sequential loop itself
+
+    stale = round_counts(QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_BATCH, seed=8), 20)
+    one_snapshot = round_counts(QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_REFRESH, seed=8, refresh_interval=50), 20)
+    np.testing.assert_array_equal(stale, one_snapshot) # K >= N is a single stale chunk
+
+
+def test_fresher_snapshots_even_the_queues_out():
+    spreads = []
+    for seed, refresh_interval in enumerate((2, 10, 50)):
+        queue_manager = QueueManager(ENTRIES, SPAWN_DATA, mode=MODE_REFRESH, seed=seed, refresh_interval=refresh_interval)
+        counts = round_counts(queue_manager, 600)
+        assert np.all(counts.sum(axis=1) == 50)
+        spreads.append(counts.var(axis=0).sum())
+    # Less overshooting the fresher the snapshot
+    assert spreads[0] < spreads[1] < spreads[2]
+
+
+def test_quadrature_matches_the_monte_carlo_mean_and_variance():
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, seed=31)
+    expected, variances = queue_manager.expected_distribution(RATIONALITY, K_RATIO)
+    counts = queue_manager.simulate_rounds(20000, RATIONALITY, K_RATIO)
+
+    assert expected.sum() == pytest.approx(50.0)
+    std_error = np.sqrt(counts.var(axis=0, ddof=1) / len(counts))
+    assert np.all(np.abs(counts.mean(axis=0) - expected) <= 5.0 * std_error)
+    np.testing.assert_allclose(counts.var(axis=0), variances, rtol=0.05)
+
+
+def test_quadrature_without_taste_spread_is_the_plain_logit():
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA, std_dev_distance=0.0, std_dev_length=0.0)
+    mu = compute_scale_parameter(RATIONALITY)
+    theta = queue_manager.population_theta(K_RATIO)
+    lengths = np.array([3.0, 0.0, 1.0, 5.0])
+    utilities = mu * (theta['distance']['mean'] * queue_manager.get_distance_matrix()
+                      + theta['length']['mean'] * lengths)
+    logit = np.exp(utilities - utilities.max(axis=1, keepdims=True))
+    logit /= logit.sum(axis=1, keepdims=True)
+    np.testing.assert_allclose(queue_manager.stair_choice_probabilities(mu, theta, lengths, num_nodes=3), logit)
+
+
+def test_equilibrium_reproduces_itself():
+    queue_manager = QueueManager(ENTRIES, SPAWN_DATA)
+    newton = queue_manager.solve_equilibrium(RATIONALITY, K_RATIO)
+    msa = queue_manager.solve_equilibrium(RATIONALITY, K_RATIO, method=EQUILIBRIUM_MSA, tolerance=1e-4)
+    target = newton["queue_lengths"]
+
+    assert newton["converged"] and newton["gap"] <= 1e-6 and newton["iterations"] < msa["iterations"]
+    assert target.sum() == pytest.approx(50.0)
+    # q* = sum_s n_s * P_s(q*): the expected response to the equilibrium queues is the queues themselves
+    expected, _ = queue_manager.expected_distribution(RATIONALITY, K_RATIO, queue_lengths=target,
+                                                      num_nodes=EQUILIBRIUM_NODES)
+    np.testing.assert_allclose(expected, target, atol=1e-4)
+    assert queue_manager.equilibrium_gap(RATIONALITY, K_RATIO, target) == pytest.approx(newton["gap"])
+    np.testing.assert_allclose(msa["queue_lengths"], target, atol=0.05)
+
+
+def test_sequential_rounds_sit_closer_to_the_equilibrium_than_the_stale_model():
+    report = QueueManager(ENTRIES, SPAWN_DATA).equilibrium_report(RATIONALITY, K_RATIO, num_rounds=300, seed=5)
+    assert report["equilibrium"]["converged"]
+    assert report["sequential"]["distance_to_equilibrium"] < report["stale"]["distance_to_equilibrium"]
+    assert report["sequential"]["equilibrium_gap"] < report["stale"]["equilibrium_gap"]
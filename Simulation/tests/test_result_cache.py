@@ -0,0 +1,78 @@
+# tests/test_result_cache.py
+import json
+from types import SimpleNamespace
+
+import config
+from game_states import result_cache
+from game_states.queue_manager import QueueManager
+from game_states.result_cache import ResultCache, result_key
+from game_states.simulation.simulation_state import SimulationState
+
+SPAWN_DATA = {(6, 2): 30, (6, 8): 20}
+
+
+def make_key(**overrides):
+    request = dict(layout_key="layout", spawn_data=SPAWN_DATA, k_length_ratio=50, rationality_factor=10,
+                   mode="batch", seed=7)
+    request.update(overrides)
+    return result_key(**request)
+
+
+def test_keys_cover_every_setting():
+    key = make_key(sampler="pseudo")
+    assert key == make_key(sampler="pseudo", spawn_data={(6, 8): 20, (6, 2): 30}, k_length_ratio=50.0)
+    changes = [{"layout_key": "other"}, {"spawn_data": {(6, 2): 31, (6, 8): 20}}, {"k_length_ratio": 51},
+               {"rationality_factor": 11}, {"mode": "sequential"}, {"seed": 8}, {"seed": None}, {"sampler": "halton"}]
+    others = [make_key(**dict({"sampler": "pseudo"}, **change)) for change in changes] + [make_key()]
+    assert len({key, *others}) == len(others) + 1
+
+
+def test_a_new_schema_version_invalidates_old_keys(monkeypatch):
+    key = make_key()
+    monkeypatch.setattr(result_cache, "RESULT_SCHEMA_VERSION", result_cache.RESULT_SCHEMA_VERSION + 1)
+    assert make_key() != key
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", {"value": 1})
+    cache.put("b", {"value": 2})
+    assert cache.get("a") == {"value": 1} # "b" is now the oldest
+    cache.put("c", {"value": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"value": 1} and cache.get("c") == {"value": 3}
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_disk_entries_survive_a_restart(tmp_path):
+    disk_dir = tmp_path / "cache"
+    key = make_key()
+    ResultCache(disk_dir=str(disk_dir)).put(key, {"queue_counts": [20, 30]})
+
+    restarted = ResultCache(max_entries=1, disk_dir=str(disk_dir))
+    assert restarted.get(key) == {"queue_counts": [20, 30]}
+    restarted.clear()
+    assert restarted.get(key) == {"queue_counts": [20, 30]} # clear() only drops memory
+
+
+def test_unreadable_disk_entries_are_misses(tmp_path):
+    (tmp_path / "broken.json").write_text("{not json")
+    cache = ResultCache(disk_dir=str(tmp_path))
+    assert cache.get("broken") is None and cache.misses == 1
+    cache.put("broken", {"ok": True})
+    assert json.loads((tmp_path / "broken.json").read_text()) == {"ok": True}
+
+
+def test_run_keys_follow_the_common_random_numbers_setting(monkeypatch):
+    state = SimulationState.__new__(SimulationState)
+    state.queue_manager = QueueManager([(0, 0), (0, 3)], SPAWN_DATA)
+    state.ui_controller = SimpleNamespace(get_k_length_ratio=lambda: 50, get_rationality_factor=lambda: 10)
+    state.std_dev_distance, state.std_dev_length = 0.5, 0.5
+
+    # The seeded RUN stream depends on the setting, so its cached results must too
+    keys = []
+    for common_random_numbers in (True, False):
+        monkeypatch.setattr(config, "COMMON_RANDOM_NUMBERS", common_random_numbers)
+        keys.append(state._result_key(SPAWN_DATA, "batch", 7))
+    assert keys[0] != keys[1]
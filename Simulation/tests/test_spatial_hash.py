@@ -0,0 +1,84 @@
+# tests/test_spatial_hash.py
+import numpy as np
+import pytest
+
+from game_states.spatial_hash import SpatialHash, radix_cell_size, RADIX_SORT_CELLS
+
+HEIGHT, WIDTH = 20, 30
+
+
+def random_positions(num_agents, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.random((num_agents, 2)) * [HEIGHT, WIDTH]).astype(np.float32)
+
+
+def brute_force_pairs(positions, agents, radius):
+    """Set of unordered (a, b) agent pairs within radius, checked pair by pair."""
+    points = positions[agents].astype(np.float64)
+    distances = np.sqrt(((points[:, None, :] - points[None, :, :]) ** 2).sum(axis=-1))
+    first, second = np.nonzero(np.triu(distances <= radius, k=1))
+    return {tuple(sorted((int(agents[a]), int(agents[b])))) for a, b in zip(first, second)}
+
+
+@pytest.mark.parametrize("cell_size", [1.0, 0.3])
+def test_close_pairs_match_brute_force(cell_size):
+    positions = random_positions(1500)
+    agents = np.arange(0, 1500, 2) # Only every other agent is hashed
+    spatial_hash = SpatialHash(HEIGHT, WIDTH, cell_size=cell_size)
+    spatial_hash.rebuild(positions, agents)
+
+    first, second = spatial_hash.close_pairs(cell_size)
+    found = [tuple(sorted(pair)) for pair in zip(first.tolist(), second.tolist())]
+    assert len(found) == len(set(found)) # Each pair once
+    assert set(found) == brute_force_pairs(positions, agents, cell_size)
+
+
+def test_close_pairs_rejects_a_radius_above_the_cell_size():
+    spatial_hash = SpatialHash(HEIGHT, WIDTH, cell_size=0.5)
+    spatial_hash.rebuild(random_positions(10))
+    with pytest.raises(ValueError):
+        spatial_hash.close_pairs(0.6)
+
+
+def test_query_radius_matches_brute_force():
+    positions = random_positions(800, seed=1)
+    points = random_positions(50, seed=2)
+    spatial_hash = SpatialHash(HEIGHT, WIDTH)
+    spatial_hash.rebuild(positions)
+
+    radius = 1.7 # Spans several cells
+    queries, agents = spatial_hash.query_radius(points, radius)
+    found = set(zip(queries.tolist(), agents.tolist()))
+    distances = np.sqrt(((points[:, None, :].astype(np.float64) - positions[None, :, :]) ** 2).sum(axis=-1))
+    expected = set(zip(*[index.tolist() for index in np.nonzero(distances <= radius)]))
+    assert found == expected
+
+
+def test_max_per_cell_caps_the_candidates():
+    positions = np.full((10, 2), 5.5, dtype=np.float32) # Ten agents on one spot
+    spatial_hash = SpatialHash(HEIGHT, WIDTH)
+    spatial_hash.rebuild(positions)
+    assert len(spatial_hash.query_radius([[5.5, 5.5]], 0.5, max_per_cell=3)[0]) == 3
+    assert len(spatial_hash.close_pairs(1.0, max_per_cell=4)[0]) == 6
+
+
+def test_density_counts_agents_per_tile():
+    positions = random_positions(600, seed=3)
+    spatial_hash = SpatialHash(HEIGHT, WIDTH)
+    spatial_hash.rebuild(positions)
+    expected = np.zeros((HEIGHT, WIDTH), dtype=np.int64)
+    np.add.at(expected, (positions[:, 0].astype(int), positions[:, 1].astype(int)), 1)
+    np.testing.assert_array_equal(spatial_hash.density(), expected)
+
+    # The buckets list exactly the agents of each cell
+    cells = spatial_hash.cells_of(positions)
+    for cell in [0, 17, HEIGHT * WIDTH - 1]:
+        bucket = spatial_hash.order[spatial_hash.starts[cell]:spatial_hash.starts[cell + 1]]
+        assert sorted(bucket.tolist()) == np.flatnonzero(cells == cell).tolist()
+
+
+def test_radix_cell_size_keeps_the_grid_small():
+    assert radix_cell_size(30, 60, 0.3) == 0.3
+    cell_size = radix_cell_size(400, 400, 0.3)
+    assert cell_size > 0.3
+    assert SpatialHash(400, 400, cell_size=cell_size).num_cells <= RADIX_SORT_CELLS